@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行批量回测
+不依赖Streamlit和绘图库，适合定时任务和CI。示例：
+
+    python backtest_cli.py --ticker BTC-USD --strategy RSIStrategy --param rsi_period=14
+    python backtest_cli.py --config jobs.json --format csv --output results.csv
+    python backtest_cli.py --list-strategies
+    python backtest_cli.py --ticker BTC-USD --import-file btc_1m.csv --interval 15m --period 2y
+
+配置文件（JSON）：
+    {
+        "tickers": ["BTC-USD", "ETH-USD"],
+        "period": "6mo",
+        "interval": "1d",
+        "initial_capital": 10000,
+        "strategies": [
+            {"name": "RSIStrategy", "params": {"rsi_period": 14}},
+            {"name": "MAStrategy"}
+        ],
+        "execution": {"fill": "next_open", "spread_bps": 5, "impact": 0.1,
+                      "fee_tiers": [[0, 0.0008, 0.001], [1000000, 0.0006, 0.0008]]},
+        "risk": {"stop_loss": 0.05, "trailing_stop": 0.1, "position_size": 0.5}
+    }
+
+"execution"（或 --fill/--spread-bps/--impact/--max-participation）启用成交模型，见 execution.py；
+"risk"（或 --stop-loss/--trailing-stop/--take-profit/--position-size/--target-vol）启用风险控制，见 risk.py
+"""
+
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import csv
+import json
+import sys
+
+
+METRIC_COLUMNS = ['total_return', 'annual_return', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'max_drawdown',
+                  'win_rate', 'num_trades', 'exposure', 'turnover', 'buy_hold_return', 'final_value']
+
+
+def _parse_value(text):
+    """命令行参数值：能按JSON解析的（数字、true/false）按JSON解析，否则保留字符串"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='StrategyLab 命令行回测')
+    parser.add_argument('--config', help='JSON配置文件（与下面的单项参数二选一）')
+    parser.add_argument('--ticker', action='append', help='币种，可重复指定（默认 BTC-USD）')
+    parser.add_argument('--period', default='6mo', help='回测周期（默认 6mo）')
+    parser.add_argument('--interval', default='1d', help='K线级别（默认 1d）')
+    parser.add_argument('--strategy', action='append', help='策略注册名，可重复指定（默认 RSIStrategy）')
+    parser.add_argument('--list-strategies', action='store_true', help='列出已注册的策略及其参数后退出')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                        help='策略参数，作用于所有 --strategy，可重复指定')
+    parser.add_argument('--initial-capital', type=float, default=10000)
+    parser.add_argument('--commission', type=float, default=0.001)
+    parser.add_argument('--fill', choices=['close', 'next_open'], help='成交价：信号K线收盘价或下一根K线开盘价')
+    parser.add_argument('--spread-bps', type=float, help='买卖价差（基点）')
+    parser.add_argument('--impact', type=float, help='冲击系数，滑点 = impact * sqrt(成交数量 / K线成交量)')
+    parser.add_argument('--max-participation', type=float, help='单笔成交量占K线成交量的上限（比例）')
+    parser.add_argument('--stop-loss', type=float, help='止损比例（如 0.05）')
+    parser.add_argument('--trailing-stop', type=float, help='移动止损比例（相对入场以来最高价）')
+    parser.add_argument('--take-profit', type=float, help='止盈比例')
+    parser.add_argument('--position-size', type=float, help='每笔交易投入资金的比例（默认全仓）')
+    parser.add_argument('--target-vol', type=float, help='年化波动率目标，按入场前波动率缩小仓位')
+    parser.add_argument('--data-file', help='本地CSV行情文件（首列为时间），指定后不联网')
+    parser.add_argument('--import-file', help='先把本地1分钟K线或逐笔成交文件（CSV/Parquet）导入 --ticker 的行情库，'
+                                              '之后该币种按 --interval 由导入数据重采样，不再联网')
+    parser.add_argument('--import-kind', choices=['bars', 'trades'], default='bars', help='导入文件类型（默认 bars）')
+    parser.add_argument('--import-interval', default='1m', help='导入后存储的K线级别（默认 1m）')
+    parser.add_argument('--output', help='结果文件，默认输出到标准输出')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('--timing', action='store_true',
+                        help='在标准错误输出各阶段耗时（导入、取数、回测、总耗时）')
+    return parser
+
+
+def list_strategies(out=sys.stdout):
+    """打印已注册的策略及参数声明"""
+    from registry import REGISTRY
+
+    for name in REGISTRY:
+        strategy_cls = REGISTRY.get(name)
+        print(f"{name}  ({REGISTRY.display_name(name)})", file=out)
+        for param in strategy_cls.params:
+            if param.kind is bool:
+                print(f"    {param.name}={param.default}  {param.label}", file=out)
+            else:
+                print(f"    {param.name}={param.default}  {param.label} [{param.low}, {param.high}]", file=out)
+
+
+def load_jobs(args):
+    """把命令行参数或配置文件整理为统一的任务描述"""
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            config = json.load(f)
+    else:
+        params = dict(item.split('=', 1) for item in args.param)
+        config = {
+            'tickers': args.ticker or ['BTC-USD'],
+            'strategies': [
+                {'name': name, 'params': {k: _parse_value(v) for k, v in params.items()}}
+                for name in (args.strategy or ['RSIStrategy'])
+            ],
+        }
+
+    config.setdefault('period', args.period)
+    config.setdefault('interval', args.interval)
+    config.setdefault('initial_capital', args.initial_capital)
+    config.setdefault('commission', args.commission)
+
+    execution = {key: value for key, value in [('fill', args.fill), ('spread_bps', args.spread_bps),
+                                               ('impact', args.impact),
+                                               ('max_participation', args.max_participation)]
+                 if value is not None}
+    if execution:
+        config['execution'] = dict(config.get('execution') or {}, **execution)
+
+    risk = {key: value for key, value in [('stop_loss', args.stop_loss), ('trailing_stop', args.trailing_stop),
+                                          ('take_profit', args.take_profit),
+                                          ('position_size', args.position_size),
+                                          ('target_vol', args.target_vol)]
+            if value is not None}
+    if risk:
+        config['risk'] = dict(config.get('risk') or {}, **risk)
+    return config
+
+
+def run_jobs(config, data_file=None):
+    """执行全部任务，返回结果行列表和分阶段耗时"""
+    start = time.perf_counter()
+    import pandas as pd
+
+    from execution import ExecutionModel
+    from fetcher import load_many
+    from registry import REGISTRY
+    from risk import RiskManager
+
+    timings = {'import_seconds': time.perf_counter() - start, 'data_seconds': 0.0, 'backtest_seconds': 0.0}
+
+    # 多个币种并发刷新本地行情库
+    start = time.perf_counter()
+    if data_file:
+        shared = pd.read_csv(data_file, index_col=0, parse_dates=True)
+        datasets = {ticker: shared for ticker in config['tickers']}
+    else:
+        loaded = load_many([(ticker, config['interval']) for ticker in config['tickers']], config['period'],
+                           max_concurrency=config.get('max_concurrency', 8))
+        datasets = {ticker: loaded[(ticker, config['interval'])] for ticker in config['tickers']}
+    timings['data_seconds'] += time.perf_counter() - start
+
+    execution = ExecutionModel.from_config(config['execution']) if config.get('execution') else None
+    try:
+        risk = RiskManager.from_config(config['risk']) if config.get('risk') else None
+    except (TypeError, ValueError) as e:
+        raise SystemExit(f'风险控制参数错误: {e}')
+    rows = []
+    for ticker, data in datasets.items():
+        if isinstance(data, Exception) or data is None or data.empty:
+            raise SystemExit(f'无法获取数据: {ticker}')
+
+        for job in config['strategies']:
+            if job['name'] not in REGISTRY:
+                raise SystemExit(f"未知策略: {job['name']}（可用: {', '.join(REGISTRY)}）")
+            strategy_cls = REGISTRY.get(job['name'])
+            try:
+                params = strategy_cls.normalize_params(job.get('params'))
+            except ValueError as e:
+                raise SystemExit(f"{job['name']}: {e}")
+
+            start = time.perf_counter()
+            strategy = strategy_cls(data, initial_capital=config['initial_capital'],
+                                    commission=config['commission'], execution=execution, risk=risk)
+            result = strategy.backtest(strategy.generate_signals(**params), engine='vectorized')
+            timings['backtest_seconds'] += time.perf_counter() - start
+
+            row = {'ticker': ticker, 'strategy': job['name'], 'params': params}
+            row.update({metric: result[metric] for metric in METRIC_COLUMNS})
+            rows.append(row)
+    return rows, timings
+
+
+def write_results(rows, fmt, output=None):
+    """写出结果（JSON或CSV）"""
+    out = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    try:
+        if fmt == 'json':
+            json.dump(rows, out, ensure_ascii=False, indent=2, default=float)
+            out.write('\n')
+        else:
+            writer = csv.DictWriter(out, fieldnames=['ticker', 'strategy', 'params'] + METRIC_COLUMNS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(dict(row, params=json.dumps(row['params'], ensure_ascii=False)))
+    finally:
+        if output:
+            out.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.list_strategies:
+        list_strategies()
+        return 0
+    config = load_jobs(args)
+
+    if args.import_file:
+        from data_store import OHLCVStore
+
+        if len(config['tickers']) != 1:
+            raise SystemExit('--import-file 需要且只能指定一个 --ticker')
+        count = OHLCVStore().import_file(config['tickers'][0], args.import_file, kind=args.import_kind,
+                                         interval=args.import_interval)
+        print(f"已导入 {count} 根 {args.import_interval} K线", file=sys.stderr)
+
+    rows, timings = run_jobs(config, data_file=args.data_file)
+    write_results(rows, args.format, args.output)
+
+    if args.timing:
+        timings['total_seconds'] = time.perf_counter() - _START
+        print(json.dumps(timings), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量回测
+把相互独立的回测任务（币种 × 策略 × 参数）分发到多个进程并行执行，
+行情数据通过共享内存发布一次，各进程直接映射读取，不随任务重复序列化
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data_store import OHLCVColumns
+from registry import REGISTRY
+
+
+# 工作进程内的行情数据（由 _init_worker 填充）
+_WORKER_DATA = {}
+_WORKER_SEGMENTS = []
+
+
+def _flat_columns(data):
+    """展开多层级列名"""
+    if isinstance(data.columns, pd.MultiIndex):
+        return list(data.columns.get_level_values(0))
+    return list(data.columns)
+
+
+def _publish(data):
+    """把一份行情数据（DataFrame或OHLCVColumns）写入共享内存，返回共享内存块和描述信息
+
+    逐列从 data[列名] 复制，不经过整表转换，OHLCVColumns 的内存映射列也可直接发布
+    """
+    index = pd.DatetimeIndex(data.index).as_unit('ns')
+    keys = list(data.columns)
+    n, n_cols = len(index), len(keys)
+
+    # 按列存放（第0行为时间戳），每列在共享内存中连续
+    segment = shared_memory.SharedMemory(create=True, size=max(1, n * (n_cols + 1) * 8))
+    buffer = np.ndarray((n_cols + 1, n), dtype=np.float64, buffer=segment.buf)
+    buffer[0] = index.asi8.view(np.float64)
+    for i, key in enumerate(keys):
+        buffer[i + 1] = np.asarray(data[key], dtype=np.float64)
+
+    spec = {
+        'name': segment.name,
+        'shape': (n_cols + 1, n),
+        'columns': _flat_columns(data),
+        'tz': str(index.tz) if index.tz is not None else None,
+    }
+    return segment, spec
+
+
+def _attach(spec):
+    """在工作进程中把共享内存映射为只读列视图（不复制数值）"""
+    segment = shared_memory.SharedMemory(name=spec['name'])
+    buffer = np.ndarray(spec['shape'], dtype=np.float64, buffer=segment.buf)
+    index = pd.DatetimeIndex(buffer[0].view(np.int64).astype('datetime64[ns]'))
+    if spec['tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(spec['tz'])
+    columns = {name: buffer[i + 1] for i, name in enumerate(spec['columns'])}
+    return segment, OHLCVColumns(index, columns)
+
+
+def _init_worker(specs):
+    """工作进程初始化：挂载全部行情数据"""
+    for ticker, spec in specs.items():
+        segment, data = _attach(spec)
+        _WORKER_SEGMENTS.append(segment)
+        _WORKER_DATA[ticker] = data
+
+
+def _run_task(task, initial_capital, commission, engine, execution, risk):
+    """在工作进程中执行单个回测任务"""
+    start = time.perf_counter()
+    strategy = task['strategy'](_WORKER_DATA[task['ticker']], initial_capital=initial_capital,
+                                commission=commission, execution=execution, risk=risk)
+    signals = strategy.generate_signals(**task['params'])
+    result = strategy.backtest(signals, engine=engine)
+
+    return {
+        'ticker': task['ticker'],
+        'strategy': task['strategy'].__name__,
+        'params': task['params'],
+        'total_return': result['total_return'],
+        'sharpe_ratio': result['sharpe_ratio'],
+        'sortino_ratio': result['sortino_ratio'],
+        'calmar_ratio': result['calmar_ratio'],
+        'max_drawdown': result['max_drawdown'],
+        'win_rate': result['win_rate'],
+        'num_trades': result['num_trades'],
+        'exposure': result['exposure'],
+        'buy_hold_return': result['buy_hold_return'],
+        'seconds': time.perf_counter() - start,
+        'worker': os.getpid(),
+    }
+
+
+def build_tasks(tickers, strategies, param_sets=None):
+    """生成任务列表：每个币种 × 每个策略 × 每组参数
+
+    strategies: 策略类或注册名列表；param_sets: {策略类名: [参数dict, ...]}，缺省时使用策略默认参数
+    """
+    strategies = [REGISTRY.get(s) if isinstance(s, str) else s for s in strategies]
+    param_sets = param_sets or {}
+    return [
+        {'ticker': ticker, 'strategy': strategy_cls, 'params': params}
+        for ticker in tickers
+        for strategy_cls in strategies
+        for params in param_sets.get(strategy_cls.__name__, [{}])
+    ]
+
+
+def run_batch(datasets, tasks, max_workers=None, initial_capital=10000, commission=0.001,
+              engine='vectorized', chunksize=None, execution=None, risk=None):
+    """并行执行回测任务，返回汇总表（每行一个任务，含耗时）
+
+    datasets: {币种: 行情DataFrame或OHLCVColumns}；execution: 成交模型（见 execution.py）；risk: 风险控制（见 risk.py）
+    仅供库调用（脚本、notebook），backtest_cli.py 的 --config 在单进程中逐个执行任务，不经过这里
+    """
+    if not tasks:
+        return pd.DataFrame()
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        # 每个进程约分到4批任务，兼顾负载均衡和调度开销
+        chunksize = max(1, len(tasks) // (max_workers * 4))
+
+    segments = []
+    try:
+        specs = {}
+        for ticker, data in datasets.items():
+            segment, specs[ticker] = _publish(data)
+            segments.append(segment)
+
+        run_task = partial(_run_task, initial_capital=initial_capital, commission=commission,
+                           engine=engine, execution=execution, risk=risk)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(specs,)) as executor:
+            rows = list(executor.map(run_task, tasks, chunksize=chunksize))
+        wall_seconds = time.perf_counter() - start
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    summary = pd.DataFrame(rows)
+    summary.attrs['wall_seconds'] = wall_seconds
+    summary.attrs['task_seconds'] = float(summary['seconds'].sum())
+    return summary
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准
+在合成行情上测量各策略的 generate_signals、回测引擎、_calculate_performance 和
+plot_backtest_results 的吞吐量（K线/秒）与峰值内存，完全离线运行。示例：
+
+    python benchmark.py --sizes 1000 100000 1000000
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 0.2
+
+与基线比较时，吞吐量下降或峰值内存增长超过阈值的项目记为退化，退出码为1。
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from execution import ExecutionModel
+from registry import REGISTRY
+from risk import RiskManager
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+STRATEGY_NAMES = REGISTRY.names()
+BENCHMARK_EXECUTION = ExecutionModel(fill='next_open', spread_bps=5, impact=0.1, max_participation=0.1)
+BENCHMARK_RISK = RiskManager(stop_loss=0.05, trailing_stop=0.08, take_profit=0.15, target_vol=0.5)
+
+
+def synthetic_ohlcv(n_bars, seed=0, freq='h'):
+    """几何随机游走生成的OHLCV数据（与yfinance返回的列结构一致）"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, 0.002, n_bars))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n_bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n_bars))
+    volume = rng.uniform(1e3, 1e5, n_bars)
+    index = pd.date_range('2020-01-01', periods=n_bars, freq=freq, tz='UTC', name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=index)
+
+
+# ============ 基准项目 ============
+def _strategy_cases(data, strategy_name, loop_engine):
+    """单个策略的基准项目：[(名称, 无参可调用对象), ...]"""
+    # 不使用指标缓存，每次都测量完整的指标计算
+    strategy = REGISTRY.get(strategy_name)(data, indicator_cache=None)
+    signals = strategy.generate_signals()
+    result = strategy.backtest(signals, engine='vectorized')
+
+    cases = [
+        (f'{strategy_name}.generate_signals', strategy.generate_signals),
+        (f'{strategy_name}.backtest[vectorized]', lambda: strategy.backtest(signals, engine='vectorized')),
+    ]
+    if loop_engine:
+        cases.append((f'{strategy_name}.backtest[loop]', lambda: strategy.backtest(signals, engine='loop')))
+
+    # 带成交模型（下一根开盘价成交、价差、冲击成本、成交量上限）的向量化回测
+    realistic = REGISTRY.get(strategy_name)(data, indicator_cache=None, execution=BENCHMARK_EXECUTION)
+    cases.append((f'{strategy_name}.backtest[execution]', lambda: realistic.backtest(signals, engine='vectorized')))
+    # 带止损、移动止损、止盈和波动率目标仓位的向量化回测
+    guarded = REGISTRY.get(strategy_name)(data, indicator_cache=None, risk=BENCHMARK_RISK)
+    cases.append((f'{strategy_name}.backtest[risk]', lambda: guarded.backtest(signals, engine='vectorized')))
+    cases.append((
+        f'{strategy_name}._calculate_performance',
+        lambda: strategy._calculate_performance(result['portfolio_values'], result['trades'])
+    ))
+    return cases, result
+
+
+def _plot_case(data, result, strategy_name):
+    """绘图基准（需要streamlit和plotly，缺失时跳过）"""
+    try:
+        from interactive_backtest import plot_backtest_results
+    except ImportError:
+        return None
+    return ('plot_backtest_results',
+            lambda: plot_backtest_results(data, result, 'SYNTH', strategy_name))
+
+
+def _time(func, repeat):
+    """取多次运行的最短耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(func):
+    """单次运行期间新增的峰值内存（字节，tracemalloc统计，含NumPy数组）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, strategy_names=STRATEGY_NAMES, repeat=3,
+                   loop_engine=False, plot=True, seed=0, progress=None):
+    """运行全部基准，返回结果行列表"""
+    rows = []
+    for n_bars in sizes:
+        data = synthetic_ohlcv(n_bars, seed=seed)
+        cases = []
+        for strategy_name in strategy_names:
+            strategy_cases, result = _strategy_cases(data, strategy_name, loop_engine)
+            cases.extend(strategy_cases)
+        if plot:
+            plot_case = _plot_case(data, result, strategy_name)
+            if plot_case is not None:
+                cases.append(plot_case)
+
+        for name, func in cases:
+            func()  # 预热
+            seconds = _time(func, repeat)
+            row = {
+                'name': name,
+                'n_bars': n_bars,
+                'seconds': seconds,
+                'bars_per_sec': n_bars / seconds if seconds > 0 else float('inf'),
+                'peak_mb': _peak_memory(func) / 1024 ** 2,
+            }
+            rows.append(row)
+            if progress:
+                progress(row)
+    return rows
+
+
+# ============ 基线 ============
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def save_baseline(rows, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': rows}, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_regressions(rows, baseline, threshold=0.2):
+    """与基线比较：吞吐量下降或峰值内存增长超过 threshold（比例）的项目"""
+    reference = {(r['name'], r['n_bars']): r for r in baseline['results']}
+    regressions = []
+    for row in rows:
+        base = reference.get((row['name'], row['n_bars']))
+        if base is None:
+            continue
+        speed_change = row['bars_per_sec'] / base['bars_per_sec'] - 1
+        memory_change = (row['peak_mb'] / base['peak_mb'] - 1) if base['peak_mb'] > 0 else 0.0
+        if speed_change < -threshold or memory_change > threshold:
+            regressions.append(dict(row, speed_change=speed_change, memory_change=memory_change))
+    return regressions
+
+
+def _format_row(row):
+    return (f"{row['name']:<45} {row['n_bars']:>9,} bars  {row['seconds'] * 1e3:>10.2f} ms  "
+            f"{row['bars_per_sec']:>14,.0f} bars/s  {row['peak_mb']:>9.2f} MB")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='StrategyLab 性能基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='合成数据的K线数，可指定多个（默认 1000 10000 100000）')
+    parser.add_argument('--strategy', action='append', choices=STRATEGY_NAMES,
+                        help='只测指定策略，可重复指定（默认全部）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最短耗时（默认 3）')
+    parser.add_argument('--loop', action='store_true', help='同时测量逐K线循环回测引擎')
+    parser.add_argument('--no-plot', action='store_true', help='跳过 plot_backtest_results')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='把本次结果写为JSON')
+    parser.add_argument('--save-baseline', metavar='PATH', help='把本次结果保存为基线')
+    parser.add_argument('--baseline', metavar='PATH', help='与基线比较，发现退化时退出码为1')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='退化阈值（比例，默认 0.2 即 20%%）')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    rows = run_benchmarks(
+        sizes=args.sizes,
+        strategy_names=args.strategy or STRATEGY_NAMES,
+        repeat=args.repeat,
+        loop_engine=args.loop,
+        plot=not args.no_plot,
+        seed=args.seed,
+        progress=lambda row: print(_format_row(row), flush=True),
+    )
+
+    if args.output:
+        save_baseline(rows, args.output)
+    if args.save_baseline:
+        save_baseline(rows, args.save_baseline)
+        print(f'基线已保存: {args.save_baseline}')
+
+    if args.baseline:
+        regressions = find_regressions(rows, load_baseline(args.baseline), args.threshold)
+        if regressions:
+            print(f'\n发现 {len(regressions)} 项性能退化（阈值 {args.threshold:.0%}）:', file=sys.stderr)
+            for row in regressions:
+                print(f"  {row['name']} [{row['n_bars']:,}]: 吞吐量 {row['speed_change']:+.1%}，"
+                      f"峰值内存 {row['memory_change']:+.1%}", file=sys.stderr)
+            return 1
+        print(f'\n未发现超过 {args.threshold:.0%} 的性能退化')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地行情存储
+每个币种/K线级别保存为一组按列存放的 .npy 文件（可内存映射读取），
+刷新时只下载最后一根K线之后的数据并追加，任意回测周期都从本地数据切片得到。
+本地的1分钟K线或逐笔成交文件可以按块导入（import_file），更高级别的K线由导入数据
+重采样得到并作为派生数据保存，导入数据更新前直接复用
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from resample import (DEFAULT_CHUNK_ROWS, ResampleAccumulator, from_nanos, interval_nanos, is_derivable,
+                      resample_columns, to_nanos, trades_to_columns)
+
+try:
+    import fcntl
+except ImportError:   # Windows：只做进程内互斥
+    fcntl = None
+
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+DEFAULT_STORE_DIR = os.environ.get(
+    'STRATEGYLAB_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_store')
+)
+
+# 读取时版本目录被并发写入清理掉的重试次数
+READ_RETRIES = 3
+
+# 回测周期对应的时间跨度
+PERIOD_OFFSETS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+}
+
+
+def yfinance_download(ticker, interval, period=None, start=None):
+    """从Yahoo Finance下载行情（给定start时只下载start之后的数据）
+
+    使用 Ticker.history 而不是 yf.download：后者通过模块级共享状态汇总结果，
+    多线程并发下载时不安全；history 返回单层列名，无需再处理多层级列名
+    """
+    import yfinance as yf
+
+    ticker_data = yf.Ticker(ticker)
+    if start is not None:
+        return ticker_data.history(start=start, interval=interval)
+    return ticker_data.history(period=period, interval=interval)
+
+
+def normalize_ohlcv(data):
+    """统一为单层列名、按时间升序且无重复时间戳的OHLCV数据"""
+    data = data.copy()
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data.index = pd.DatetimeIndex(data.index)
+    data = data[[c for c in OHLCV_COLUMNS if c in data.columns]].astype(float)
+    data = data.dropna(subset=['Close'])
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+
+# ============ 本地文件导入 ============
+TIME_COLUMNS = ['timestamp', 'time', 'datetime', 'date', 'open_time']
+TRADE_SIZE_COLUMNS = ['size', 'qty', 'quantity', 'amount', 'volume']
+
+
+def read_table_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """按块读取CSV或Parquet文件（每块为一个DataFrame），大文件不会整体读入内存"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("读取Parquet文件需要安装 pyarrow: pip install pyarrow") from None
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def _parse_timestamps(values):
+    """时间列转为UTC纳秒时间戳：数值按量级识别秒/毫秒/微秒/纳秒，字符串按日期解析"""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        raw = values.to_numpy(dtype=np.int64)
+        magnitude = abs(int(raw[0])) if len(raw) else 0
+        unit = 'ns' if magnitude > 1e17 else 'us' if magnitude > 1e14 else 'ms' if magnitude > 1e11 else 's'
+        return raw * {'s': 10 ** 9, 'ms': 10 ** 6, 'us': 10 ** 3, 'ns': 1}[unit]
+    return to_nanos(pd.to_datetime(values, utc=True))
+
+
+def table_columns(frame, kind='bars'):
+    """把一块导入数据整理为 (UTC纳秒时间戳, {OHLCV列: 数组})
+
+    kind: 'bars' 为K线（Open/High/Low/Close/Volume 列，不区分大小写），
+          'trades' 为逐笔成交（price 列和 size/qty/amount/volume 之一）
+    时间取 timestamp/time/datetime/date/open_time 列，都没有时取第一列
+    """
+    lookup = {str(column).lower(): column for column in frame.columns}
+    time_column = next((lookup[name] for name in TIME_COLUMNS if name in lookup), frame.columns[0])
+    index_ns = _parse_timestamps(frame[time_column])
+
+    if kind == 'trades':
+        size_column = next((lookup[name] for name in TRADE_SIZE_COLUMNS if name in lookup), None)
+        if 'price' not in lookup or size_column is None:
+            raise ValueError("逐笔成交文件需要 price 列和 size/qty/amount/volume 列之一")
+        columns = trades_to_columns(frame[lookup['price']], frame[size_column])
+    elif kind == 'bars':
+        missing = [c for c in ['open', 'high', 'low', 'close'] if c not in lookup]
+        if missing:
+            raise ValueError(f"K线文件缺少列: {', '.join(missing)}")
+        columns = {c: frame[lookup[c.lower()]].to_numpy(dtype=float) for c in OHLCV_COLUMNS if c.lower() in lookup}
+    else:
+        raise ValueError(f"未知导入类型: {kind}")
+
+    # 块内按时间排序（稳定排序，同一时间戳保持文件顺序）
+    if len(index_ns) > 1 and (np.diff(index_ns) < 0).any():
+        order = np.argsort(index_ns, kind='stable')
+        index_ns = index_ns[order]
+        columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+    return index_ns, columns
+
+
+class OHLCVColumns:
+    """按列组织的只读行情视图
+
+    各列是一维只读数组（通常为内存映射文件或共享内存上的视图），切片也只产生视图，
+    可直接传给策略类代替DataFrame，避免整表复制
+    """
+
+    def __init__(self, index, columns):
+        self.index = index
+        self._columns = {}
+        for name, values in columns.items():
+            values = np.asarray(values).view()
+            values.flags.writeable = False
+            self._columns[name] = values
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def empty(self):
+        return len(self.index) == 0
+
+    def slice(self, start=None, stop=None):
+        """按位置切片（视图）"""
+        return OHLCVColumns(
+            self.index[start:stop],
+            {name: values[start:stop] for name, values in self._columns.items()}
+        )
+
+    def to_frame(self):
+        """复制为DataFrame（用于绘图等需要完整DataFrame的场景）"""
+        return pd.DataFrame({name: np.array(values) for name, values in self._columns.items()},
+                            index=self.index)
+
+
+# ============ 写入互斥 ============
+_PATH_LOCKS = {}
+_PATH_LOCKS_GUARD = threading.Lock()
+_HELD = threading.local()
+
+
+@contextmanager
+def _write_lock(path):
+    """同一数据目录的写入互斥：进程内线程锁 + 跨进程文件锁（fcntl.flock），同一线程可重入"""
+    held = getattr(_HELD, 'paths', None)
+    if held is None:
+        held = _HELD.paths = set()
+    path = os.path.abspath(path)
+    if path in held:
+        yield
+        return
+
+    with _PATH_LOCKS_GUARD:
+        thread_lock = _PATH_LOCKS.setdefault(path, threading.Lock())
+    os.makedirs(path, exist_ok=True)
+    with thread_lock, open(os.path.join(path, '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)   # 关闭文件时释放
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+
+
+class OHLCVStore:
+    """按币种和K线级别持久化的行情库
+
+    同一币种/K线级别的写入（刷新、导入、重采样）按目录加锁串行执行，读取不加锁：
+    新版本写完后才切换meta.json，上一个版本保留到下一次写入，读取期间版本目录被清理时重读meta.json
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, downloader=yfinance_download, refresh_interval=60):
+        """
+        downloader: 下载函数 downloader(ticker, interval, period=None, start=None) -> DataFrame，
+                    测试或离线时可替换为本地实现
+        refresh_interval: 两次增量刷新的最小间隔（秒）
+        """
+        self.root = root
+        self.downloader = downloader
+        self.refresh_interval = refresh_interval
+
+    # ---------- 读写 ----------
+    def _path(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker)
+
+    def _read_meta(self, ticker, interval):
+        meta_path = os.path.join(self._path(ticker, interval), 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def read_columns(self, ticker, interval):
+        """以内存映射方式读取全部已存储数据（只读列视图），不存在时返回None"""
+        for attempt in range(READ_RETRIES):
+            meta = self._read_meta(ticker, interval)
+            if meta is None:
+                return None
+            try:
+                return self._read_version(ticker, interval, meta)
+            except FileNotFoundError:
+                # 读取meta.json之后该版本已被并发写入清理，按新的meta.json重读
+                if attempt == READ_RETRIES - 1:
+                    raise
+
+    def _read_version(self, ticker, interval, meta):
+        version_dir = os.path.join(self._path(ticker, interval), f"v{meta['version']}")
+        index = pd.DatetimeIndex(np.load(os.path.join(version_dir, 'index.npy')))
+        if meta['tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        columns = {
+            column: np.load(os.path.join(version_dir, f'{column}.npy'), mmap_mode='r')
+            for column in meta['columns']
+        }
+        return OHLCVColumns(index, columns)
+
+    def read(self, ticker, interval):
+        """读取全部已存储数据为DataFrame，不存在时返回None"""
+        columns = self.read_columns(ticker, interval)
+        return columns.to_frame() if columns is not None else None
+
+    def write(self, ticker, interval, data, covered_from=None):
+        """写入完整数据（DataFrame）"""
+        self.write_columns(ticker, interval, data.index,
+                           {column: data[column].to_numpy(dtype=float) for column in data.columns},
+                           covered_from=covered_from)
+
+    def write_columns(self, ticker, interval, index, columns, covered_from=None, extra_meta=None):
+        """按列写入完整数据（新版本目录写完后再切换meta.json，读者不会看到半成品）
+
+        extra_meta: 附加到meta.json的字段（如导入/重采样数据的来源）
+        """
+        path = self._path(ticker, interval)
+        with _write_lock(path):
+            meta = self._read_meta(ticker, interval)
+            version = meta['version'] + 1 if meta else 1
+
+            version_dir = os.path.join(path, f'v{version}')
+            os.makedirs(version_dir, exist_ok=True)
+            index = pd.DatetimeIndex(index)
+            tz = str(index.tz) if index.tz is not None else None
+            if tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            np.save(os.path.join(version_dir, 'index.npy'), index.as_unit('ns').asi8.astype('datetime64[ns]'))
+            for column, values in columns.items():
+                np.save(os.path.join(version_dir, f'{column}.npy'), np.asarray(values, dtype=float))
+
+            if covered_from is None and meta is not None:
+                covered_from = meta.get('covered_from')
+            new_meta = {
+                'version': version,
+                'columns': list(columns),
+                'tz': tz,
+                'covered_from': covered_from,
+                'updated_at': time.time(),
+            }
+            new_meta.update(extra_meta or {})
+            tmp_path = os.path.join(path, 'meta.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(new_meta, f)
+            os.replace(tmp_path, os.path.join(path, 'meta.json'))
+
+            # 清理更早的版本：上一个版本保留给刚读过旧meta.json的读者（已映射的文件在POSIX上仍可继续读取）
+            for name in os.listdir(path):
+                if name.startswith('v') and name[1:].isdigit() and int(name[1:]) < version - 1:
+                    shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    # ---------- 刷新 ----------
+    def refresh(self, ticker, interval, period):
+        """确保本地数据覆盖period并更新到最新，返回全部已存储数据的列视图"""
+        # 同一数据的并发刷新串行执行：后到的刷新在锁内看到已更新的数据，不重复下载
+        with _write_lock(self._path(ticker, interval)):
+            return self._refresh(ticker, interval, period)
+
+    def _refresh(self, ticker, interval, period):
+        meta = self._read_meta(ticker, interval)
+        stored = self.read_columns(ticker, interval) if meta else None
+        period_start = self._period_start(pd.Timestamp.now(tz='UTC'), period)
+
+        if stored is None or stored.empty or not self._covers(meta, period_start):
+            # 本地数据不足：下载整个周期，与已有数据合并
+            fresh = normalize_ohlcv(self.downloader(ticker, interval, period=period))
+            if fresh.empty:
+                return stored
+            if stored is not None and not stored.empty:
+                fresh = normalize_ohlcv(pd.concat([stored.to_frame(), fresh]))
+            self.write(ticker, interval, fresh, covered_from=period_start.isoformat())
+            return self.read_columns(ticker, interval)
+
+        if time.time() - meta['updated_at'] < self.refresh_interval:
+            return stored
+
+        # 增量刷新：从最后一根K线开始下载（最后一根可能尚未收盘，用新数据覆盖）
+        fresh = normalize_ohlcv(self.downloader(ticker, interval, start=stored.index[-1]))
+        if fresh.empty:
+            return stored
+        keep = stored.index.searchsorted(fresh.index[0])
+        self.write(ticker, interval, pd.concat([stored.slice(stop=keep).to_frame(), fresh]))
+        return self.read_columns(ticker, interval)
+
+    def load(self, ticker, interval, period, refresh=True):
+        """取回测周期内的数据为DataFrame：先刷新本地库，再按period切片"""
+        columns = self.load_columns(ticker, interval, period, refresh=refresh)
+        return columns.to_frame() if columns is not None else None
+
+    def load_columns(self, ticker, interval, period, refresh=True):
+        """取回测周期内的只读列视图（内存映射，不复制数据）
+
+        该币种有导入的本地数据且 interval 可由其聚合得到时，使用（重采样后的）导入数据，
+        不联网刷新，周期从最后一根K线往前计算
+        """
+        base = self.imported_interval(ticker)
+        if base is not None and is_derivable(interval, base):
+            data = self.resampled_columns(ticker, interval, base)
+            if data is None or data.empty:
+                return None
+            return data.slice(data.index.searchsorted(self._period_start(data.index[-1], period)))
+
+        if refresh:
+            self.refresh(ticker, interval, period)
+        data = self.read_columns(ticker, interval)
+        if data is None or data.empty:
+            return None
+
+        start = self._period_start(pd.Timestamp.now(tz='UTC'), period)
+        index = data.index if data.index.tz is not None else data.index.tz_localize('UTC')
+        return data.slice(index.searchsorted(start))
+
+    # ---------- 本地导入与重采样 ----------
+    def import_file(self, ticker, path, kind='bars', interval='1m', chunk_rows=DEFAULT_CHUNK_ROWS):
+        """导入本地CSV/Parquet文件（K线或逐笔成交），按块聚合为 interval 级别的K线后存入行情库
+
+        文件需按时间升序排列；与已有的同级别数据合并，时间重叠的K线以新文件为准。
+        更高级别的K线由 load_columns 按需重采样得到。返回存储的K线数
+        """
+        accumulator = ResampleAccumulator(interval)
+        last_ns = None
+        for frame in read_table_chunks(path, chunk_rows):
+            index_ns, columns = table_columns(frame, kind)
+            if len(index_ns) == 0:
+                continue
+            if last_ns is not None and index_ns[0] < last_ns:
+                raise ValueError(f"{path} 需要按时间升序排列")
+            last_ns = index_ns[-1]
+            accumulator.add(index_ns, columns)
+        bucket_ns, columns = accumulator.finish()
+        if len(bucket_ns) == 0:
+            raise ValueError(f"{path} 中没有数据")
+
+        with _write_lock(self._path(ticker, interval)):
+            existing = self.read_columns(ticker, interval)
+            if existing is not None and not existing.empty and set(existing.columns) == set(columns):
+                old_ns = to_nanos(existing.index)
+                keep = ~np.isin(old_ns, bucket_ns)
+                merged_ns = np.concatenate([old_ns[keep], bucket_ns])
+                order = np.argsort(merged_ns, kind='stable')
+                columns = {name: np.concatenate([np.asarray(existing[name])[keep], values])[order]
+                           for name, values in columns.items()}
+                bucket_ns = merged_ns[order]
+
+            index = from_nanos(bucket_ns)
+            self.write_columns(ticker, interval, index, columns, covered_from=index[0].isoformat(),
+                               extra_meta={'source': 'import'})
+        return len(index)
+
+    def imported_interval(self, ticker):
+        """该币种导入数据的最细K线级别，没有导入数据时返回None"""
+        if not os.path.isdir(self.root):
+            return None
+        best = None
+        for interval in os.listdir(self.root):
+            meta = self._read_meta(ticker, interval)
+            if meta is not None and meta.get('source') == 'import':
+                if best is None or interval_nanos(interval) < interval_nanos(best):
+                    best = interval
+        return best
+
+    def imported_tickers(self):
+        """有导入数据的币种"""
+        if not os.path.isdir(self.root):
+            return []
+        tickers = set()
+        for interval in os.listdir(self.root):
+            interval_dir = os.path.join(self.root, interval)
+            if not os.path.isdir(interval_dir):
+                continue
+            for ticker in os.listdir(interval_dir):
+                meta = self._read_meta(ticker, interval)
+                if meta is not None and meta.get('source') == 'import':
+                    tickers.add(ticker)
+        return sorted(tickers)
+
+    def resampled_columns(self, ticker, interval, base):
+        """由 base 级别数据重采样得到 interval 级别的列视图
+
+        结果作为派生数据（目录名 '{interval}@{base}'）存入行情库，base 数据更新前直接复用
+        """
+        source_meta = self._read_meta(ticker, base)
+        if source_meta is None:
+            return None
+        if interval == base:
+            return self.read_columns(ticker, base)
+
+        derived = f'{interval}@{base}'
+        meta = self._read_meta(ticker, derived)
+        if meta is None or meta.get('source_version') != source_meta['version']:
+            with _write_lock(self._path(ticker, derived)):
+                # 等锁期间其他会话可能已重采样完成
+                meta = self._read_meta(ticker, derived)
+                if meta is None or meta.get('source_version') != source_meta['version']:
+                    resampled = resample_columns(self.read_columns(ticker, base), interval)
+                    self.write_columns(ticker, derived, resampled.index,
+                                       {column: resampled[column] for column in resampled.columns},
+                                       covered_from=source_meta.get('covered_from'),
+                                       extra_meta={'source': 'resample', 'base': base,
+                                                   'source_version': source_meta['version']})
+        return self.read_columns(ticker, derived)
+
+    @staticmethod
+    def _period_start(now, period):
+        return now - PERIOD_OFFSETS[period]
+
+    @staticmethod
+    def _covers(meta, period_start):
+        covered_from = meta.get('covered_from')
+        return covered_from is not None and pd.Timestamp(covered_from) <= period_start
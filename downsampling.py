@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图表降采样
+长序列在发送到浏览器之前按点数预算抽稀，保留曲线的视觉形状：
+
+    minmax_indices   每个分桶保留最小值和最大值所在的点（峰谷精确保留）
+    lttb_indices     Largest-Triangle-Three-Buckets，按三角形面积选点
+    bucket_envelope  每个分桶聚合为一个点（最高价取最大、最低价取最小等）
+
+返回的都是原序列的位置，绘图时用它取日期和数值，买卖点等标记不参与抽稀。
+"""
+
+import numpy as np
+
+
+def _bucket_matrix(values, n_buckets):
+    """把序列补齐NaN后分成 n_buckets 个等长分桶，返回 (分桶矩阵, 桶长)"""
+    n = len(values)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    return padded.reshape(n_buckets, size), size
+
+
+def minmax_indices(values, max_points):
+    """每个分桶取最小值和最大值的位置（含首尾点），点数不超过 max_points + 2"""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    buckets, size = _bucket_matrix(values, max(1, max_points // 2))
+    filled = ~np.isnan(buckets).all(axis=1)
+    offsets = np.arange(len(buckets))[filled] * size
+    lows = np.nanargmin(buckets[filled], axis=1) + offsets
+    highs = np.nanargmax(buckets[filled], axis=1) + offsets
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+def lttb_indices(values, max_points):
+    """Largest-Triangle-Three-Buckets 选点（横轴为序号），点数不超过 max_points"""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    # 首尾点固定，中间 n-2 个点分成 max_points-2 个桶
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    x = np.arange(n, dtype=float)
+    a = 0
+    for i in range(max_points - 2):
+        start, stop = edges[i], edges[i + 1]
+        # 下一个桶的平均点（最后一个桶用末尾点）
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_stop].mean()
+            avg_y = values[next_start:next_stop].mean()
+        else:
+            avg_x, avg_y = x[-1], values[-1]
+
+        bucket_x = x[start:stop]
+        bucket_y = values[start:stop]
+        area = np.abs((x[a] - avg_x) * (bucket_y - values[a]) - (x[a] - bucket_x) * (avg_y - values[a]))
+        if np.isnan(area).all():
+            a = start
+        else:
+            a = start + int(np.nanargmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def bucket_envelope(max_points, n, **series):
+    """按分桶聚合多条序列：返回 (每桶第一个点的位置, {名称: 聚合后的数组})
+
+    series: 名称=(数组, 'max'或'min')
+    """
+    if n <= max_points:
+        return np.arange(n), {name: np.asarray(values, dtype=float) for name, (values, _) in series.items()}
+
+    aggregated = {}
+    for name, (values, how) in series.items():
+        buckets, size = _bucket_matrix(np.asarray(values, dtype=float), max_points)
+        aggregated[name] = np.nanmax(buckets, axis=1) if how == 'max' else np.nanmin(buckets, axis=1)
+    return np.arange(0, n, size), aggregated
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成交模型
+默认回测在信号K线的收盘价全仓成交、双边收取固定手续费。ExecutionModel 描述更接近实盘的成交：
+
+    fill               'close' 信号K线收盘价成交；'next_open' 下一根K线开盘价成交
+    spread_bps         买卖价差（基点），买入付出半个价差、卖出让出半个价差
+    impact             冲击系数，滑点 = impact * sqrt(成交数量 / K线成交量)
+    max_participation  单笔成交量不超过成交K线成交量的比例，超出部分不成交（部分成交，余下资金留作现金）
+    fees               FeeSchedule 阶梯费率（按累计成交额分档，区分maker/taker），缺省为策略的commission
+    liquidity          'taker'（市价单）或 'maker'（挂单），决定使用哪一列费率
+
+成交位置和价格用数组运算得到，逐笔交易的资金链在 kernels.execution_chain 中计算，
+不增加逐K线的Python开销，参数扫描中同样适用：
+
+    strategy = RSIStrategy(data, execution=ExecutionModel(fill='next_open', spread_bps=5, impact=0.1))
+"""
+
+import numpy as np
+
+from kernels import execution_chain
+
+
+class FeeSchedule:
+    """阶梯手续费：tiers 为 [(累计成交额下限, maker费率, taker费率), ...]，按下限升序，首档下限为0"""
+
+    def __init__(self, tiers):
+        tiers = sorted(tiers)
+        if not tiers or tiers[0][0] != 0:
+            raise ValueError("费率档位需从累计成交额0开始")
+        self.tiers = [(float(threshold), float(maker), float(taker)) for threshold, maker, taker in tiers]
+
+    @classmethod
+    def flat(cls, rate):
+        """单一费率"""
+        return cls([(0, rate, rate)])
+
+    def __repr__(self):
+        return f'FeeSchedule({self.tiers})'
+
+    def arrays(self, liquidity='taker'):
+        """(档位下限数组, 费率数组)"""
+        column = 1 if liquidity == 'maker' else 2
+        return (np.array([tier[0] for tier in self.tiers]),
+                np.array([tier[column] for tier in self.tiers]))
+
+
+class ExecutionModel:
+    """成交模型（见模块说明）"""
+
+    def __init__(self, fill='close', spread_bps=0.0, impact=0.0, max_participation=0.0, fees=None,
+                 liquidity='taker'):
+        if fill not in ('close', 'next_open'):
+            raise ValueError(f"未知成交方式: {fill}")
+        if liquidity not in ('taker', 'maker'):
+            raise ValueError(f"未知流动性类型: {liquidity}")
+        self.fill = fill
+        self.spread_bps = float(spread_bps)
+        self.impact = float(impact)
+        self.max_participation = float(max_participation)
+        self.fees = fees
+        self.liquidity = liquidity
+
+    @classmethod
+    def from_config(cls, config):
+        """由配置dict创建（fee_tiers 为 [[累计成交额下限, maker费率, taker费率], ...]）"""
+        config = dict(config)
+        tiers = config.pop('fee_tiers', None)
+        if tiers is not None:
+            config['fees'] = FeeSchedule([tuple(tier) for tier in tiers])
+        return cls(**config)
+
+    def __repr__(self):
+        # 同时用作结果缓存键的一部分，需包含全部参数
+        return (f'ExecutionModel(fill={self.fill!r}, spread_bps={self.spread_bps}, impact={self.impact}, '
+                f'max_participation={self.max_participation}, fees={self.fees!r}, liquidity={self.liquidity!r})')
+
+    def schedule(self, buy_idx, sell_idx, open_, close):
+        """由信号K线位置确定成交K线和参考成交价（不含价差和冲击）
+
+        buy_idx/sell_idx: 买入/卖出信号所在K线（sell_idx 可比 buy_idx 少一个，即最后一笔未平仓）
+        open_: 开盘价（fill='next_open' 时需要）
+        返回dict：entry_index, exit_index, forced, entry_base, exit_base（均为每笔交易一个元素的数组）
+        """
+        n = len(close)
+        buy_idx = np.asarray(buy_idx, dtype=np.int64)
+        sell_idx = np.asarray(sell_idx, dtype=np.int64)
+        if self.fill == 'next_open':
+            if open_ is None:
+                raise ValueError("fill='next_open' 需要 Open 列")
+            entry_index = buy_idx + 1
+            exit_index = sell_idx + 1
+            # 最后一根K线上的买入信号没有下一根K线可成交
+            keep = entry_index < n
+            entry_index = entry_index[keep]
+            exit_index = exit_index[:len(entry_index)]
+            base_entry = open_[entry_index]
+        else:
+            entry_index = buy_idx
+            exit_index = sell_idx
+            base_entry = close[entry_index]
+
+        # 未平仓（或卖出成交落在数据之外）的最后一笔按最后收盘价强制平仓
+        n_trades = len(entry_index)
+        exit_index = exit_index[exit_index < n]
+        forced = np.arange(n_trades) >= len(exit_index)
+        exit_index = np.concatenate((exit_index, np.full(n_trades - len(exit_index), n - 1, dtype=np.int64)))
+        base_exit = np.array((open_ if self.fill == 'next_open' else close)[exit_index], dtype=float)
+        base_exit[forced] = close[n - 1]
+        return {
+            'entry_index': entry_index,
+            'exit_index': exit_index,
+            'forced': forced,
+            'entry_base': np.asarray(base_entry, dtype=float),
+            'exit_base': base_exit,
+        }
+
+    def settle(self, orders, volume, initial_capital, commission, fractions=None):
+        """按成交顺序计算价差、冲击、部分成交和手续费
+
+        orders: schedule() 的结果（可经 risk.RiskManager 调整离场）；volume: 成交量，None表示不限制且无冲击成本
+        fractions: 每笔交易投入资金的比例，None表示全仓
+        返回dict：在 orders 基础上增加 units, cash_left, entry_price, exit_price, entry_capital, exit_capital
+        """
+        entry_index, exit_index = orders['entry_index'], orders['exit_index']
+        n_trades = len(entry_index)
+        half_spread = self.spread_bps / 2e4
+        entry_prices = orders['entry_base'] * (1 + half_spread)
+        exit_prices = orders['exit_base'] * (1 - half_spread)
+
+        if volume is None:
+            entry_volumes = exit_volumes = np.full(n_trades, np.nan)
+        else:
+            entry_volumes, exit_volumes = volume[entry_index], volume[exit_index]
+
+        fees = self.fees if self.fees is not None else FeeSchedule.flat(commission)
+        thresholds, rates = fees.arrays(self.liquidity)
+        units, cash_left, entry_fills, exit_fills, entry_capitals, exit_capitals = execution_chain(
+            entry_prices, exit_prices, entry_volumes, exit_volumes, initial_capital, self.impact,
+            self.max_participation, thresholds, rates, rates, fractions
+        )
+        fills = dict(orders)
+        fills.update({
+            'units': units,
+            'cash_left': cash_left,
+            'entry_price': entry_fills,
+            'exit_price': exit_fills,
+            'entry_capital': entry_capitals,
+            'exit_capital': exit_capitals,
+        })
+        return fills
+
+    def execute(self, buy_idx, sell_idx, open_, close, volume, initial_capital, commission):
+        """由信号K线位置计算成交（schedule + settle）
+
+        返回dict：entry_index, exit_index, forced, units, cash_left, entry_price, exit_price,
+                 entry_capital, exit_capital（均为每笔交易一个元素的数组）
+        """
+        orders = self.schedule(buy_idx, sell_idx, open_, close)
+        return self.settle(orders, volume, initial_capital, commission)
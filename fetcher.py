@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发行情下载
+多个币种/K线级别的下载在线程池中并发执行（asyncio 调度，信号量限制并发数），
+失败时按指数退避重试；下载函数可注入，便于测试时替换为本地桩函数或桩服务器。
+
+    results = fetch_many([('BTC-USD', '1d'), ('ETH-USD', '1h')], period='6mo')
+    results[('BTC-USD', '1d')]   # DataFrame，或下载失败时的异常对象
+
+    load_many(pairs, '6mo')      # 经由本地行情库（增量刷新）并发读取
+
+YahooChartFetcher 直接请求 Yahoo 的 chart 接口，每个工作线程复用一个HTTP会话（连接池），
+base_url 可指向本地桩服务器。
+"""
+
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_store import OHLCVStore, normalize_ohlcv, yfinance_download
+
+
+class FetchError(Exception):
+    """下载失败；retryable=False 表示重试无意义（如代码不存在）"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class YahooChartFetcher:
+    """Yahoo Finance chart 接口下载器（与 yfinance_download 参数相同，返回规范化的OHLCV）"""
+
+    def __init__(self, base_url='https://query2.finance.yahoo.com', timeout=10, pool_size=16):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    def _session(self):
+        """当前线程的HTTP会话（保持连接，跨请求复用）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = 'Mozilla/5.0 (StrategyLab)'
+            self._local.session = session
+        return session
+
+    def __call__(self, ticker, interval, period=None, start=None):
+        params = {'interval': interval, 'includePrePost': 'false'}
+        if start is not None:
+            params['period1'] = int(pd.Timestamp(start).timestamp())
+            params['period2'] = int(pd.Timestamp.now(tz='UTC').timestamp())
+        else:
+            params['range'] = period
+
+        response = self._session().get(f'{self.base_url}/v8/finance/chart/{ticker}', params=params,
+                                       timeout=self.timeout)
+        if response.status_code == 404:
+            raise FetchError(f'{ticker}: 代码不存在', retryable=False)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise FetchError(f'{ticker}: HTTP {response.status_code}')
+        if response.status_code != 200:
+            raise FetchError(f'{ticker}: HTTP {response.status_code}', retryable=False)
+        return self.parse(response.json())
+
+    @staticmethod
+    def parse(payload):
+        """把 chart 接口的JSON解析为规范化的OHLCV DataFrame"""
+        chart = payload.get('chart', {})
+        if chart.get('error'):
+            raise FetchError(str(chart['error']), retryable=False)
+        result = (chart.get('result') or [None])[0]
+        if not result or not result.get('timestamp'):
+            return normalize_ohlcv(pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'],
+                                                index=pd.DatetimeIndex([], tz='UTC')))
+
+        quote = result['indicators']['quote'][0]
+        index = pd.to_datetime(np.asarray(result['timestamp'], dtype=np.int64), unit='s', utc=True)
+        data = pd.DataFrame({
+            name.capitalize(): np.asarray(quote.get(name), dtype=float)
+            for name in ['open', 'high', 'low', 'close', 'volume']
+        }, index=index)
+        return normalize_ohlcv(data)
+
+
+async def _fetch_one(job, fetch, executor, semaphore, retries, backoff):
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        for attempt in range(retries + 1):
+            try:
+                return await loop.run_in_executor(executor, lambda: fetch(*job))
+            except Exception as e:
+                if attempt == retries or (isinstance(e, FetchError) and not e.retryable):
+                    return e
+            # 指数退避，加随机抖动避免多个任务同时重试
+            await asyncio.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def fetch_many_async(jobs, fetch, max_concurrency=8, retries=3, backoff=0.5):
+    """并发执行 fetch(*job)，返回 {job: 结果或异常}"""
+    jobs = list(dict.fromkeys(jobs))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        results = await asyncio.gather(*[
+            _fetch_one(job, fetch, executor, semaphore, retries, backoff) for job in jobs
+        ])
+    return dict(zip(jobs, results))
+
+
+def fetch_many(pairs, period='6mo', fetcher=yfinance_download, max_concurrency=8, retries=3, backoff=0.5):
+    """并发下载多个 (币种, K线级别)，返回 {(币种, K线级别): 规范化的DataFrame或异常}
+
+    fetcher: 下载函数 fetcher(ticker, interval, period=None, start=None)，
+             默认为 yfinance，可换成 YahooChartFetcher() 或测试用的桩函数
+    """
+    def fetch(ticker, interval):
+        return normalize_ohlcv(fetcher(ticker, interval, period=period))
+
+    return asyncio.run(fetch_many_async(pairs, fetch, max_concurrency, retries, backoff))
+
+
+def load_many(pairs, period, store=None, max_concurrency=8, retries=3, backoff=0.5):
+    """通过本地行情库并发刷新并读取多个 (币种, K线级别)，返回 {(币种, K线级别): OHLCVColumns/None/异常}"""
+    store = store if store is not None else OHLCVStore()
+
+    def load(ticker, interval):
+        return store.load_columns(ticker, interval, period)
+
+    return asyncio.run(fetch_many_async(pairs, load, max_concurrency, retries, backoff))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标库
+集中实现各策略使用的技术指标，并按 (数据指纹, 指标, 参数) 缓存计算结果，
+同一份数据上的不同策略、参数扫描和Streamlit重复运行都可以直接复用
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# ============ 指标计算 ============
+def sma(values, window):
+    """简单移动平均"""
+    return pd.Series(values, copy=False).rolling(window=window).mean().to_numpy()
+
+
+def rolling_std(values, window):
+    """滚动标准差（样本标准差）"""
+    return pd.Series(values, copy=False).rolling(window=window).std().to_numpy()
+
+
+def rolling_max(values, window):
+    """滚动最大值"""
+    return pd.Series(values, copy=False).rolling(window=window).max().to_numpy()
+
+
+def rolling_min(values, window):
+    """滚动最小值"""
+    return pd.Series(values, copy=False).rolling(window=window).min().to_numpy()
+
+
+def ema(values, span):
+    """指数移动平均"""
+    return pd.Series(values, copy=False).ewm(span=span).mean().to_numpy()
+
+
+def rsi(values, period):
+    """RSI（简单移动平均版本）"""
+    delta = pd.Series(values, copy=False).diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    rs = gain / loss
+    return (100 - (100 / (1 + rs))).to_numpy()
+
+
+INDICATORS = {
+    'sma': sma,
+    'std': rolling_std,
+    'max': rolling_max,
+    'min': rolling_min,
+    'ema': ema,
+    'rsi': rsi,
+}
+
+
+# ============ 缓存 ============
+def fingerprint(values):
+    """数据指纹（内容哈希），内容相同的数组指纹相同"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    digest = hashlib.blake2b(values.view(np.uint8), digest_size=16).hexdigest()
+    return f'{len(values)}:{digest}'
+
+
+class IndicatorCache:
+    """线程安全的LRU指标缓存（按条目数和总字节数限制容量）"""
+
+    def __init__(self, maxsize=1024, max_bytes=256 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """命中则返回缓存数组，否则计算并缓存（缓存的数组为只读）"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        values = compute()
+        values.flags.writeable = False
+        if self.maxsize <= 0 or values.nbytes > self.max_bytes:
+            return values
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = values
+                self._bytes += values.nbytes
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return values
+
+    def stats(self):
+        """命中/未命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 进程内共享的默认缓存
+DEFAULT_CACHE = IndicatorCache()
+
+
+def get_indicator(name, values, *params, data_fingerprint=None, cache=DEFAULT_CACHE):
+    """计算（或从缓存取出）指标数组
+
+    data_fingerprint: values的指纹，调用方已知时传入可避免重复哈希；
+                      也可以是任意可哈希的标识（如派生序列的 (原指纹, 指标, 参数)）
+    cache: 指标缓存，None表示不缓存
+    """
+    compute = INDICATORS[name]
+    if cache is None:
+        return compute(values, *params)
+    if data_fingerprint is None:
+        data_fingerprint = fingerprint(values)
+    return cache.get_or_compute((data_fingerprint, name) + params, lambda: compute(values, *params))
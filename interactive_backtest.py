@@ -5,296 +5,81 @@
 整合多币种和多策略回测功能，提供Web界面
 """
 
+import hashlib
+
 import streamlit as st
 import numpy as np
 import pandas as pd
-import yfinance as yf
-import plotly.graph_objs as go
-from plotly.subplots import make_subplots
 from datetime import datetime
+from data_store import OHLCVStore
+from downsampling import bucket_envelope, lttb_indices, minmax_indices
+from execution import ExecutionModel
+from indicators import DEFAULT_CACHE
+from monte_carlo import block_bootstrap, entry_delays, shuffle_trades, summarize
+from optimizer import grid_size, parameter_grid, random_parameters, run_sweep
+from profiling import STAGE_STATS, RunProfile, span
+from registry import REGISTRY
+from resample import derivable_intervals
+from result_cache import DEFAULT_RESULT_CACHE, ResultCache, cached_backtest, data_fingerprint
+from risk import RiskManager
+from serving import JobPool, SharedDataCache
+# 兼容旧的导入方式（from interactive_backtest import RSIStrategy）；界面本身通过注册表取策略类
+from strategies import (StrategyBase, MAStrategy, RSIStrategy, BollingerStrategy,  # noqa: F401
+                        MACDStrategy, MomentumStrategy)
 import warnings
 warnings.filterwarnings('ignore')
 
 
-# ============ 策略基类 ============
-class StrategyBase:
-    """策略基类"""
-
-    def __init__(self, data, initial_capital=10000, commission=0.001):
-        self.data = data.copy()
-        self.initial_capital = initial_capital
-        self.commission = commission
-
-    def generate_signals(self, **params):
-        """生成交易信号（子类实现）"""
-        raise NotImplementedError
-
-    def backtest(self, signals):
-        """回测引擎"""
-        capital = self.initial_capital
-        position = 0
-        entry_capital = 0
-        trades = []
-        portfolio_values = []
-        buy_signals = []
-        sell_signals = []
-
-        for i in range(len(signals)):
-            price = float(self.data['Close'].iloc[i])
-            signal = int(signals.iloc[i])
-            date = self.data.index[i]
-
-            # 买入
-            if signal == 1 and position == 0:
-                position = (capital * (1 - self.commission)) / price
-                entry_capital = capital
-                capital = 0
-                trades.append({'type': 'BUY', 'price': price, 'date': date})
-                buy_signals.append({'date': date, 'price': price, 'index': i})
-
-            # 卖出
-            elif signal == -1 and position > 0:
-                capital = position * price * (1 - self.commission)
-                profit = capital - entry_capital
-                trades.append({
-                    'type': 'SELL',
-                    'price': price,
-                    'date': date,
-                    'profit': profit,
-                    'profit_pct': (profit / entry_capital) * 100
-                })
-                sell_signals.append({'date': date, 'price': price, 'index': i})
-                position = 0
-
-            # 记录资产价值
-            portfolio_value = position * price if position > 0 else capital
-            portfolio_values.append(portfolio_value)
-
-        # 强制平仓
-        if position > 0:
-            last_price = float(self.data['Close'].iloc[-1])
-            last_date = self.data.index[-1]
-            capital = position * last_price * (1 - self.commission)
-            profit = capital - entry_capital
-            trades.append({
-                'type': 'SELL (Close)',
-                'price': last_price,
-                'date': last_date,
-                'profit': profit,
-                'profit_pct': (profit / entry_capital) * 100
-            })
-            sell_signals.append({'date': last_date, 'price': last_price, 'index': len(signals)-1})
-
-        return self._calculate_performance(portfolio_values, trades, buy_signals, sell_signals)
-
-    def _calculate_performance(self, portfolio_values, trades, buy_signals, sell_signals):
-        """计算绩效指标"""
-        final_value = portfolio_values[-1]
-        total_return = ((final_value - self.initial_capital) / self.initial_capital) * 100
-
-        # 最大回撤
-        portfolio_series = pd.Series(portfolio_values)
-        cummax = portfolio_series.cummax()
-        drawdown = (portfolio_series - cummax) / cummax
-        max_drawdown = drawdown.min() * 100
-
-        # 胜率
-        sell_trades = [t for t in trades if 'SELL' in t['type']]
-        winning_trades = [t for t in sell_trades if t.get('profit', 0) > 0]
-        win_rate = (len(winning_trades) / len(sell_trades) * 100) if sell_trades else 0
-
-        # 夏普比率
-        returns = portfolio_series.pct_change().dropna()
-        sharpe = (returns.mean() / returns.std()) * np.sqrt(252) if returns.std() != 0 else 0
-
-        # 买入持有收益
-        buy_hold_return = ((float(self.data['Close'].iloc[-1]) / float(self.data['Close'].iloc[0])) - 1) * 100
-
-        return {
-            'total_return': total_return,
-            'final_value': final_value,
-            'max_drawdown': max_drawdown,
-            'win_rate': win_rate,
-            'sharpe_ratio': sharpe,
-            'num_trades': len(sell_trades),
-            'buy_hold_return': buy_hold_return,
-            'portfolio_values': portfolio_values,
-            'trades': trades,
-            'buy_signals': buy_signals,
-            'sell_signals': sell_signals
-        }
-
-
-# ============ 策略1: 移动平均线交叉 ============
-class MAStrategy(StrategyBase):
-    """移动平均线交叉策略"""
-
-    def generate_signals(self, short_window=5, long_window=20, use_filter=True):
-        df = self.data.copy()
-        df['MA_short'] = df['Close'].rolling(window=short_window).mean()
-        df['MA_long'] = df['Close'].rolling(window=long_window).mean()
-
-        if use_filter:
-            df['MA_trend'] = df['Close'].rolling(window=50).mean()
-
-        df['Signal'] = 0
-
-        for i in range(1, len(df)):
-            # 金叉
-            if (float(df['MA_short'].iloc[i]) > float(df['MA_long'].iloc[i]) and
-                float(df['MA_short'].iloc[i-1]) <= float(df['MA_long'].iloc[i-1])):
-                if not use_filter or float(df['Close'].iloc[i]) > float(df['MA_trend'].iloc[i]):
-                    df.iloc[i, df.columns.get_loc('Signal')] = 1
-
-            # 死叉
-            elif (float(df['MA_short'].iloc[i]) < float(df['MA_long'].iloc[i]) and
-                  float(df['MA_short'].iloc[i-1]) >= float(df['MA_long'].iloc[i-1])):
-                df.iloc[i, df.columns.get_loc('Signal')] = -1
-
-        return df['Signal'].fillna(0)
-
-
-# ============ 策略2: RSI均值回归 ============
-class RSIStrategy(StrategyBase):
-    """RSI均值回归策略"""
-
-    def generate_signals(self, rsi_period=14, oversold=35, overbought=80):
-        df = self.data.copy()
-
-        # 计算RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=rsi_period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-
-        df['Signal'] = 0
-        position = 0
-
-        for i in range(1, len(df)):
-            rsi = float(df['RSI'].iloc[i])
-
-            if rsi < oversold and position == 0:
-                df.iloc[i, df.columns.get_loc('Signal')] = 1
-                position = 1
-            elif rsi > overbought and position == 1:
-                df.iloc[i, df.columns.get_loc('Signal')] = -1
-                position = 0
-
-        return df['Signal'].fillna(0)
-
-
-# ============ 策略3: 布林带突破 ============
-class BollingerStrategy(StrategyBase):
-    """布林带突破策略"""
-
-    def generate_signals(self, period=20, num_std=2):
-        df = self.data.copy()
-
-        df['MA'] = df['Close'].rolling(window=period).mean()
-        df['STD'] = df['Close'].rolling(window=period).std()
-        df['Upper'] = df['MA'] + (df['STD'] * num_std)
-        df['Lower'] = df['MA'] - (df['STD'] * num_std)
-
-        df['Signal'] = 0
-        position = 0
-
-        for i in range(1, len(df)):
-            price = float(df['Close'].iloc[i])
-            lower = float(df['Lower'].iloc[i])
-            upper = float(df['Upper'].iloc[i])
-
-            if price < lower and position == 0:
-                df.iloc[i, df.columns.get_loc('Signal')] = 1
-                position = 1
-            elif price > upper and position == 1:
-                df.iloc[i, df.columns.get_loc('Signal')] = -1
-                position = 0
-
-        return df['Signal'].fillna(0)
-
-
-# ============ 策略4: MACD ============
-class MACDStrategy(StrategyBase):
-    """MACD策略"""
-
-    def generate_signals(self, fast=12, slow=26, signal=9):
-        df = self.data.copy()
-
-        ema_fast = df['Close'].ewm(span=fast).mean()
-        ema_slow = df['Close'].ewm(span=slow).mean()
-        df['MACD'] = ema_fast - ema_slow
-        df['Signal_Line'] = df['MACD'].ewm(span=signal).mean()
-
-        df['Signal'] = 0
-
-        for i in range(1, len(df)):
-            if (float(df['MACD'].iloc[i]) > float(df['Signal_Line'].iloc[i]) and
-                float(df['MACD'].iloc[i-1]) <= float(df['Signal_Line'].iloc[i-1]) and
-                float(df['MACD'].iloc[i]) < 0):
-                df.iloc[i, df.columns.get_loc('Signal')] = 1
-            elif (float(df['MACD'].iloc[i]) < float(df['Signal_Line'].iloc[i]) and
-                  float(df['MACD'].iloc[i-1]) >= float(df['Signal_Line'].iloc[i-1])):
-                df.iloc[i, df.columns.get_loc('Signal')] = -1
-
-        return df['Signal'].fillna(0)
-
-
-# ============ 策略5: 动量突破 ============
-class MomentumStrategy(StrategyBase):
-    """动量突破策略"""
+# ============ 数据获取 ============
+# 行情缓存的有效期（秒）和后台任务池的工作线程数
+DATA_TTL = 3600
+JOB_WORKERS = 2
+# 后台任务进度的轮询间隔（秒）
+JOB_POLL_SECONDS = 1.0
 
-    def generate_signals(self, lookback=20, entry_threshold=0.02):
-        df = self.data.copy()
 
-        df['High_N'] = df['High'].rolling(window=lookback).max()
-        df['Low_N'] = df['Low'].rolling(window=lookback).min()
+def _load_market_data(ticker, period, interval):
+    data = OHLCVStore().load_columns(ticker, interval, period)
+    if data is None or data.empty:
+        return None
+    return data
 
-        df['Signal'] = 0
-        position = 0
 
-        for i in range(lookback, len(df)):
-            price = float(df['Close'].iloc[i])
-            high_n = float(df['High_N'].iloc[i-1])
-            low_n = float(df['Low_N'].iloc[i-1])
+@st.cache_resource
+def shared_data_cache():
+    """进程内所有会话共享的行情缓存（只读列视图，不按会话复制）"""
+    return SharedDataCache(_load_market_data, ttl=DATA_TTL)
 
-            if price > high_n * (1 + entry_threshold) and position == 0:
-                df.iloc[i, df.columns.get_loc('Signal')] = 1
-                position = 1
-            elif price < low_n and position == 1:
-                df.iloc[i, df.columns.get_loc('Signal')] = -1
-                position = 0
 
-        return df['Signal'].fillna(0)
+@st.cache_resource
+def job_pool():
+    """进程内所有会话共享的后台任务池"""
+    return JobPool(max_workers=JOB_WORKERS)
 
 
-# ============ 数据获取 ============
-@st.cache_data(ttl=3600)
 def fetch_data(ticker, period, interval):
-    """获取市场数据（带缓存）"""
+    """获取市场数据（本地行情库增量刷新；返回所有会话共享的只读 OHLCVColumns，调用方不得修改）"""
     try:
-        data = yf.download(ticker, period=period, interval=interval, progress=False)
-        if data.empty:
-            return None
-        return data
+        return shared_data_cache().get(ticker, period, interval)
     except Exception as e:
         st.error(f"获取数据失败: {e}")
         return None
 
 
 # ============ 可视化 ============
-def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=10000):
-    """绘制回测结果"""
-    buy_signals = result['buy_signals']
-    sell_signals = result['sell_signals']
+def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=10000,
+                          max_points=2000, line_method='lttb', webgl_threshold=5000):
+    """绘制回测结果
 
-    # 确保数据格式正确（处理多层级列名）
-    if isinstance(data.columns, pd.MultiIndex):
-        data.columns = data.columns.get_level_values(0)
+    max_points: 每条曲线发送到浏览器的点数上限（None表示不降采样）。收盘价按 line_method
+                （'lttb' 或 'minmax'）抽稀并保留买卖点所在K线，高低价区间和成交量按分桶取极值，
+                资产曲线按分桶最小/最大值抽稀（保留回撤的峰谷）；买卖点标记不抽稀
+    webgl_threshold: 单条曲线点数超过该值时改用WebGL（Scattergl）渲染，None表示不使用
+    """
+    import plotly.graph_objs as go
+    from plotly.subplots import make_subplots
 
-    # 确保索引是DatetimeIndex
-    if not isinstance(data.index, pd.DatetimeIndex):
-        data.index = pd.to_datetime(data.index)
+    trades = result['trades']
 
     fig = make_subplots(
         rows=3, cols=1,
@@ -311,15 +96,30 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
     # 第一个图：价格和买卖点
     # 提取价格数据（确保是Series类型）
     dates = data.index
-    high_prices = data['High'].values if 'High' in data.columns else data['Close'].values
-    low_prices = data['Low'].values if 'Low' in data.columns else data['Close'].values
-    close_prices = data['Close'].values
+    close_prices = np.asarray(data['Close'])
+    high_prices = np.asarray(data['High']) if 'High' in data.columns else close_prices
+    low_prices = np.asarray(data['Low']) if 'Low' in data.columns else close_prices
+    volume_data = np.asarray(data['Volume']) if 'Volume' in data.columns else np.zeros(len(data))
+    portfolio_values = np.asarray(result['portfolio_values'], dtype=float)
+
+    # 降采样：各曲线只保留按点数预算选出的K线
+    n_bars = len(dates)
+    budget = max_points or n_bars
+    band_idx, band = bucket_envelope(budget, n_bars, high=(high_prices, 'max'),
+                                     low=(low_prices, 'min'), volume=(volume_data, 'max'))
+    select = lttb_indices if line_method == 'lttb' else minmax_indices
+    signal_idx = np.concatenate((trades['entry_index'], trades['exit_index']))
+    close_idx = np.union1d(select(close_prices, budget), signal_idx)
+    equity_idx = minmax_indices(portfolio_values, budget)
+
+    largest = max(len(band_idx), len(close_idx), len(equity_idx), len(trades))
+    Scatter = go.Scattergl if webgl_threshold is not None and largest > webgl_threshold else go.Scatter
 
     # 高低价区间
     fig.add_trace(
-        go.Scatter(
-            x=dates,
-            y=high_prices,
+        Scatter(
+            x=dates[band_idx],
+            y=band['high'],
             mode='lines',
             line=dict(width=0),
             showlegend=False,
@@ -329,9 +129,9 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
     )
 
     fig.add_trace(
-        go.Scatter(
-            x=dates,
-            y=low_prices,
+        Scatter(
+            x=dates[band_idx],
+            y=band['low'],
             mode='lines',
             line=dict(width=0),
             fillcolor='rgba(180,180,180,0.2)',
@@ -344,9 +144,9 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
 
     # 收盘价线
     fig.add_trace(
-        go.Scatter(
-            x=dates,
-            y=close_prices,
+        Scatter(
+            x=dates[close_idx],
+            y=close_prices[close_idx],
             mode='lines',
             line=dict(color='blue', width=2),
             name='收盘价',
@@ -356,13 +156,11 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
     )
 
     # 买入点
-    if buy_signals:
-        buy_dates = [s['date'] for s in buy_signals]
-        buy_prices = [s['price'] for s in buy_signals]
+    if len(trades):
         fig.add_trace(
-            go.Scatter(
-                x=buy_dates,
-                y=buy_prices,
+            Scatter(
+                x=trades.entry_dates,
+                y=trades['entry_price'],
                 mode='markers',
                 marker=dict(symbol='triangle-up', size=15, color='green'),
                 name='买入',
@@ -372,13 +170,11 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
         )
 
     # 卖出点
-    if sell_signals:
-        sell_dates = [s['date'] for s in sell_signals]
-        sell_prices = [s['price'] for s in sell_signals]
+    if len(trades):
         fig.add_trace(
-            go.Scatter(
-                x=sell_dates,
-                y=sell_prices,
+            Scatter(
+                x=trades.exit_dates,
+                y=trades['exit_price'],
                 mode='markers',
                 marker=dict(symbol='triangle-down', size=15, color='red'),
                 name='卖出',
@@ -388,11 +184,10 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
         )
 
     # 第二个图：成交量
-    volume_data = data['Volume'].values if 'Volume' in data.columns else [0] * len(data)
     fig.add_trace(
         go.Bar(
-            x=dates,
-            y=volume_data,
+            x=dates[band_idx],
+            y=band['volume'],
             name='成交量',
             marker_color='rgba(100,100,100,0.3)',
             hovertemplate='日期: %{x}<br>成交量: %{y:,.0f}<extra></extra>'
@@ -402,9 +197,9 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
 
     # 第三个图：资产价值
     fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=result['portfolio_values'],
+        Scatter(
+            x=dates[equity_idx],
+            y=portfolio_values[equity_idx],
             mode='lines',
             line=dict(color='green', width=2),
             fill='tozeroy',
@@ -429,8 +224,8 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
     fig.update_xaxes(rangeslider_visible=False, row=3, col=1)
 
     # 设置Y轴范围和标题
-    price_min = float(data['Low'].min())
-    price_max = float(data['High'].max())
+    price_min = float(np.nanmin(low_prices))
+    price_max = float(np.nanmax(high_prices))
     price_range = price_max - price_min
 
     fig.update_yaxes(
@@ -463,102 +258,86 @@ def plot_backtest_results(data, result, ticker, strategy_name, initial_capital=1
 
 
 # ============ Streamlit 应用 ============
-def main():
-    st.set_page_config(page_title="StrategyLab", layout="wide", page_icon="📊")
-
-    st.title("📊 StrategyLab")
-    st.markdown("---")
-
-    # 侧边栏 - 参数配置
-    st.sidebar.header("⚙️ 回测参数")
-
-    # 币种选择
-    ticker = st.sidebar.selectbox(
-        "选择加密货币",
-        options=['BTC-USD', 'ETH-USD', 'BNB-USD', 'SOL-USD', 'DOGE-USD'],
-        index=0,
-        help="选择要回测的加密货币"
-    )
-
-    # 周期选择
-    period = st.sidebar.selectbox(
-        "回测周期",
-        options=['1mo', '3mo', '6mo', '1y', '2y'],
-        index=2,
-        help="选择历史数据的时间范围"
-    )
-
-    # K线级别
-    interval = st.sidebar.selectbox(
-        "K线级别",
-        options=['1d', '1h', '4h'],
-        index=0,
-        help="选择K线的时间间隔"
-    )
-
-    # 初始资金
-    initial_capital = st.sidebar.number_input(
-        "初始资金 ($)",
-        min_value=100,
-        max_value=1000000,
-        value=10000,
-        step=1000,
-        help="设置回测的初始资金"
-    )
-
-    st.sidebar.markdown("---")
-
-    # 策略选择
-    strategy_name = st.sidebar.selectbox(
-        "选择策略",
-        options=[
-            'RSI均值回归',
-            '移动平均线交叉',
-            '布林带突破',
-            'MACD',
-            '动量突破'
-        ],
-        index=0,
-        help="选择交易策略"
-    )
+def strategy_class(strategy_name):
+    """按界面显示名称取策略类（首次使用时才导入）"""
+    return REGISTRY.get(REGISTRY.display_names()[strategy_name])
+
+
+def render_execution_inputs():
+    """侧边栏的成交模型设置，全部为默认值时返回None（信号K线收盘价成交，只收手续费）"""
+    with st.sidebar.expander("🏦 成交模型", expanded=False):
+        fill = st.radio("成交价", options=['close', 'next_open'], horizontal=True,
+                        format_func=lambda v: '信号K线收盘价' if v == 'close' else '下一根K线开盘价')
+        spread_bps = st.number_input("买卖价差 (基点)", min_value=0.0, max_value=100.0, value=0.0, step=1.0)
+        impact = st.number_input("冲击系数", min_value=0.0, max_value=5.0, value=0.0, step=0.05,
+                                 help="滑点 = 冲击系数 × √(成交数量 / K线成交量)")
+        participation = st.number_input("最大成交量占比 (%)", min_value=0.0, max_value=100.0, value=0.0,
+                                        step=1.0, help="单笔成交量占K线成交量的上限，超出部分不成交；0表示不限制")
+    if fill == 'close' and spread_bps == 0 and impact == 0 and participation == 0:
+        return None
+    return ExecutionModel(fill=fill, spread_bps=spread_bps, impact=impact,
+                          max_participation=participation / 100)
+
+
+def render_risk_inputs():
+    """侧边栏的风险控制设置，全部为默认值时返回None（全仓进出，只按策略信号离场）"""
+    with st.sidebar.expander("🛡️ 风险控制", expanded=False):
+        stop_loss = st.number_input("止损 (%)", min_value=0.0, max_value=50.0, value=0.0, step=0.5,
+                                    help="K线最低价跌破入场价的该比例时离场；0表示不启用")
+        trailing_stop = st.number_input("移动止损 (%)", min_value=0.0, max_value=50.0, value=0.0, step=0.5,
+                                        help="K线最低价从入场以来最高价回落该比例时离场")
+        take_profit = st.number_input("止盈 (%)", min_value=0.0, max_value=100.0, value=0.0, step=0.5,
+                                      help="K线最高价超过入场价的该比例时离场")
+        position_size = st.slider("仓位比例 (%)", 5, 100, 100, 5, help="每笔交易投入资金的比例，其余留作现金")
+        target_vol = st.number_input("目标年化波动率 (%)", min_value=0.0, max_value=200.0, value=0.0, step=5.0,
+                                     help="入场前波动率高于目标时按比例缩小仓位；0表示不启用")
+    if stop_loss == 0 and trailing_stop == 0 and take_profit == 0 and position_size == 100 and target_vol == 0:
+        return None
+    return RiskManager(stop_loss=stop_loss / 100, trailing_stop=trailing_stop / 100, take_profit=take_profit / 100,
+                       position_size=position_size / 100, target_vol=target_vol / 100)
 
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("📈 策略参数")
 
-    # 根据不同策略显示不同参数
+def render_param_inputs(strategy_cls):
+    """按策略的参数声明生成侧边栏控件"""
     strategy_params = {}
+    for param in strategy_cls.params:
+        key = f"{strategy_cls.__name__}.{param.name}"
+        if param.kind is bool:
+            strategy_params[param.name] = st.sidebar.checkbox(param.label, value=param.default, key=key,
+                                                              help=param.help)
+        else:
+            strategy_params[param.name] = st.sidebar.slider(param.label, param.low, param.high, param.default,
+                                                            param.step, key=key, help=param.help)
+    return strategy_params
 
-    if strategy_name == 'RSI均值回归':
-        strategy_params['rsi_period'] = st.sidebar.slider("RSI周期", 5, 30, 14)
-        strategy_params['oversold'] = st.sidebar.slider("超卖线", 20, 40, 35)
-        strategy_params['overbought'] = st.sidebar.slider("超买线", 60, 90, 80)
-
-    elif strategy_name == '移动平均线交叉':
-        strategy_params['short_window'] = st.sidebar.slider("短期均线", 3, 20, 5)
-        strategy_params['long_window'] = st.sidebar.slider("长期均线", 10, 50, 20)
-        strategy_params['use_filter'] = st.sidebar.checkbox("使用趋势过滤", value=True)
 
-    elif strategy_name == '布林带突破':
-        strategy_params['period'] = st.sidebar.slider("布林带周期", 10, 30, 20)
-        strategy_params['num_std'] = st.sidebar.slider("标准差倍数", 1.0, 3.0, 2.0, 0.1)
+@st.cache_resource
+def figure_cache():
+    """图表缓存（仅内存，进程内共享）：同一结果重复展示时不再重建图表
 
-    elif strategy_name == 'MACD':
-        strategy_params['fast'] = st.sidebar.slider("快线周期", 5, 20, 12)
-        strategy_params['slow'] = st.sidebar.slider("慢线周期", 15, 40, 26)
-        strategy_params['signal'] = st.sidebar.slider("信号线周期", 5, 15, 9)
+    Streamlit 每次重跑都在新的命名空间中执行本脚本，模块级对象会被重建，因此通过 cache_resource 保留
+    """
+    return ResultCache(maxsize=8)
 
-    elif strategy_name == '动量突破':
-        strategy_params['lookback'] = st.sidebar.slider("回看周期", 10, 50, 20)
-        strategy_params['entry_threshold'] = st.sidebar.slider("突破阈值", 0.01, 0.05, 0.02, 0.01)
+SWEEP_METRIC_LABELS = {
+    'total_return': '总收益率(%)',
+    'sharpe_ratio': '夏普比率',
+    'sortino_ratio': '索提诺比率',
+    'calmar_ratio': '卡玛比率',
+    'max_drawdown': '最大回撤(%)',
+    'win_rate': '胜率(%)',
+    'num_trades': '交易次数',
+}
 
-    st.sidebar.markdown("---")
+# 参数优化页可选的止损比例（%）
+SWEEP_STOP_LEVELS = [1, 2, 3, 5, 8, 10, 15, 20]
 
-    # 运行回测按钮
-    run_backtest = st.sidebar.button("🚀 运行回测", type="primary", use_container_width=True)
 
-    # 主界面
+def render_backtest_tab(run_backtest, ticker, period, interval, initial_capital,
+                        strategy_name, strategy_params, execution=None, risk=None):
+    """单次回测页"""
     if run_backtest:
-        with st.spinner(f"正在获取 {ticker} 数据..."):
+        with st.spinner(f"正在获取 {ticker} 数据..."), span('fetch_data'):
             data = fetch_data(ticker, period, interval)
 
         if data is None or data.empty:
@@ -567,27 +346,24 @@ def main():
 
         st.success(f"✅ 成功获取 {len(data)} 条数据")
 
-        # 执行回测
+        # 执行回测（相同数据、策略和参数的结果直接从缓存取出）
+        strategy_cls = strategy_class(strategy_name)
+        commission = 0.001
         with st.spinner(f"正在运行 {strategy_name} 策略..."):
-            # 选择策略
-            if strategy_name == 'RSI均值回归':
-                strategy = RSIStrategy(data, initial_capital=initial_capital)
-                signals = strategy.generate_signals(**strategy_params)
-            elif strategy_name == '移动平均线交叉':
-                strategy = MAStrategy(data, initial_capital=initial_capital)
-                signals = strategy.generate_signals(**strategy_params)
-            elif strategy_name == '布林带突破':
-                strategy = BollingerStrategy(data, initial_capital=initial_capital)
-                signals = strategy.generate_signals(**strategy_params)
-            elif strategy_name == 'MACD':
-                strategy = MACDStrategy(data, initial_capital=initial_capital)
-                signals = strategy.generate_signals(**strategy_params)
-            elif strategy_name == '动量突破':
-                strategy = MomentumStrategy(data, initial_capital=initial_capital)
-                signals = strategy.generate_signals(**strategy_params)
-
-            # 运行回测
-            result = strategy.backtest(signals)
+            with span('data_fingerprint'):
+                data_fp = data_fingerprint(data)
+            result = cached_backtest(strategy_cls, data, strategy_params, initial_capital=initial_capital,
+                                     commission=commission, data_fp=data_fp, execution=execution, risk=risk)
+
+        # 保存本次结果，供稳健性分析页使用
+        st.session_state['last_backtest'] = {
+            'label': f"{ticker} · {strategy_name}",
+            'result': result,
+            'close': np.asarray(data['Close'], dtype=float),
+            'initial_capital': initial_capital,
+            'commission': commission,
+            'custom_fills': execution is not None or risk is not None,
+        }
 
         st.success("✅ 回测完成！")
 
@@ -631,32 +407,53 @@ def main():
             beat_market = "✅ 跑赢" if result['total_return'] > result['buy_hold_return'] else "❌ 跑输"
             st.metric("vs 市场", beat_market)
 
+        col9, col10, col11, col12 = st.columns(4)
+
+        with col9:
+            st.metric("索提诺比率", f"{result['sortino_ratio']:.2f}")
+
+        with col10:
+            st.metric("卡玛比率", f"{result['calmar_ratio']:.2f}",
+                      help=f"年化收益率 {result['annual_return']:.2f}% / 最大回撤")
+
+        with col11:
+            st.metric("持仓时间占比", f"{result['exposure']:.1f}%")
+
+        with col12:
+            st.metric("换手率", f"{result['turnover']:.1f}x", help="累计成交额 / 平均资产")
+
+        st.caption(f"年化按每年约 {result['periods_per_year']:,.0f} 根K线计算（由数据的K线级别估计）")
+
         # 显示图表
         st.markdown("---")
         st.subheader("📈 回测可视化")
 
-        fig = plot_backtest_results(data, result, ticker, strategy_name, initial_capital)
-        st.plotly_chart(fig, use_container_width=True)
+        with span('plot_backtest_results'):
+            figure_key = (data_fp, strategy_cls.cache_key(strategy_params), ticker, initial_capital,
+                          repr(execution), repr(risk))
+            fig = figure_cache().get_or_compute(
+                figure_key, lambda: plot_backtest_results(data, result, ticker, strategy_name, initial_capital)
+            )
+        with span('plotly_chart'):
+            st.plotly_chart(fig, use_container_width=True)
 
         # 交易记录
         st.markdown("---")
         st.subheader("📋 交易记录")
 
         if result['trades']:
-            trades_df = pd.DataFrame(result['trades'])
-            trades_df['date'] = pd.to_datetime(trades_df['date']).dt.strftime('%Y-%m-%d')
-            trades_df['price'] = trades_df['price'].apply(lambda x: f"${x:,.4f}")
-
-            if 'profit' in trades_df.columns:
-                trades_df['profit'] = trades_df['profit'].apply(
-                    lambda x: f"${x:,.2f}" if pd.notna(x) else "-"
-                )
-            if 'profit_pct' in trades_df.columns:
-                trades_df['profit_pct'] = trades_df['profit_pct'].apply(
-                    lambda x: f"{x:+.2f}%" if pd.notna(x) else "-"
-                )
-
-            st.dataframe(trades_df, use_container_width=True, height=300)
+            trades_df = result['trades'].to_frame()
+            st.dataframe(
+                trades_df,
+                use_container_width=True,
+                height=300,
+                column_config={
+                    'date': st.column_config.DatetimeColumn('date', format='YYYY-MM-DD'),
+                    'price': st.column_config.NumberColumn('price', format='$%,.4f'),
+                    'profit': st.column_config.NumberColumn('profit', format='$%,.2f'),
+                    'profit_pct': st.column_config.NumberColumn('profit_pct', format='%+.2f%%'),
+                }
+            )
         else:
             st.info("本次回测未产生任何交易")
 
@@ -711,5 +508,331 @@ def main():
         st.warning("⚠️ **风险提示**: 历史表现不代表未来收益，所有回测结果仅供参考，不构成投资建议。")
 
 
+def render_sweep_tab(ticker, period, interval, initial_capital, strategy_name, execution=None, risk=None):
+    """参数优化页"""
+    strategy_cls = strategy_class(strategy_name)
+    param_space = strategy_cls.param_space()
+    stop_levels = st.multiselect("同时扫描止损比例 (%)", options=SWEEP_STOP_LEVELS,
+                                 help="止损比例只影响回测，同一组策略参数的信号只生成一次")
+    if stop_levels:
+        param_space['stop_loss'] = [level / 100 for level in stop_levels]
+    total = grid_size(param_space)
+
+    st.markdown(f"对 **{strategy_name}** 的参数进行批量回测，全部组合共 **{total:,}** 个")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        search_mode = st.radio("搜索方式", options=['随机搜索', '网格搜索'], horizontal=True)
+    with col2:
+        n_samples = st.number_input(
+            "随机抽样数量",
+            min_value=10,
+            max_value=total,
+            value=min(500, total),
+            step=10,
+            disabled=search_mode == '网格搜索'
+        )
+    with col3:
+        sort_by = st.selectbox(
+            "排序指标",
+            options=['sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'total_return', 'max_drawdown', 'win_rate'],
+            format_func=lambda m: SWEEP_METRIC_LABELS[m]
+        )
+
+    if st.button("🔍 开始优化", type="primary"):
+        with st.spinner(f"正在获取 {ticker} 数据..."):
+            data = fetch_data(ticker, period, interval)
+
+        if data is None or data.empty:
+            st.error("❌ 无法获取数据，请检查网络连接或稍后重试")
+            return
+
+        if search_mode == '网格搜索':
+            param_sets = parameter_grid(param_space)
+        else:
+            param_sets = random_parameters(param_space, int(n_samples))
+
+        # 在后台任务池中运行，相同数据、策略、参数组合和设置的扫描在会话之间合并为一个任务
+        key = ('sweep', data_fingerprint(data), strategy_cls.__name__,
+               hashlib.blake2b(repr(param_sets).encode(), digest_size=16).hexdigest(),
+               initial_capital, sort_by, repr(execution), repr(risk))
+        job = job_pool().submit(key, lambda progress: run_sweep(
+            strategy_cls, data, param_sets,
+            initial_capital=initial_capital,
+            sort_by=sort_by,
+            execution=execution,
+            risk=risk,
+            progress_callback=progress
+        ), label=f"{ticker} · {strategy_name} · {len(param_sets):,} 组参数")
+        st.session_state['sweep_job'] = job.id
+
+    render_job('sweep_job', render_sweep_result)
+
+
+def render_sweep_result(table):
+    st.success(f"✅ 优化完成，共 {len(table):,} 组参数")
+    cache_stats = DEFAULT_CACHE.stats()
+    st.caption(
+        f"指标缓存：命中 {cache_stats['hits']:,} 次，未命中 {cache_stats['misses']:,} 次，"
+        f"命中率 {cache_stats['hit_rate']:.1%}，缓存 {cache_stats['size']} 项"
+    )
+    st.dataframe(
+        table.rename(columns=SWEEP_METRIC_LABELS),
+        use_container_width=True,
+        height=500
+    )
+
+
+# ============ 后台任务 ============
+def _job_progress(job):
+    """任务进度（在定时重跑的fragment中显示，任务结束后整页重跑以显示结果）"""
+    if job.finished:
+        st.rerun()
+    if job.state == 'queued':
+        st.progress(0.0, text=f"排队中：{job.label}（其他会话的任务正在运行）")
+    elif job.total == 0:
+        st.progress(0.0, text=f"{job.label}：运行中...")
+    else:
+        st.progress(job.progress, text=f"{job.label}：已完成 {job.done:,}/{job.total:,}")
+
+
+def render_job(session_key, render_result):
+    """显示本会话提交的后台任务：未结束时每隔 JOB_POLL_SECONDS 轮询进度，结束后用 render_result 显示结果"""
+    job_id = st.session_state.get(session_key)
+    if job_id is None:
+        return
+    job = job_pool().get(job_id)
+    if job is None:
+        del st.session_state[session_key]
+        st.info("任务结果已过期，请重新运行")
+        return
+    if not job.finished:
+        st.fragment(_job_progress, run_every=JOB_POLL_SECONDS)(job)
+    elif job.state == 'failed':
+        if isinstance(job.error, ValueError):
+            st.warning(f"无法完成：{job.error}")
+        else:
+            st.error(f"❌ 任务失败：{job.error}")
+    else:
+        render_result(job.result)
+
+
+MONTE_CARLO_METHODS = {
+    '收益率分块自助抽样': 'block',
+    '打乱交易顺序': 'shuffle',
+    '随机推迟入场': 'delay',
+}
+
+
+def render_monte_carlo_tab():
+    """稳健性分析页（基于最近一次单次回测的结果）"""
+    last = st.session_state.get('last_backtest')
+    if last is None:
+        st.info("请先在「单次回测」页运行一次回测，再对其结果做稳健性分析")
+        return
+
+    st.markdown(f"对最近一次回测 **{last['label']}** 的结果重复抽样，估计各指标的分布")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        method_label = st.selectbox("抽样方式", options=list(MONTE_CARLO_METHODS))
+    with col2:
+        n_paths = st.number_input("路径数", min_value=100, max_value=20000, value=2000, step=100)
+    with col3:
+        method = MONTE_CARLO_METHODS[method_label]
+        if method == 'block':
+            block_size = st.number_input("分块长度（K线）", min_value=1, max_value=500, value=20)
+        elif method == 'delay':
+            max_delay = st.number_input("最大推迟（K线）", min_value=1, max_value=20, value=3)
+            if last.get('custom_fills'):
+                st.warning("推迟入场按收盘价全仓成交重算，启用成交模型或风险控制时可能无法复现原回测")
+        else:
+            replace = st.checkbox("有放回抽样", value=False,
+                                  help="不放回时总收益率不变，只反映交易顺序对回撤的影响")
+
+    if st.button("🎲 开始模拟", type="primary"):
+        result = last['result']
+        # 在后台任务线程中单进程计算：多线程的服务进程中fork工作进程可能死锁
+        options = {'n_paths': int(n_paths), 'initial_capital': last['initial_capital'], 'max_workers': 1}
+
+        def simulate(progress):
+            if method == 'block':
+                return result, block_bootstrap(result, block_size=int(block_size), **options)
+            if method == 'delay':
+                return result, entry_delays(result, last['close'], max_delay=int(max_delay),
+                                            commission=last['commission'], **options)
+            return result, shuffle_trades(result, replace=replace, **options)
+
+        # 模拟结果依赖本会话的回测结果，不与其他会话合并
+        job = job_pool().submit(None, simulate, label=f"{last['label']} · {int(n_paths):,} 条路径")
+        st.session_state['monte_carlo_job'] = job.id
+
+    render_job('monte_carlo_job', render_monte_carlo_result)
+
+
+def render_monte_carlo_result(job_result):
+    result, distributions = job_result
+    table = summarize(distributions)
+    table.insert(0, '原回测', [result[metric] for metric in table.index])
+    st.dataframe(
+        table.rename(index=SWEEP_METRIC_LABELS).style.format("{:.2f}"),
+        use_container_width=True
+    )
+
+    import plotly.graph_objs as go
+    from plotly.subplots import make_subplots
+
+    metrics = [m for m in table.index if pd.notna(table.loc[m, 'mean'])]
+    fig = make_subplots(rows=1, cols=len(metrics),
+                        subplot_titles=[SWEEP_METRIC_LABELS[m] for m in metrics])
+    for col, metric in enumerate(metrics, start=1):
+        fig.add_trace(go.Histogram(x=distributions[metric], nbinsx=60, showlegend=False), row=1, col=col)
+        fig.add_vline(x=result[metric], line_dash='dash', line_color='red', row=1, col=col)
+    fig.update_layout(height=350, template='plotly_white', bargap=0.02)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_performance_panel(run):
+    """性能面板：本次运行各阶段耗时、本进程各阶段延迟分位数、cProfile报告"""
+    with st.expander("⏱️ 性能", expanded=False):
+        if run is not None and run.spans:
+            st.markdown(f"**本次运行**：共 {run.seconds * 1e3:,.1f} ms（run_id `{run.run_id}`）")
+            spans = pd.DataFrame(run.spans).sort_values('start_ms')
+            spans['stage'] = ['\u3000' * depth + stage for depth, stage in zip(spans['depth'], spans['stage'])]
+            st.dataframe(
+                spans[['stage', 'start_ms', 'duration_ms']].rename(
+                    columns={'stage': '阶段', 'start_ms': '开始(ms)', 'duration_ms': '耗时(ms)'}
+                ).style.format({'开始(ms)': '{:,.1f}', '耗时(ms)': '{:,.1f}'}),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        summary = STAGE_STATS.summary()
+        if summary:
+            st.markdown("**本进程各阶段延迟**（所有会话的最近样本）")
+            st.dataframe(
+                pd.DataFrame(summary).style.format({'p50_ms': '{:,.1f}', 'p99_ms': '{:,.1f}', 'max_ms': '{:,.1f}'}),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.caption("运行一次回测后显示各阶段耗时")
+
+        cache_stats = DEFAULT_RESULT_CACHE.stats()
+        st.caption(
+            f"结果缓存：内存命中 {cache_stats['hits']} · 磁盘命中 {cache_stats['disk_hits']} · "
+            f"未命中 {cache_stats['misses']} · 内存 {cache_stats['size']} 条 · "
+            f"磁盘 {cache_stats['disk_bytes'] / 1024 ** 2:,.2f} MB"
+        )
+        data_stats = shared_data_cache().stats()
+        st.caption(
+            f"行情缓存（所有会话共享）：命中 {data_stats['hits']} · 未命中 {data_stats['misses']} · "
+            f"缓存 {data_stats['size']} 组"
+        )
+        job_stats = job_pool().stats()
+        st.caption(
+            f"后台任务：运行中 {job_stats['running']} · 排队 {job_stats['queued']} · "
+            f"已完成 {job_stats['done']} · 失败 {job_stats['failed']}（{job_stats['workers']} 个工作线程）"
+        )
+
+        if run is not None and run.profile_text() is not None:
+            st.markdown("**cProfile**（按累计耗时排序）")
+            st.code(run.profile_text(), language='text')
+
+
+def main():
+    st.set_page_config(page_title="StrategyLab", layout="wide", page_icon="📊")
+
+    st.title("📊 StrategyLab")
+    st.markdown("---")
+
+    # 侧边栏 - 参数配置
+    st.sidebar.header("⚙️ 回测参数")
+
+    # 币种选择（含本地导入数据的币种）
+    store = OHLCVStore()
+    tickers = ['BTC-USD', 'ETH-USD', 'BNB-USD', 'SOL-USD', 'DOGE-USD']
+    tickers += [t for t in store.imported_tickers() if t not in tickers]
+    ticker = st.sidebar.selectbox(
+        "选择加密货币",
+        options=tickers,
+        index=0,
+        help="选择要回测的加密货币"
+    )
+
+    # 周期选择
+    period = st.sidebar.selectbox(
+        "回测周期",
+        options=['1mo', '3mo', '6mo', '1y', '2y'],
+        index=2,
+        help="选择历史数据的时间范围"
+    )
+
+    # K线级别（有导入数据时由导入的最细K线重采样）
+    base_interval = store.imported_interval(ticker)
+    interval = st.sidebar.selectbox(
+        "K线级别",
+        options=derivable_intervals(base_interval)[::-1] if base_interval else ['1d', '1h', '4h'],
+        index=0,
+        help="选择K线的时间间隔"
+    )
+
+    # 初始资金
+    initial_capital = st.sidebar.number_input(
+        "初始资金 ($)",
+        min_value=100,
+        max_value=1000000,
+        value=10000,
+        step=1000,
+        help="设置回测的初始资金"
+    )
+
+    st.sidebar.markdown("---")
+
+    # 策略选择
+    strategy_name = st.sidebar.selectbox(
+        "选择策略",
+        options=list(REGISTRY.display_names()),
+        index=0,
+        help="选择交易策略"
+    )
+
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("📈 策略参数")
+
+    # 按策略的参数声明显示参数
+    strategy_params = render_param_inputs(strategy_class(strategy_name))
+
+    st.sidebar.markdown("---")
+    execution = render_execution_inputs()
+    risk = render_risk_inputs()
+
+    # 运行回测按钮
+    run_backtest = st.sidebar.button("🚀 运行回测", type="primary", use_container_width=True)
+    profile_run = st.sidebar.checkbox("记录cProfile", value=False, help="在性能面板中显示本次回测的函数级耗时")
+
+    # 主界面
+    tab_backtest, tab_sweep, tab_monte_carlo = st.tabs(["📈 单次回测", "🔍 参数优化", "🎲 稳健性分析"])
+
+    run = None
+    with tab_backtest:
+        if run_backtest:
+            with RunProfile('backtest', profile=profile_run, ticker=ticker, period=period,
+                            interval=interval, strategy=strategy_class(strategy_name).__name__) as run:
+                render_backtest_tab(run_backtest, ticker, period, interval, initial_capital,
+                                    strategy_name, strategy_params, execution, risk)
+        else:
+            render_backtest_tab(run_backtest, ticker, period, interval, initial_capital,
+                                strategy_name, strategy_params, execution, risk)
+
+    with tab_sweep:
+        render_sweep_tab(ticker, period, interval, initial_capital, strategy_name, execution, risk)
+
+    with tab_monte_carlo:
+        render_monte_carlo_tab()
+
+    render_performance_panel(run)
+
+
 if __name__ == '__main__':
     main()
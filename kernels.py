@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+顺序计算内核
+持仓状态机和资金链这类逐步依赖上一状态的循环无法直接向量化。这里提供两种实现：
+安装了numba时编译为机器码（nopython模式，不开启fastmath，浮点运算顺序与参考实现相同，
+结果逐位一致），否则使用纯Python实现。设置环境变量 STRATEGYLAB_DISABLE_JIT=1 可强制使用纯Python。
+"""
+
+import math
+import os
+
+import numpy as np
+
+try:
+    if os.environ.get('STRATEGYLAB_DISABLE_JIT'):
+        raise ImportError
+    from numba import njit
+except ImportError:
+    njit = None
+
+JIT_AVAILABLE = njit is not None
+
+
+# ============ 持仓状态机 ============
+def _position_signals_python(entries, exits):
+    # 只遍历触发了条件的K线
+    signals = np.zeros(len(entries), dtype=np.int64)
+    position = 0
+    for i in np.flatnonzero(entries | exits).tolist():
+        if entries[i] and position == 0:
+            signals[i] = 1
+            position = 1
+        elif exits[i] and position == 1:
+            signals[i] = -1
+            position = 0
+    return signals
+
+
+def _position_signals_compiled(entries, exits):
+    signals = np.zeros(len(entries), dtype=np.int64)
+    position = 0
+    for i in range(len(entries)):
+        if entries[i] and position == 0:
+            signals[i] = 1
+            position = 1
+        elif exits[i] and position == 1:
+            signals[i] = -1
+            position = 0
+    return signals
+
+
+# ============ 资金链 ============
+def _capital_chain_python(entry_prices, exit_prices, initial_capital, commission):
+    entry_prices = entry_prices.tolist()
+    exit_prices = exit_prices.tolist()
+    n = len(entry_prices)
+    units = [0.0] * n
+    entry_capitals = [0.0] * n
+    exit_capitals = [0.0] * n
+    capital = initial_capital
+    for k in range(n):
+        entry_capitals[k] = capital
+        units[k] = (capital * (1 - commission)) / entry_prices[k]
+        capital = units[k] * exit_prices[k] * (1 - commission)
+        exit_capitals[k] = capital
+    return np.array(units), np.array(entry_capitals), np.array(exit_capitals)
+
+
+def _capital_chain_compiled(entry_prices, exit_prices, initial_capital, commission):
+    n = len(entry_prices)
+    units = np.empty(n)
+    entry_capitals = np.empty(n)
+    exit_capitals = np.empty(n)
+    capital = initial_capital
+    for k in range(n):
+        entry_capitals[k] = capital
+        units[k] = (capital * (1 - commission)) / entry_prices[k]
+        capital = units[k] * exit_prices[k] * (1 - commission)
+        exit_capitals[k] = capital
+    return units, entry_capitals, exit_capitals
+
+
+# ============ 带成交模型的资金链 ============
+def _execution_chain_loop(entry_prices, exit_prices, entry_volumes, exit_volumes, initial_capital,
+                          impact, max_participation, tier_thresholds, entry_rates, exit_rates, fractions):
+    n = len(entry_prices)
+    units = np.empty(n)
+    cash_left = np.empty(n)
+    entry_fills = np.empty(n)
+    exit_fills = np.empty(n)
+    entry_capitals = np.empty(n)
+    exit_capitals = np.empty(n)
+    capital = initial_capital
+    traded = 0.0
+    for k in range(n):
+        entry_capitals[k] = capital
+        budget = capital * fractions[k]
+
+        # 买入：按累计成交额取费率档位，成交量受参与率上限约束，冲击成本随参与率的平方根增长
+        tier = 0
+        while tier + 1 < len(tier_thresholds) and traded >= tier_thresholds[tier + 1]:
+            tier += 1
+        fee = entry_rates[tier]
+        price = entry_prices[k]
+        size = (budget * (1 - fee)) / price
+        capped = max_participation > 0 and size > max_participation * entry_volumes[k]
+        if capped:
+            size = max_participation * entry_volumes[k]
+        if impact > 0 and entry_volumes[k] > 0:
+            price = price * (1 + impact * math.sqrt(size / entry_volumes[k]))
+            if not capped:
+                size = (budget * (1 - fee)) / price
+        if capped:
+            cash = capital - size * price / (1 - fee)
+        else:
+            cash = capital - budget
+        traded += size * price
+
+        # 卖出
+        tier = 0
+        while tier + 1 < len(tier_thresholds) and traded >= tier_thresholds[tier + 1]:
+            tier += 1
+        fee = exit_rates[tier]
+        exit_price = exit_prices[k]
+        if impact > 0 and exit_volumes[k] > 0:
+            exit_price = exit_price * (1 - impact * math.sqrt(size / exit_volumes[k]))
+        traded += size * exit_price
+        capital = cash + size * exit_price * (1 - fee)
+
+        units[k] = size
+        cash_left[k] = cash
+        entry_fills[k] = price
+        exit_fills[k] = exit_price
+        exit_capitals[k] = capital
+    return units, cash_left, entry_fills, exit_fills, entry_capitals, exit_capitals
+
+
+def _execution_chain_python(entry_prices, exit_prices, entry_volumes, exit_volumes, initial_capital,
+                            impact, max_participation, tier_thresholds, entry_rates, exit_rates, fractions):
+    # 与编译版本相同的循环，输入转为列表以使用Python标量运算
+    return _execution_chain_loop(
+        entry_prices.tolist(), exit_prices.tolist(), entry_volumes.tolist(), exit_volumes.tolist(),
+        initial_capital, impact, max_participation, tier_thresholds.tolist(), entry_rates.tolist(),
+        exit_rates.tolist(), fractions.tolist()
+    )
+
+
+if JIT_AVAILABLE:
+    _position_signals_impl = njit(cache=True, nogil=True)(_position_signals_compiled)
+    _capital_chain_impl = njit(cache=True, nogil=True)(_capital_chain_compiled)
+    _execution_chain_impl = njit(cache=True, nogil=True)(_execution_chain_loop)
+else:
+    _position_signals_impl = _position_signals_python
+    _capital_chain_impl = _capital_chain_python
+    _execution_chain_impl = _execution_chain_python
+
+
+def position_signals(entries, exits):
+    """持仓状态机：空仓时满足入场条件买入（1），持仓时满足离场条件卖出（-1）
+
+    entries/exits: 布尔数组
+    """
+    return _position_signals_impl(np.asarray(entries, dtype=np.bool_), np.asarray(exits, dtype=np.bool_))
+
+
+def capital_chain(entry_prices, exit_prices, initial_capital, commission):
+    """全仓复利的资金链：按成交顺序返回每笔交易的 (持仓数量, 买入前资金, 卖出后资金)"""
+    return _capital_chain_impl(np.asarray(entry_prices, dtype=np.float64),
+                               np.asarray(exit_prices, dtype=np.float64),
+                               float(initial_capital), float(commission))
+
+
+def execution_chain(entry_prices, exit_prices, entry_volumes, exit_volumes, initial_capital, impact=0.0,
+                    max_participation=0.0, tier_thresholds=(0.0,), entry_rates=(0.001,), exit_rates=(0.001,),
+                    fractions=None):
+    """带成交模型的资金链：按成交顺序返回每笔交易的
+    (持仓数量, 买入后剩余现金, 买入成交价, 卖出成交价, 买入前资金, 卖出后资金)
+
+    entry_prices/exit_prices: 已含买卖价差的参考成交价；*_volumes: 成交K线的成交量
+    impact: 冲击系数，滑点 = impact * sqrt(成交数量 / K线成交量)
+    max_participation: 单笔成交量不超过K线成交量的比例（0表示不限制），超出部分不成交
+    tier_thresholds/entry_rates/exit_rates: 按累计成交额分档的费率
+    fractions: 每笔交易投入当时资金的比例（None表示全仓），其余资金留作现金
+    """
+    if fractions is None:
+        fractions = np.ones(len(entry_prices))
+    return _execution_chain_impl(
+        np.asarray(entry_prices, dtype=np.float64), np.asarray(exit_prices, dtype=np.float64),
+        np.asarray(entry_volumes, dtype=np.float64), np.asarray(exit_volumes, dtype=np.float64),
+        float(initial_capital), float(impact), float(max_participation),
+        np.asarray(tier_thresholds, dtype=np.float64), np.asarray(entry_rates, dtype=np.float64),
+        np.asarray(exit_rates, dtype=np.float64), np.asarray(fractions, dtype=np.float64)
+    )
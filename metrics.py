@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+绩效指标
+MetricsAccumulator 按资产价值序列单遍累积全部绩效指标，状态只有几个标量：
+收益率的均值和离差平方和（Welford，分块时按并行方差公式合并）、下行收益平方和、
+历史最高资产和最大回撤、持仓K线数和累计成交额。
+
+    acc = MetricsAccumulator(initial_capital=10000, periods_per_year=infer_periods_per_year(data.index))
+    acc.update_many(portfolio_values)       # 批量：整段数组（回测、参数扫描）
+    acc.update(equity, holding=True)        # 逐K线：模拟盘/实盘每根新K线调用一次
+    acc.result()                            # {'sharpe_ratio': ..., 'sortino_ratio': ..., ...}
+
+两种方式可以混用（先用历史批量预热，再逐K线更新），结果一致。
+年化按K线级别换算：infer_periods_per_year 由时间索引估计每年的K线数（见该函数说明）。
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# 无法从时间索引估计时使用的年化周期数（日线、每年252个交易日）
+DEFAULT_PERIODS_PER_YEAR = 252
+
+_YEAR_SECONDS = 365.25 * 86400
+
+
+def infer_periods_per_year(index, default=DEFAULT_PERIODS_PER_YEAR):
+    """由时间索引估计每年的K线数
+
+    按样本实际覆盖的时间跨度计算（K线数 / 年数），K线级别和交易时段都体现在结果中：
+    全天交易的加密货币日线约365、1小时线约8760，股票日线约252。
+    索引不是时间或不足两根K线时返回 default。
+    """
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return default
+    seconds = (index[-1] - index[0]).total_seconds()
+    if seconds <= 0:
+        return default
+    return (len(index) - 1) / (seconds / _YEAR_SECONDS)
+
+
+class MetricsAccumulator:
+    """单遍绩效指标累加器（见模块说明）"""
+
+    def __init__(self, initial_capital, periods_per_year=DEFAULT_PERIODS_PER_YEAR):
+        self.initial_capital = float(initial_capital)
+        self.periods_per_year = float(periods_per_year)
+        self.count = 0            # 资产价值个数（K线数）
+        self.last_value = None
+        self.value_sum = 0.0
+        # 逐期收益率
+        self.n_returns = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+        # 回撤
+        self.peak = -np.inf
+        self.max_drawdown = 0.0
+        # 持仓和成交
+        self.held_bars = 0
+        self.traded = 0.0
+
+    def update(self, value, holding=False, traded=0.0):
+        """输入一根K线结束时的资产价值（holding: 该K线是否持仓；traded: 该K线的成交额）"""
+        value = float(value)
+        if self.last_value is not None:
+            r = (value - self.last_value) / self.last_value
+            self.n_returns += 1
+            delta = r - self.mean
+            self.mean += delta / self.n_returns
+            self.m2 += delta * (r - self.mean)
+            if r < 0:
+                self.downside_sq += r * r
+        if value > self.peak:
+            self.peak = value
+        drawdown = (value - self.peak) / self.peak
+        if drawdown < self.max_drawdown:
+            self.max_drawdown = drawdown
+        self.count += 1
+        self.value_sum += value
+        self.last_value = value
+        self.held_bars += bool(holding)
+        self.traded += traded
+
+    def update_many(self, values, holding=0, traded=0.0):
+        """批量输入一段资产价值
+
+        holding: 每根K线是否持仓的布尔数组，或这一段的持仓K线数；traded: 这一段的成交额
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        if self.last_value is not None:
+            previous = np.concatenate(([self.last_value], values[:-1]))
+            returns = (values - previous) / previous
+        else:
+            returns = np.diff(values) / values[:-1]
+
+        n = len(returns)
+        if n:
+            mean = returns.mean()
+            deviation = returns - mean
+            m2 = np.dot(deviation, deviation)
+            if self.n_returns == 0:
+                self.mean, self.m2 = mean, m2
+            else:
+                # 并行方差公式合并本段与之前的收益率统计
+                total = self.n_returns + n
+                delta = mean - self.mean
+                self.m2 += m2 + delta * delta * self.n_returns * n / total
+                self.mean += delta * n / total
+            self.n_returns += n
+            downside = np.minimum(returns, 0.0)
+            self.downside_sq += np.dot(downside, downside)
+
+        peaks = np.maximum.accumulate(values)
+        np.maximum(peaks, self.peak, out=peaks)
+        self.max_drawdown = min(self.max_drawdown, float(((values - peaks) / peaks).min()))
+        self.peak = float(peaks[-1])
+        self.count += len(values)
+        self.value_sum += float(values.sum())
+        self.last_value = float(values[-1])
+        self.held_bars += int(np.count_nonzero(holding)) if np.ndim(holding) else int(holding)
+        self.traded += traded
+
+    def result(self):
+        """当前的绩效指标（收益、回撤、暴露度为百分比）"""
+        if self.count == 0:
+            raise ValueError("尚未输入资产价值")
+        final_value = self.last_value
+        std = math.sqrt(self.m2 / (self.n_returns - 1)) if self.n_returns > 1 else 0.0
+        downside = math.sqrt(self.downside_sq / self.n_returns) if self.n_returns else 0.0
+        scale = math.sqrt(self.periods_per_year)
+
+        growth = final_value / self.initial_capital
+        # 按收益率期数（K线间隔数）年化，与 infer_periods_per_year 的计数口径一致
+        periods = max(self.count - 1, 1)
+        annual_return = (growth ** (self.periods_per_year / periods) - 1) * 100 if growth > 0 else -100.0
+        max_drawdown = self.max_drawdown * 100
+        return {
+            'total_return': ((final_value - self.initial_capital) / self.initial_capital) * 100,
+            'final_value': final_value,
+            'annual_return': annual_return,
+            'volatility': std * scale * 100,
+            'max_drawdown': max_drawdown,
+            'sharpe_ratio': self.mean / std * scale if std > 0 else 0,
+            'sortino_ratio': self.mean / downside * scale if downside > 0 else 0,
+            'calmar_ratio': annual_return / -max_drawdown if max_drawdown < 0 else 0,
+            'exposure': self.held_bars / self.count * 100,
+            # 累计成交额相对平均资产的倍数
+            'turnover': self.traded / (self.value_sum / self.count) if self.value_sum > 0 else 0.0,
+            'traded_value': self.traded,
+            'periods_per_year': self.periods_per_year,
+        }
+
+
+def held_bars(trades):
+    """由交易记录得到持仓K线数（买入K线到卖出K线之前；回测结束时强制平仓的最后一根K线仍在持仓中）"""
+    records = trades.records
+    return int((records['exit_index'] - records['entry_index'] + records['forced']).sum())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+蒙特卡洛 / 自助法稳健性分析
+对单次回测结果（_calculate_performance 的返回值）重复抽样，得到总收益率、最大回撤、
+夏普比率的分布和分位数，而不只是一个点估计。支持三种抽样方式：
+
+    shuffle_trades   打乱交易顺序（replace=True 时为有放回地重抽交易）
+    block_bootstrap  对逐K线收益率做循环分块自助抽样
+    entry_delays     随机推迟每笔交易的入场K线数
+
+所有路径按块生成为 路径 × K线 的二维数组一次计算，块之间相互独立，
+max_workers > 1 时在多个进程中并行；随机种子按块派生，结果与进程数无关。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import DEFAULT_PERIODS_PER_YEAR
+
+
+# 每块的元素数上限（路径数 × K线数），控制单块内存占用
+_CHUNK_ELEMENTS = 4_000_000
+
+METRICS = ['total_return', 'max_drawdown', 'sharpe_ratio']
+
+# 工作进程内的共享状态（由 _init_worker 填充）
+_WORKER_STATE = {}
+
+
+# ============ 路径指标 ============
+def _path_metrics(equity, returns, initial_capital, periods_per_year=None):
+    """按行计算每条资产路径的指标（与 _calculate_performance 的口径一致）
+
+    equity: 路径 × 时点 的资产矩阵；returns: 对应的逐期收益率矩阵
+    periods_per_year: 夏普比率年化用的每年K线数，None表示收益率没有时间尺度（夏普比率为NaN）
+    """
+    total_return = (equity[:, -1] / initial_capital - 1) * 100
+    ratio = np.maximum.accumulate(equity, axis=1)
+    np.divide(equity, ratio, out=ratio)
+    max_drawdown = (ratio.min(axis=1) - 1) * 100
+
+    if periods_per_year is not None and returns.shape[1] > 1:
+        mean = returns.mean(axis=1)
+        std = returns.std(axis=1, ddof=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(std != 0, mean / std * np.sqrt(periods_per_year), 0.0)
+    else:
+        sharpe = np.full(len(equity), np.nan)
+    return {'total_return': total_return, 'max_drawdown': max_drawdown, 'sharpe_ratio': sharpe}
+
+
+# ============ 各抽样方式（单块） ============
+def _shuffle_chunk(state, rng, n_paths):
+    factors = state['factors']
+    if state['replace']:
+        draws = factors[rng.integers(0, len(factors), size=(n_paths, len(factors)))]
+    else:
+        draws = rng.permuted(np.broadcast_to(factors, (n_paths, len(factors))), axis=1)
+    initial_capital = state['initial_capital']
+    equity = np.empty((n_paths, len(factors) + 1))
+    equity[:, 0] = initial_capital
+    np.cumprod(draws, axis=1, out=equity[:, 1:])
+    equity[:, 1:] *= initial_capital
+    # 逐笔交易的收益率没有时间尺度，不计算年化夏普
+    return _path_metrics(equity, draws - 1, initial_capital)
+
+
+def _block_chunk(state, rng, n_paths):
+    # wrapped 为首尾相接延长了 block_size-1 的收益率序列，分块越过末尾时无需取模
+    wrapped = state['wrapped']
+    block_size = state['block_size']
+    m = len(wrapped) - block_size + 1
+    n_blocks = -(-m // block_size)
+    starts = rng.integers(0, m, size=(n_paths, n_blocks, 1), dtype=np.int32)
+    index = (starts + np.arange(block_size, dtype=np.int32)).reshape(n_paths, -1)[:, :m]
+    sampled = wrapped[index]
+
+    equity = np.empty((n_paths, m + 1))
+    equity[:, 0] = state['start_value']
+    np.add(sampled, 1, out=equity[:, 1:])
+    np.cumprod(equity[:, 1:], axis=1, out=equity[:, 1:])
+    equity[:, 1:] *= state['start_value']
+    return _path_metrics(equity, sampled, state['initial_capital'], state['periods_per_year'])
+
+
+def _delay_equity(state, delays):
+    """按各路径每笔交易的推迟K线数重算资产曲线，返回 (资产矩阵, 逐K线增长因子)"""
+    close = state['close']
+    entries, exits = state['entries'], state['exits']
+    n = len(close)
+    n_paths = len(delays)
+    delayed = np.minimum(entries + delays, exits)
+    taken = delayed < exits  # 推迟到离场K线（或之后）的交易视为放弃
+    rows = np.broadcast_to(np.arange(n_paths)[:, None], delayed.shape)
+
+    # 持仓区间 [入场, 离场)，用差分数组一次标记
+    position = np.zeros((n_paths, n + 1), dtype=np.int8)
+    position[rows[taken], delayed[taken]] = 1
+    position[rows[taken], exits[np.nonzero(taken)[1]]] = -1
+    held = np.cumsum(position[:, :n], axis=1, dtype=np.int8) > 0
+
+    # 逐K线增长因子：前一根持仓时随价格变动，入场/主动离场时扣除手续费
+    growth = np.ones((n_paths, n))
+    growth[:, 1:] = np.where(held[:, :-1], state['price_ratio'], 1.0)
+    fee = 1 - state['commission']
+    growth[rows[taken], delayed[taken]] *= fee
+    closed = taken & state['closed']
+    growth[rows[closed], exits[np.nonzero(closed)[1]]] *= fee
+
+    equity = np.cumprod(growth, axis=1)
+    equity *= state['initial_capital']
+    return equity, growth
+
+
+def _delay_chunk(state, rng, n_paths):
+    delays = rng.integers(0, state['max_delay'] + 1, size=(n_paths, len(state['entries'])))
+    equity, growth = _delay_equity(state, delays)
+    return _path_metrics(equity, growth[:, 1:] - 1, state['initial_capital'], state['periods_per_year'])
+
+
+_CHUNK_FUNCTIONS = {
+    'shuffle': _shuffle_chunk,
+    'block': _block_chunk,
+    'delay': _delay_chunk,
+}
+
+
+# ============ 调度 ============
+def _init_worker(state):
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(state)
+
+
+def _run_chunk(task):
+    n_paths, seed = task
+    state = _WORKER_STATE
+    return _CHUNK_FUNCTIONS[state['method']](state, np.random.default_rng(seed), n_paths)
+
+
+def _simulate(state, n_paths, path_length, seed, max_workers):
+    """把 n_paths 条路径分块计算并合并各块的指标"""
+    rows_per_chunk = max(1, _CHUNK_ELEMENTS // max(path_length, 1))
+    sizes = [min(rows_per_chunk, n_paths - start) for start in range(0, n_paths, rows_per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(sizes, seeds))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) == 1:
+        _init_worker(state)
+        chunks = [_run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(state,)) as executor:
+            chunks = list(executor.map(_run_chunk, tasks))
+
+    return {metric: np.concatenate([chunk[metric] for chunk in chunks]) for metric in METRICS}
+
+
+# ============ 对外接口 ============
+def shuffle_trades(result, n_paths=1000, replace=False, initial_capital=10000, seed=None,
+                   max_workers=1):
+    """打乱交易顺序（replace=True 时有放回地重抽交易）
+
+    不放回打乱时总收益率不变，只反映交易顺序对最大回撤的影响；
+    逐笔收益率没有时间尺度，sharpe_ratio 为 NaN
+    """
+    factors = 1 + result['trades']['profit_pct'] / 100
+    if len(factors) == 0:
+        raise ValueError("回测结果中没有已平仓的交易")
+    state = {'method': 'shuffle', 'factors': factors, 'replace': replace,
+             'initial_capital': initial_capital}
+    return _simulate(state, n_paths, len(factors), seed, max_workers)
+
+
+def block_bootstrap(result, n_paths=1000, block_size=20, initial_capital=10000, seed=None,
+                    max_workers=1):
+    """对资产曲线的逐K线收益率做循环分块自助抽样（分块保留收益率的短期自相关）"""
+    values = np.asarray(result['portfolio_values'], dtype=float)
+    if len(values) < 2:
+        raise ValueError("资产曲线长度不足")
+    returns = values[1:] / values[:-1] - 1
+    block_size = max(1, min(int(block_size), len(returns)))
+    state = {
+        'method': 'block',
+        'wrapped': np.concatenate((returns, returns[:block_size - 1])),
+        'start_value': values[0],
+        'block_size': block_size,
+        'initial_capital': initial_capital,
+        'periods_per_year': result.get('periods_per_year', DEFAULT_PERIODS_PER_YEAR),
+    }
+    return _simulate(state, n_paths, len(values), seed, max_workers)
+
+
+def entry_delays(result, close, n_paths=1000, max_delay=3, initial_capital=10000,
+                 commission=0.001, seed=None, max_workers=1):
+    """把每笔交易的入场随机推迟 0~max_delay 根K线（离场不变），重新计算资产曲线
+
+    close: 回测所用的收盘价数组；max_delay=0 时得到的资产曲线与原回测一致。
+    资产曲线按收盘价全仓成交、固定 commission 重算，原回测使用了成交模型或风险控制
+    （开盘价成交、价差和冲击、部分仓位、止损/止盈价离场）而无法由此复现时抛出 ValueError
+    """
+    close = np.asarray(close, dtype=float)
+    trades = result['trades']
+    if len(trades) == 0:
+        raise ValueError("回测结果中没有交易")
+    entries = trades['entry_index']
+    exits = trades['exit_index']
+    # 回测末尾强制平仓的交易在资产曲线上不扣离场手续费
+    closed = ~trades['forced']
+
+    state = {
+        'method': 'delay',
+        'close': close,
+        'price_ratio': close[1:] / close[:-1],
+        'entries': entries,
+        'exits': exits,
+        'closed': closed,
+        'max_delay': int(max_delay),
+        'commission': commission,
+        'initial_capital': initial_capital,
+        'periods_per_year': result.get('periods_per_year', DEFAULT_PERIODS_PER_YEAR),
+    }
+    values = result.get('portfolio_values')
+    if values is not None:
+        replay, _ = _delay_equity(state, np.zeros((1, len(entries)), dtype=np.int64))
+        if len(values) != len(close) or not np.allclose(replay[0], values, rtol=1e-9, atol=0):
+            raise ValueError("推迟入场按收盘价全仓成交重算资产曲线，无法复现该回测"
+                             "（使用了成交模型或风险控制，或 close/commission/initial_capital 与回测不一致）")
+    return _simulate(state, n_paths, len(close), seed, max_workers)
+
+
+def summarize(distributions, percentiles=(5, 25, 50, 75, 95)):
+    """各指标分布的均值和分位数表（行为指标，列为 mean 和各分位数）"""
+    rows = {}
+    for metric, values in distributions.items():
+        finite = values[np.isfinite(values)]
+        if len(finite) == 0:
+            rows[metric] = [np.nan] * (len(percentiles) + 1)
+            continue
+        rows[metric] = [finite.mean()] + list(np.percentile(finite, percentiles))
+    columns = ['mean'] + [f'p{p:g}' for p in percentiles]
+    return pd.DataFrame.from_dict(rows, orient='index', columns=columns)
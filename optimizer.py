@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+参数优化
+对策略参数做网格搜索或随机搜索，所有参数组合共享同一份指标缓存。
+默认搜索空间由策略的参数声明生成：strategy_cls.param_space()。
+参数组合中还可以包含风控参数（risk.RISK_PARAM_NAMES，如 stop_loss），策略参数相同的组合
+共用一次生成的信号，扫描止损/止盈比例只需重新回测：
+
+    space = dict(RSIStrategy.param_space(), stop_loss=[0.02, 0.05, 0.1])
+"""
+
+import itertools
+import math
+import random
+
+import pandas as pd
+
+from indicators import DEFAULT_CACHE
+from risk import RISK_PARAM_NAMES, RiskManager
+
+
+# 排名表中的绩效指标（均为越大越好）
+METRIC_COLUMNS = ['total_return', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'max_drawdown', 'win_rate',
+                  'num_trades']
+
+
+def grid_size(param_space):
+    """参数组合总数"""
+    return math.prod(len(values) for values in param_space.values())
+
+
+def parameter_grid(param_space):
+    """网格搜索：枚举全部参数组合"""
+    keys = list(param_space)
+    return [dict(zip(keys, values)) for values in itertools.product(*param_space.values())]
+
+
+def random_parameters(param_space, n_samples, seed=None):
+    """随机搜索：从网格中不重复地抽取n_samples个参数组合"""
+    total = grid_size(param_space)
+    if n_samples >= total:
+        return parameter_grid(param_space)
+
+    rng = random.Random(seed)
+    keys = list(param_space)
+    param_sets = []
+    for flat_index in rng.sample(range(total), n_samples):
+        # 按混合进制把序号还原为各参数的下标
+        params = {}
+        for key in reversed(keys):
+            values = param_space[key]
+            flat_index, value_index = divmod(flat_index, len(values))
+            params[key] = values[value_index]
+        param_sets.append({key: params[key] for key in keys})
+    return param_sets
+
+
+def run_sweep(strategy_cls, data, param_sets, initial_capital=10000, commission=0.001,
+              sort_by='sharpe_ratio', indicator_cache=DEFAULT_CACHE, progress_callback=None, execution=None,
+              risk=None):
+    """对一组参数运行回测，返回按sort_by降序排列的结果表
+
+    execution: 成交模型（见 execution.py）；risk: 风险控制（见 risk.py），参数组合中的风控参数在其基础上修改
+
+    同一策略实例在所有参数组合间复用，指标通过indicator_cache（默认为进程内共享的
+    indicators.DEFAULT_CACHE）按数据指纹和参数复用，例如同一窗口的均线只计算一次。
+    """
+    strategy = strategy_cls(data, initial_capital=initial_capital, commission=commission,
+                            indicator_cache=indicator_cache, execution=execution, risk=risk)
+    base_risk = risk if risk is not None else RiskManager()
+
+    # 按策略参数分组（保持首次出现的顺序），同组只是风控参数不同，共用一次生成的信号
+    groups = {}
+    for params in param_sets:
+        strategy_params = {key: value for key, value in params.items() if key not in RISK_PARAM_NAMES}
+        groups.setdefault(tuple(sorted(strategy_params.items())), (strategy_params, []))[1].append(params)
+
+    total = len(param_sets)
+    report_every = max(1, total // 100)
+    rows = []
+    for strategy_params, group in groups.values():
+        signals = strategy.generate_signals(**strategy_params)
+        for params in group:
+            risk_params = {key: value for key, value in params.items() if key in RISK_PARAM_NAMES}
+            strategy.risk = base_risk.replace(**risk_params) if risk_params else risk
+            result = strategy.backtest(signals, engine='vectorized')
+            row = dict(params)
+            row.update({metric: result[metric] for metric in METRIC_COLUMNS})
+            rows.append(row)
+
+            done = len(rows)
+            if progress_callback is not None and (done % report_every == 0 or done == total):
+                progress_callback(done, total)
+
+    columns = (list(param_sets[0]) if param_sets else []) + METRIC_COLUMNS
+    table = pd.DataFrame(rows, columns=columns)
+    return table.sort_values(sort_by, ascending=False, kind='stable').reset_index(drop=True)
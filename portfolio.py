@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多资产组合回测
+多个币种共用一个资金池，按目标权重或策略信号分配，支持定期再平衡。
+价格对齐为 时间 × 资产 的二维数组，只在再平衡时点循环，其余全部为数组运算
+"""
+
+import numpy as np
+import pandas as pd
+
+from metrics import MetricsAccumulator, infer_periods_per_year
+
+
+def _close_series(data):
+    """取收盘价为一维Series（兼容DataFrame多层级列名和OHLCVColumns）"""
+    column = data['Close']
+    if isinstance(column, pd.DataFrame):
+        column = column.iloc[:, 0]
+    return pd.Series(np.asarray(column, dtype=float), index=data.index)
+
+
+def align_prices(datasets):
+    """把多个币种的收盘价按时间戳并集对齐，缺失处向前填充（上市前保持NaN）
+
+    返回 (时间索引, 价格矩阵 T×A, 币种列表)
+    """
+    tickers = list(datasets)
+    closes = pd.concat([_close_series(datasets[t]) for t in tickers], axis=1, keys=tickers, join='outer')
+    closes = closes.sort_index().ffill()
+    return closes.index, closes.to_numpy(), tickers
+
+
+def _holding_mask(signals, index, tickers):
+    """由各币种的信号序列推导持仓状态矩阵（最近一个有效信号为1即持仓）"""
+    raw = pd.concat([signals[t].rename(t) for t in tickers], axis=1).reindex(index).fillna(0)
+    sig = raw.to_numpy().astype(np.int64)
+    active = (sig == 1) | (sig == -1)
+    rows = np.arange(len(index))[:, None]
+    last_idx = np.maximum.accumulate(np.where(active, rows, -1), axis=0)
+    last_sig = np.take_along_axis(sig, np.maximum(last_idx, 0), axis=0)
+    return (last_idx >= 0) & (last_sig == 1)
+
+
+def _rebalance_points(index, rebalance):
+    """定期再平衡的K线位置：整数表示每N根K线，字符串表示日历周期（如 'W'、'M'）"""
+    if rebalance is None:
+        return np.array([0])
+    if isinstance(rebalance, (int, np.integer)):
+        return np.arange(0, len(index), rebalance)
+    naive = index.tz_convert(None) if index.tz is not None else index
+    periods = naive.to_period(rebalance).asi8
+    return np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+
+
+def strategy_signals(strategy_cls, datasets, **params):
+    """对每个币种运行同一策略，返回 {币种: 信号Series}"""
+    return {
+        ticker: strategy_cls(data).generate_signals(**params)
+        for ticker, data in datasets.items()
+    }
+
+
+def portfolio_backtest(datasets, weights=None, signals=None, rebalance=None,
+                       initial_capital=10000, commission=0.001):
+    """组合回测
+
+    datasets: {币种: 行情数据}
+    weights: {币种: 目标权重}，缺省为等权；权重之和小于1的部分保留为现金
+    signals: {币种: 信号Series}，给定时按信号持仓（信号为空仓的币种权重留作现金），
+             持仓状态变化时触发再平衡
+    rebalance: 定期再平衡频率，整数为K线根数，字符串为日历周期（'D'/'W'/'M'），None为不定期
+    """
+    index, prices, tickers = align_prices(datasets)
+    n_bars, n_assets = prices.shape
+
+    if weights is None:
+        base_weights = np.full(n_assets, 1.0 / n_assets)
+    else:
+        base_weights = np.array([weights.get(t, 0.0) for t in tickers], dtype=float)
+
+    tradable = ~np.isnan(prices)
+    if signals is not None:
+        held = _holding_mask(signals, index, tickers) & tradable
+        changes = np.flatnonzero(np.any(held[1:] != held[:-1], axis=1)) + 1
+    else:
+        held = tradable
+        changes = np.flatnonzero(np.any(tradable[1:] != tradable[:-1], axis=1)) + 1
+    points = np.union1d(_rebalance_points(index, rebalance), changes)
+
+    # 逐个再平衡时点计算持仓数量（每个时点是一次 A 维向量运算）
+    valued_prices = np.nan_to_num(prices)
+    units = np.zeros((len(points), n_assets))
+    cash = np.empty(len(points))
+    costs = np.empty(len(points))
+    traded = np.empty(len(points))
+    current_units = np.zeros(n_assets)
+    current_cash = float(initial_capital)
+    for k, t in enumerate(points):
+        price = valued_prices[t]
+        current_value = current_units * price
+        total = current_cash + current_value.sum()
+
+        target_weights = base_weights * held[t]
+        if signals is None:
+            # 未上市币种的权重按比例分给其余币种
+            available = target_weights.sum()
+            if available > 0:
+                target_weights = target_weights * (base_weights.sum() / available)
+        target_value = total * target_weights
+
+        traded[k] = np.abs(target_value - current_value).sum()
+        cost = commission * traded[k]
+        target_value *= (total - cost) / total if total > 0 else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            current_units = np.where(price > 0, target_value / price, 0.0)
+        current_cash = total - cost - target_value.sum()
+
+        units[k] = current_units
+        cash[k] = current_cash
+        costs[k] = cost
+
+    # 展开到每根K线：持仓数量在两次再平衡之间保持不变
+    segment = np.searchsorted(points, np.arange(n_bars), side='right') - 1
+    bar_units = units[segment]
+    holdings_value = bar_units * valued_prices
+    equity = holdings_value.sum(axis=1) + cash[segment]
+
+    equity_series = pd.Series(equity, index=index, name='equity')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        realized_weights = pd.DataFrame(holdings_value / equity[:, None], index=index, columns=tickers)
+
+    accumulator = MetricsAccumulator(initial_capital, infer_periods_per_year(index))
+    accumulator.update_many(equity, holding=holdings_value.sum(axis=1) > 0, traded=traded.sum())
+    report = accumulator.result()
+    report.update({
+        'num_rebalances': len(points),
+        'total_commission': costs.sum(),
+        'equity': equity_series,
+        'weights': realized_weights,
+        'rebalance_dates': index[points],
+    })
+    return report
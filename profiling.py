@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段计时
+用 RunProfile 包住一次运行，运行中各阶段用 span() 计时（可嵌套），可选记录cProfile。
+每个阶段结束时输出一条结构化日志（logger 'strategylab.perf'，消息为JSON），
+便于在部署环境中跨用户汇总各阶段的 p50/p99 延迟；进程内也保留最近的耗时样本。
+
+没有活动的 RunProfile 时 span() 不做任何记录，可以放心放在库代码中。
+"""
+
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+
+logger = logging.getLogger('strategylab.perf')
+
+# 当前线程（Streamlit每个会话的脚本线程）上活动的运行
+_CURRENT_RUN = contextvars.ContextVar('strategylab_run', default=None)
+
+
+class StageStats:
+    """进程内各阶段最近耗时样本（线程安全，每阶段保留 maxlen 个）"""
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.maxlen)
+            self._samples[stage].append(seconds)
+
+    def summary(self):
+        """各阶段的样本数和 p50/p99/最大耗时（毫秒）"""
+        with self._lock:
+            samples = {stage: np.array(values) for stage, values in self._samples.items()}
+        return [
+            {
+                'stage': stage,
+                'count': len(values),
+                'p50_ms': np.percentile(values, 50) * 1e3,
+                'p99_ms': np.percentile(values, 99) * 1e3,
+                'max_ms': values.max() * 1e3,
+            }
+            for stage, values in samples.items()
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+# 进程内共享的默认统计
+STAGE_STATS = StageStats()
+
+
+class RunProfile:
+    """一次运行的计时记录
+
+    用法：
+        with RunProfile('backtest', ticker='BTC-USD') as run:
+            with span('fetch_data'):
+                ...
+        run.spans          # 各阶段耗时
+        run.profile_text() # profile=True 时的cProfile报告
+    """
+
+    def __init__(self, name, profile=False, stats=STAGE_STATS, **context):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = context
+        self.stats = stats
+        self.spans = []
+        self.seconds = None
+        self._profiler = cProfile.Profile() if profile else None
+        self._stack = []
+        self._token = None
+        self._start = None
+
+    def __enter__(self):
+        self._token = _CURRENT_RUN.set(self)
+        self._start = time.perf_counter()
+        if self._profiler is not None:
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # 同一时间只能有一个cProfile在运行（其他会话正在记录时跳过）
+                self._profiler = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is not None:
+            self._profiler.disable()
+        self.seconds = time.perf_counter() - self._start
+        _CURRENT_RUN.reset(self._token)
+        self._emit(f'{self.name}:total', self.seconds, parent=None, ok=exc_type is None)
+        return False
+
+    @contextmanager
+    def span(self, stage, **fields):
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(stage)
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            self.spans.append({
+                'stage': stage,
+                'parent': parent,
+                'depth': len(self._stack),
+                'start_ms': (start - self._start) * 1e3,
+                'duration_ms': seconds * 1e3,
+                **fields,
+            })
+            self._emit(stage, seconds, parent=parent, ok=ok, **fields)
+
+    def _emit(self, stage, seconds, parent, ok, **fields):
+        if self.stats is not None:
+            self.stats.record(stage, seconds)
+        record = {
+            'event': 'stage_timing',
+            'run': self.name,
+            'run_id': self.run_id,
+            'stage': stage,
+            'parent': parent,
+            'duration_ms': round(seconds * 1e3, 3),
+            'ok': ok,
+            **self.context,
+            **fields,
+        }
+        logger.info(json.dumps(record, ensure_ascii=False, default=str), extra={'perf': record})
+
+    def profile_text(self, sort='cumulative', limit=30):
+        """cProfile报告（未开启profile时返回None）"""
+        if self._profiler is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+@contextmanager
+def span(stage, **fields):
+    """在当前运行中为一个阶段计时（没有活动运行时直接执行）"""
+    run = _CURRENT_RUN.get()
+    if run is None:
+        yield
+        return
+    with run.span(stage, **fields):
+        yield
+
+
+def timed(stage):
+    """装饰器：把函数的每次调用记为一个阶段"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
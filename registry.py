@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+策略注册表
+每个策略类用 params 声明自己的参数（类型、范围、默认值、界面标签），注册表按名称登记
+策略的导入路径和显示名称，第一次用到时才导入策略模块。界面滑块、命令行参数解析、
+参数扫描的搜索空间和缓存键都由这里的声明生成，新增策略只需注册，无需修改界面代码：
+
+    REGISTRY.register('my_strategies:BreakoutStrategy', display_name='通道突破')
+"""
+
+import importlib
+import threading
+
+
+class Param:
+    """策略参数声明（类型由默认值推断：bool / int / float）"""
+
+    def __init__(self, name, label, default, low=None, high=None, step=None, help=None):
+        self.name = name
+        self.label = label
+        self.default = default
+        self.kind = type(default)
+        if self.kind not in (bool, int, float):
+            raise TypeError(f"不支持的参数类型: {name}={default!r}")
+        self.low = low
+        self.high = high
+        self.step = step if step is not None else (1 if self.kind is int else None)
+        self.help = help
+
+    def __repr__(self):
+        if self.kind is bool:
+            return f'Param({self.name}={self.default})'
+        return f'Param({self.name}={self.default}, {self.low}..{self.high})'
+
+    def coerce(self, value):
+        """把命令行/配置中的值转换为声明的类型并检查范围"""
+        if self.kind is bool:
+            if isinstance(value, str):
+                lowered = value.strip().lower()
+                if lowered not in ('true', 'false', '1', '0', 'yes', 'no'):
+                    raise ValueError(f"参数 {self.name} 应为布尔值: {value!r}")
+                return lowered in ('true', '1', 'yes')
+            return bool(value)
+
+        number = float(value)
+        if self.kind is int:
+            if number != int(number):
+                raise ValueError(f"参数 {self.name} 应为整数: {value!r}")
+            number = int(number)
+        if (self.low is not None and number < self.low) or (self.high is not None and number > self.high):
+            raise ValueError(f"参数 {self.name}={number} 超出范围 [{self.low}, {self.high}]")
+        return number
+
+    def values(self):
+        """参数扫描的取值（闭区间，按step取值）"""
+        if self.kind is bool:
+            return [True, False]
+        if self.kind is int:
+            return list(range(self.low, self.high + 1, self.step))
+        count = int(round((self.high - self.low) / self.step)) + 1
+        return [round(self.low + i * self.step, 10) for i in range(count)]
+
+
+class StrategyRegistry:
+    """策略注册表（按名称懒加载策略类）"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, target, name=None, display_name=None):
+        """登记策略
+
+        target: 策略类，或 'module:ClassName' 形式的导入路径（用到时才导入）
+        name: 注册名，缺省为类名；display_name: 界面显示名称，缺省为注册名
+        """
+        if isinstance(target, str):
+            module, _, attr = target.partition(':')
+            name = name or attr
+            cls = None
+        else:
+            module, attr, cls = target.__module__, target.__name__, target
+            name = name or target.__name__
+        with self._lock:
+            self._entries[name] = {
+                'module': module,
+                'attr': attr,
+                'display_name': display_name or name,
+                'cls': cls,
+            }
+        return target
+
+    def names(self):
+        return list(self._entries)
+
+    def display_names(self):
+        """{显示名称: 注册名}（按注册顺序）"""
+        return {entry['display_name']: name for name, entry in self._entries.items()}
+
+    def display_name(self, name):
+        return self._entries[name]['display_name']
+
+    def get(self, name):
+        """按注册名取策略类（首次调用时导入）"""
+        try:
+            entry = self._entries[name]
+        except KeyError:
+            raise KeyError(f"未注册的策略: {name}") from None
+        if entry['cls'] is None:
+            cls = getattr(importlib.import_module(entry['module']), entry['attr'])
+            from strategies import StrategyBase
+            if not (isinstance(cls, type) and issubclass(cls, StrategyBase)):
+                raise TypeError(f"{entry['module']}:{entry['attr']} 不是 StrategyBase 的子类")
+            entry['cls'] = cls
+        return entry['cls']
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 进程内的默认注册表（内置策略）
+REGISTRY = StrategyRegistry()
+REGISTRY.register('strategies:RSIStrategy', display_name='RSI均值回归')
+REGISTRY.register('strategies:MAStrategy', display_name='移动平均线交叉')
+REGISTRY.register('strategies:BollingerStrategy', display_name='布林带突破')
+REGISTRY.register('strategies:MACDStrategy', display_name='MACD')
+REGISTRY.register('strategies:MomentumStrategy', display_name='动量突破')
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OHLCV重采样
+把细粒度K线（或逐笔成交）聚合为更高的K线级别，全部用NumPy分段归约完成：
+时间戳按级别宽度整除得到分桶号，数据已按时间排序，同一分桶是连续的一段，
+开盘取段首、收盘取段尾、最高/最低/成交量用 reduceat 归约。分桶从UTC零点对齐，
+没有数据的分桶不产生K线（与交易所K线一致）。
+
+大数据按块处理：ResampleAccumulator 逐块输入，跨块的最后一个未完成分桶暂存到下一块合并，
+内存占用只与块大小和输出K线数有关。
+
+    index_ns, columns = resample_arrays(index_ns, columns, '15m')
+    resampled = resample_columns(store.read_columns('BTC-USD', '1m'), '4h')   # OHLCVColumns
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+INTERVAL_UNITS = {
+    'm': 60 * 10 ** 9,
+    'h': 3600 * 10 ** 9,
+    'd': 86400 * 10 ** 9,
+}
+
+# 界面提供的重采样级别
+RESAMPLE_INTERVALS = ['1m', '5m', '15m', '30m', '1h', '4h', '1d']
+
+_UNIT_NANOS = {'s': 10 ** 9, 'ms': 10 ** 6, 'us': 10 ** 3, 'ns': 1}
+
+# 每块处理的行数
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def interval_nanos(interval):
+    """K线级别的宽度（纳秒），如 '15m' -> 900e9；支持分钟(m)、小时(h)、天(d)"""
+    match = re.fullmatch(r'(\d+)([mhd])', interval)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"不支持的K线级别: {interval}")
+    return int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+
+
+def is_derivable(interval, base):
+    """interval 级别的K线能否由 base 级别聚合得到（宽度为整数倍）"""
+    try:
+        target, source = interval_nanos(interval), interval_nanos(base)
+    except ValueError:
+        return False
+    return target % source == 0
+
+
+def derivable_intervals(base, intervals=RESAMPLE_INTERVALS):
+    """能由 base 级别聚合得到的K线级别"""
+    return [interval for interval in intervals if is_derivable(interval, base)]
+
+
+def to_nanos(index):
+    """时间索引转为UTC纳秒时间戳数组（int64，带时区的索引内部就是UTC时间戳，无时区的视为UTC）"""
+    index = pd.DatetimeIndex(index)
+    scale = _UNIT_NANOS[getattr(index, 'unit', 'ns')]
+    return index.asi8 * scale if scale != 1 else index.asi8
+
+
+def from_nanos(index_ns):
+    """UTC纳秒时间戳数组转为时间索引"""
+    return pd.DatetimeIndex(np.asarray(index_ns, dtype='datetime64[ns]')).tz_localize('UTC')
+
+
+# ============ 分段归约 ============
+def resample_arrays(index_ns, columns, interval):
+    """重采样一段已按时间升序排列的数据
+
+    columns: {'Open'/'High'/'Low'/'Close'/'Volume': 数组}，缺少的列不输出
+    返回 (分桶起始时间的纳秒数组, {列名: 数组})
+    """
+    index_ns = np.asarray(index_ns, dtype=np.int64)
+    if len(index_ns) == 0:
+        return index_ns, {name: np.empty(0) for name in columns}
+
+    width = interval_nanos(interval)
+    buckets = index_ns // width
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(index_ns)) - 1
+
+    out = {}
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)
+        if name == 'Open':
+            out[name] = values[starts]
+        elif name == 'Close':
+            out[name] = values[ends]
+        elif name == 'High':
+            out[name] = np.maximum.reduceat(values, starts)
+        elif name == 'Low':
+            out[name] = np.minimum.reduceat(values, starts)
+        elif name == 'Volume':
+            out[name] = np.add.reduceat(values, starts)
+    return buckets[starts] * width, out
+
+
+def _merge_bar(first, second):
+    """合并同一分桶的两段聚合结果（first 在前）"""
+    merged = {}
+    for name in first:
+        if name == 'Open':
+            merged[name] = first[name]
+        elif name == 'Close':
+            merged[name] = second[name]
+        elif name == 'High':
+            merged[name] = max(first[name], second[name])
+        elif name == 'Low':
+            merged[name] = min(first[name], second[name])
+        elif name == 'Volume':
+            merged[name] = first[name] + second[name]
+    return merged
+
+
+class ResampleAccumulator:
+    """分块重采样：逐块 add()，最后 finish() 得到完整结果
+
+    每块内部用 resample_arrays 归约；块的最后一根K线可能还没结束，暂存到下一块
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._index = []
+        self._columns = {}
+        self._pending = None   # (分桶时间, {列名: 标量})
+
+    def add(self, index_ns, columns):
+        bucket_ns, bars = resample_arrays(index_ns, columns, self.interval)
+        if len(bucket_ns) == 0:
+            return
+        first = {name: values[0] for name, values in bars.items()}
+        if self._pending is not None:
+            if self._pending[0] == bucket_ns[0]:
+                first = _merge_bar(self._pending[1], first)
+            else:
+                self._emit([self._pending[0]], {name: [v] for name, v in self._pending[1].items()})
+
+        if len(bucket_ns) == 1:
+            self._pending = (bucket_ns[0], first)
+            return
+        # 第一根（已与暂存合并）和中间的K线已完整，最后一根暂存
+        complete = {name: values[:-1].copy() for name, values in bars.items()}
+        for name, value in first.items():
+            complete[name][0] = value
+        self._emit(bucket_ns[:-1], complete)
+        self._pending = (bucket_ns[-1], {name: values[-1] for name, values in bars.items()})
+
+    def _emit(self, bucket_ns, bars):
+        self._index.append(np.asarray(bucket_ns, dtype=np.int64))
+        for name, values in bars.items():
+            self._columns.setdefault(name, []).append(np.asarray(values, dtype=np.float64))
+
+    def finish(self):
+        """返回 (纳秒时间数组, {列名: 数组})"""
+        if self._pending is not None:
+            self._emit([self._pending[0]], {name: [v] for name, v in self._pending[1].items()})
+            self._pending = None
+        if not self._index:
+            return np.empty(0, dtype=np.int64), {}
+        return (np.concatenate(self._index),
+                {name: np.concatenate(chunks) for name, chunks in self._columns.items()})
+
+
+def resample_columns(data, interval, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """按块重采样 OHLCVColumns（或DataFrame），返回新的 OHLCVColumns
+
+    输入通常是内存映射的列视图，每次只有一块数据被读入内存
+    """
+    from data_store import OHLCVColumns
+
+    index_ns = to_nanos(data.index)
+    names = [name for name in ('Open', 'High', 'Low', 'Close', 'Volume') if name in data.columns]
+    values = {name: np.asarray(data[name]) for name in names}
+    accumulator = ResampleAccumulator(interval)
+    for start in range(0, len(index_ns), chunk_rows):
+        stop = start + chunk_rows
+        accumulator.add(index_ns[start:stop], {name: column[start:stop] for name, column in values.items()})
+    bucket_ns, columns = accumulator.finish()
+    return OHLCVColumns(from_nanos(bucket_ns), columns)
+
+
+def trades_to_columns(price, size):
+    """逐笔成交转为可重采样的列（每笔成交视为开高低收相同的一根K线）"""
+    price = np.asarray(price, dtype=np.float64)
+    return {'Open': price, 'High': price, 'Low': price, 'Close': price,
+            'Volume': np.asarray(size, dtype=np.float64)}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回测结果缓存
+完整的回测结果（绩效指标、资产曲线、交易记录）按内容寻址：键是行情数据指纹、
+策略、规范化参数和资金设置的哈希。两级缓存：
+
+    内存层  进程内LRU（按条目数限制），命中直接返回同一个结果对象（调用方不应修改）
+    磁盘层  每个结果一个pickle文件（可选），按总字节数淘汰最久未访问的文件，
+           跨会话、跨进程重启复用
+
+    cache = ResultCache(disk_dir='result_cache')
+    result = cached_backtest(RSIStrategy, data, {'rsi_period': 14}, cache=cache)
+
+磁盘层只应指向本机可信目录（pickle文件加载时会执行任意代码）。
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from data_store import OHLCV_COLUMNS
+from profiling import span
+
+
+# 回测引擎或结果格式变化时递增，使旧缓存全部失效
+CACHE_VERSION = 5
+
+DEFAULT_RESULT_DIR = os.environ.get(
+    'STRATEGYLAB_RESULT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result_cache')
+)
+
+
+# ============ 缓存键 ============
+def data_fingerprint(data):
+    """行情数据指纹（时间索引 + OHLCV列的内容哈希）"""
+    digest = hashlib.blake2b(digest_size=16)
+    index = np.asarray(data.index.asi8 if hasattr(data.index, 'asi8') else data.index)
+    digest.update(np.ascontiguousarray(index).view(np.uint8))
+    for column in OHLCV_COLUMNS:
+        if column in data.columns:
+            digest.update(column.encode())
+            digest.update(np.ascontiguousarray(data[column], dtype=np.float64).view(np.uint8))
+    return f'{len(data)}:{digest.hexdigest()}'
+
+
+def result_key(data_fp, strategy_cls, params=None, initial_capital=10000, commission=0.001,
+               engine='vectorized', execution=None, risk=None):
+    """回测结果的缓存键（十六进制字符串，也用作磁盘文件名）"""
+    spec = (CACHE_VERSION, data_fp, strategy_cls.cache_key(params), float(initial_capital),
+            float(commission), engine, repr(execution), repr(risk))
+    return hashlib.blake2b(repr(spec).encode(), digest_size=20).hexdigest()
+
+
+# ============ 两级缓存 ============
+class ResultCache:
+    """线程安全的两级结果缓存（内存LRU + 可选磁盘目录）"""
+
+    def __init__(self, maxsize=32, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.pkl')
+
+    def _disk_files(self):
+        """磁盘层文件 [(修改时间, 字节数, 路径), ...]"""
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return []
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _remember(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """命中返回缓存结果，否则返回None（磁盘命中会提升到内存层）"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                os.utime(path)   # 更新访问时间，淘汰时按最久未访问排序
+            except (OSError, EOFError, pickle.UnpicklingError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if not self.disk_dir:
+            return
+        # 先写临时文件再原子替换，并发读取不会看到写了一半的文件
+        os.makedirs(self.disk_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except (OSError, pickle.PicklingError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _evict_disk(self):
+        """磁盘层超过 max_disk_bytes 时删除最久未访问的文件"""
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def disk_bytes(self):
+        return sum(size for _, size, _ in self._disk_files())
+
+    def stats(self):
+        """命中/未命中统计"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+        stats['disk_bytes'] = self.disk_bytes()
+        return stats
+
+    def clear(self, disk=True):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if disk:
+            for _, _, path in self._disk_files():
+                os.remove(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 进程内共享的默认结果缓存（内存层 + 磁盘层）
+DEFAULT_RESULT_CACHE = ResultCache(disk_dir=DEFAULT_RESULT_DIR)
+
+
+def cached_backtest(strategy_cls, data, params=None, initial_capital=10000, commission=0.001,
+                    engine='vectorized', cache=DEFAULT_RESULT_CACHE, data_fp=None, execution=None, risk=None):
+    """生成信号并回测（结果按数据指纹、策略、参数、成交模型和风险控制缓存）
+
+    data_fp: 数据指纹，调用方已知时传入可避免重复哈希；cache=None 表示不缓存
+    """
+    params = strategy_cls.normalize_params(params)
+
+    def compute():
+        strategy = strategy_cls(data, initial_capital=initial_capital, commission=commission,
+                                execution=execution, risk=risk)
+        with span('generate_signals'):
+            signals = strategy.generate_signals(**params)
+        return strategy.backtest(signals, engine=engine)
+
+    if cache is None:
+        return compute()
+    if data_fp is None:
+        data_fp = data_fingerprint(data)
+    key = result_key(data_fp, strategy_cls, params, initial_capital, commission, engine, execution, risk)
+    return cache.get_or_compute(key, compute)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+风险控制
+RiskManager 作用于任意策略的信号之上（StrategyBase(risk=...)），不改变策略本身：
+
+    stop_loss        止损比例，最低价跌破 入场价*(1-stop_loss) 离场
+    trailing_stop    移动止损比例，最低价跌破 入场以来最高价*(1-trailing_stop) 离场
+    take_profit      止盈比例，最高价突破 入场价*(1+take_profit) 离场
+    position_size    每笔交易投入当时资金的比例（其余留作现金）
+    target_vol       年化波动率目标，按入场前 vol_lookback 根K线的收益率波动缩小仓位（不加杠杆），
+                     年化周期数缺省取策略按K线级别估计的值
+
+各项为0表示不启用。止损/止盈用K线内的最高价/最低价判断，跳空越过止损价时按开盘价成交；
+同一根K线既触及止损又触及止盈时按止损处理（保守假设）。提前离场后空仓，等待策略的下一个买入信号。
+
+所有交易的检查区间拼接为一个数组，入场以来的最高价用分组累计最大值求出，每笔交易第一次
+触发的位置用数组运算查找，没有逐K线的Python循环；扫描止损比例时信号只需生成一次：
+
+    strategy = RSIStrategy(data, risk=RiskManager(stop_loss=0.05, trailing_stop=0.1))
+"""
+
+import numpy as np
+import pandas as pd
+
+from metrics import DEFAULT_PERIODS_PER_YEAR
+from registry import Param
+from trade_log import EXIT_END, EXIT_SIGNAL, EXIT_STOP_LOSS, EXIT_TAKE_PROFIT, EXIT_TRAILING_STOP
+
+
+# 风控参数声明（界面、命令行和参数扫描共用）
+RISK_PARAMS = (
+    Param('stop_loss', '止损', 0.0, 0.0, 0.5, 0.01),
+    Param('trailing_stop', '移动止损', 0.0, 0.0, 0.5, 0.01),
+    Param('take_profit', '止盈', 0.0, 0.0, 1.0, 0.01),
+    Param('position_size', '仓位比例', 1.0, 0.05, 1.0, 0.05),
+    Param('target_vol', '目标年化波动率', 0.0, 0.0, 2.0, 0.05),
+)
+
+RISK_PARAM_NAMES = tuple(p.name for p in RISK_PARAMS)
+
+
+def _segmented_cummax(values, starts):
+    """分段累计最大值（starts 为各段起点位置，段首之前的值不参与）"""
+    groups = np.zeros(len(values), dtype=np.int64)
+    groups[starts[1:]] = 1
+    return pd.Series(values).groupby(np.cumsum(groups)).cummax().to_numpy()
+
+
+class RiskManager:
+    """止损、止盈和仓位管理（见模块说明）"""
+
+    def __init__(self, stop_loss=0.0, trailing_stop=0.0, take_profit=0.0, position_size=1.0, target_vol=0.0,
+                 vol_lookback=20, periods_per_year=None):
+        values = {param.name: param.coerce(value) for param, value in
+                  zip(RISK_PARAMS, (stop_loss, trailing_stop, take_profit, position_size, target_vol))}
+        self.stop_loss = values['stop_loss']
+        self.trailing_stop = values['trailing_stop']
+        self.take_profit = values['take_profit']
+        self.position_size = values['position_size']
+        self.target_vol = values['target_vol']
+        self.vol_lookback = int(vol_lookback)
+        self.periods_per_year = periods_per_year
+
+    @classmethod
+    def from_config(cls, config):
+        """由配置dict创建"""
+        return cls(**config)
+
+    def __repr__(self):
+        # 同时用作结果缓存键的一部分，需包含全部参数
+        return (f'RiskManager(stop_loss={self.stop_loss}, trailing_stop={self.trailing_stop}, '
+                f'take_profit={self.take_profit}, position_size={self.position_size}, '
+                f'target_vol={self.target_vol}, vol_lookback={self.vol_lookback}, '
+                f'periods_per_year={self.periods_per_year})')
+
+    def replace(self, **changes):
+        """复制并修改部分参数（参数扫描用）"""
+        params = {name: getattr(self, name) for name in RISK_PARAM_NAMES}
+        params.update(vol_lookback=self.vol_lookback, periods_per_year=self.periods_per_year)
+        params.update(changes)
+        return RiskManager(**params)
+
+    @property
+    def has_exits(self):
+        return self.stop_loss > 0 or self.trailing_stop > 0 or self.take_profit > 0
+
+    # ============ 离场 ============
+    def apply_exits(self, orders, open_, high, low, fill_at_open=False):
+        """按止损/止盈规则提前离场
+
+        orders: ExecutionModel.schedule() 的结果；open_/high/low: 行情数组（缺少时用收盘价代替）
+        fill_at_open: 成交在开盘价（入场K线本身也在持仓中，信号离场K线开盘即已离场）
+        返回新的 orders，增加 exit_reason
+        """
+        entry_index, exit_index = orders['entry_index'], orders['exit_index']
+        forced = orders['forced'].copy()
+        exit_index = exit_index.copy()
+        exit_base = orders['exit_base'].copy()
+        exit_reason = np.where(forced, EXIT_END, EXIT_SIGNAL).astype(np.int8)
+        n_trades = len(entry_index)
+        if not self.has_exits or n_trades == 0:
+            return dict(orders, exit_reason=exit_reason)
+
+        # 每笔交易需要检查的K线区间 [first, last]
+        first = entry_index if fill_at_open else entry_index + 1
+        last = np.where(forced | (not fill_at_open), exit_index, exit_index - 1)
+        lengths = np.maximum(last - first + 1, 0)
+        offsets = np.cumsum(lengths) - lengths
+        total = int(lengths.sum())
+        if total == 0:
+            return dict(orders, exit_reason=exit_reason)
+        trade = np.repeat(np.arange(n_trades), lengths)
+        bars = np.arange(total) - np.repeat(offsets - first, lengths)
+        starts = offsets[lengths > 0]
+
+        entry = orders['entry_base'][trade]
+        bar_high, bar_low = high[bars], low[bars]
+        stop = np.full(total, -np.inf)
+        if self.stop_loss > 0:
+            stop = entry * (1 - self.stop_loss)
+        trailing = np.zeros(total, dtype=bool)
+        if self.trailing_stop > 0:
+            # 入场以来（不含当前K线）的最高价，当前K线内高低点的先后未知
+            peak = np.empty(total)
+            peak[0] = -np.inf
+            peak[1:] = _segmented_cummax(bar_high, starts)[:-1]
+            peak[starts] = -np.inf
+            trail = np.maximum(peak, entry) * (1 - self.trailing_stop)
+            trailing = trail > stop
+            stop = np.maximum(stop, trail)
+        stop_hit = bar_low <= stop
+        target = entry * (1 + self.take_profit) if self.take_profit > 0 else np.full(total, np.inf)
+        hit = np.flatnonzero(stop_hit | (bar_high >= target))
+        if len(hit) == 0:
+            return dict(orders, exit_reason=exit_reason)
+
+        # 每笔交易第一次触发的位置
+        hit_trades, first_hit = np.unique(trade[hit], return_index=True)
+        where = hit[first_hit]
+        hit_bars = bars[where]
+        bar_open = open_[hit_bars] if open_ is not None else None
+        is_stop = stop_hit[where]
+        if bar_open is None:
+            price = np.where(is_stop, stop[where], target[where])
+        else:
+            # 跳空越过触发价时按开盘价成交
+            price = np.where(is_stop, np.minimum(bar_open, stop[where]), np.maximum(bar_open, target[where]))
+
+        exit_index[hit_trades] = hit_bars
+        exit_base[hit_trades] = price
+        forced[hit_trades] = False
+        exit_reason[hit_trades] = np.where(is_stop, np.where(trailing[where], EXIT_TRAILING_STOP, EXIT_STOP_LOSS),
+                                           EXIT_TAKE_PROFIT)
+        return dict(orders, exit_index=exit_index, exit_base=exit_base, forced=forced, exit_reason=exit_reason)
+
+    # ============ 仓位 ============
+    def position_fractions(self, signal_index, close, periods_per_year=DEFAULT_PERIODS_PER_YEAR):
+        """每笔交易投入资金的比例
+
+        signal_index: 买入信号所在K线，波动率只用信号K线及之前的数据
+        periods_per_year: 波动率年化用的每年K线数（RiskManager 的 periods_per_year 为None时使用）
+        """
+        fractions = np.full(len(signal_index), self.position_size)
+        if self.target_vol > 0 and len(signal_index):
+            returns = pd.Series(close).pct_change()
+            if self.periods_per_year is not None:
+                periods_per_year = self.periods_per_year
+            vol = returns.rolling(self.vol_lookback).std().to_numpy()[signal_index] * np.sqrt(periods_per_year)
+            # 波动率未知（数据不足）时不缩小仓位
+            scale = np.where(vol > 0, self.target_vol / np.where(vol > 0, vol, 1.0), 1.0)
+            fractions *= np.minimum(scale, 1.0)
+        return fractions
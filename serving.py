@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多用户服务
+一个部署被多个会话同时使用时，进程内共享以下对象（界面通过 st.cache_resource 各创建一次）：
+
+    SharedDataCache  行情数据缓存：值为只读列视图（data_store.OHLCVColumns），所有会话拿到
+                     同一个对象，不按会话复制；按TTL过期，同一键的并发请求只加载一次
+    JobPool          后台任务池：参数扫描等耗时任务在固定数量的工作线程中执行，提交后立即返回，
+                     会话轮询任务状态和进度；相同任务键的重复提交复用同一个任务
+
+回测结果由 result_cache.DEFAULT_RESULT_CACHE 在进程内共享。共享的对象都不应被调用方修改。
+
+    data = SharedDataCache(loader).get('BTC-USD', '6mo', '1d')
+    job = JobPool(max_workers=2).submit(key, lambda progress: run_sweep(..., progress_callback=progress))
+    job.state, job.progress, job.result
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# ============ 行情数据 ============
+class SharedDataCache:
+    """进程内共享的行情缓存（线程安全，单次加载）
+
+    loader(*key) 返回只读数据或None；None不缓存，下次请求重新加载
+    """
+
+    def __init__(self, loader, ttl=3600, maxsize=64):
+        self.loader = loader
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # key -> (过期时间, 数据)
+        self._loading = {}              # key -> Future（正在加载）
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, *key):
+        """取数据：未命中时由第一个请求加载，同时到达的其他请求等待同一次加载的结果"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+                self.misses += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = self.loader(*key)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            if value is not None:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'loading': len(self._loading),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ============ 后台任务 ============
+class Job:
+    """后台任务的状态（state: 'queued' / 'running' / 'done' / 'failed'）"""
+
+    def __init__(self, job_id, key, label):
+        self.id = job_id
+        self.key = key
+        self.label = label
+        self.state = 'queued'
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def __repr__(self):
+        return f'Job({self.id}, {self.label!r}, {self.state})'
+
+    @property
+    def progress(self):
+        """完成比例（0~1）"""
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed')
+
+    def report(self, done, total):
+        """进度回调（与 run_sweep 的 progress_callback 签名相同）"""
+        self.done, self.total = done, total
+
+
+class JobPool:
+    """后台任务池（工作线程数固定，多余的任务排队）
+
+    max_workers: 同时执行的任务数；keep: 保留的已结束任务数（供会话取回结果）
+    """
+
+    def __init__(self, max_workers=2, keep=32):
+        self.max_workers = max_workers
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='strategylab-job')
+        self._jobs = OrderedDict()   # job_id -> Job
+        self._by_key = {}            # 任务键 -> job_id
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, label=''):
+        """提交任务：func(progress_callback) 返回结果
+
+        key: 任务键（可哈希），与未失败的已有任务相同时直接返回该任务；None表示不合并
+        """
+        with self._lock:
+            if key is not None and key in self._by_key:
+                job = self._jobs.get(self._by_key[key])
+                if job is not None and job.state != 'failed':
+                    return job
+            job = Job(next(self._ids), key, label)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._prune()
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job, func):
+        job.started_at = time.time()
+        job.state = 'running'
+        try:
+            job.result = func(job.report)
+            job.state = 'done'
+        except Exception as e:
+            job.error = e
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """只保留最近 keep 个已结束的任务（调用方持有锁）"""
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def get(self, job_id):
+        """按编号取任务，已被清理时返回None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        """各状态的任务数"""
+        counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for job in self.jobs():
+            counts[job.state] += 1
+        counts['workers'] = self.max_workers
+        return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+策略与回测引擎
+不依赖界面和绘图库，可被Web界面、命令行和批量工具直接导入
+"""
+
+import numpy as np
+import pandas as pd
+
+from execution import ExecutionModel
+from indicators import DEFAULT_CACHE, fingerprint, get_indicator
+from kernels import capital_chain, position_signals
+from metrics import MetricsAccumulator, held_bars, infer_periods_per_year
+from profiling import timed
+from registry import Param
+from streaming import BollingerStream, MACDStream, MAStream, MomentumStream, RSIStream
+from trade_log import TradeLog
+
+
+# ============ 策略基类 ============
+class StrategyBase:
+    """策略基类"""
+
+    # 逐K线增量状态机（见 streaming.py）
+    stream_class = None
+    # 参数声明（registry.Param），界面滑块、命令行解析和参数扫描都由此生成
+    params = ()
+
+    def __init__(self, data, initial_capital=10000, commission=0.001, indicator_cache=DEFAULT_CACHE,
+                 execution=None, risk=None, periods_per_year=None):
+        """
+        data: 行情DataFrame，或按列提供只读数组的对象（如 data_store.OHLCVColumns）。
+              数据不复制，策略只读取列视图，指标保存在独立数组中
+        execution: 成交模型（execution.ExecutionModel），None表示信号K线收盘价成交、
+                   双边收取commission；仅 engine='vectorized' 支持
+        risk: 止损、止盈和仓位管理（risk.RiskManager），作用于策略信号之上；仅 engine='vectorized' 支持
+        periods_per_year: 年化用的每年K线数，None表示由时间索引估计（metrics.infer_periods_per_year）
+        """
+        self.data = data
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.execution = execution
+        self.risk = risk
+        if periods_per_year is None:
+            periods_per_year = infer_periods_per_year(data.index)
+        self.periods_per_year = periods_per_year
+        # 指标缓存（indicators.IndicatorCache，默认进程内共享；None表示不缓存）
+        self.indicator_cache = indicator_cache
+        self._fingerprints = {}
+        self._stream = None
+
+    # ============ 参数 ============
+    @classmethod
+    def default_params(cls):
+        return {p.name: p.default for p in cls.params}
+
+    @classmethod
+    def normalize_params(cls, params=None):
+        """补全默认值并按声明转换类型，未声明的参数报错"""
+        params = dict(params or {})
+        unknown = set(params) - {p.name for p in cls.params}
+        if unknown:
+            raise ValueError(f"{cls.__name__} 没有参数: {', '.join(sorted(unknown))}")
+        return {p.name: p.coerce(params[p.name]) if p.name in params else p.default for p in cls.params}
+
+    @classmethod
+    def param_space(cls):
+        """参数扫描的搜索空间 {参数名: 取值列表}"""
+        return {p.name: p.values() for p in cls.params}
+
+    @classmethod
+    def cache_key(cls, params=None):
+        """(策略的模块限定名, 规范化参数) 元组，可作为结果缓存的键
+
+        使用 模块.限定名 而不是类名，不同模块中的同名策略不会共用缓存结果
+        """
+        return (f'{cls.__module__}.{cls.__qualname__}',) + tuple(sorted(cls.normalize_params(params).items()))
+
+    def generate_signals(self, **params):
+        """生成交易信号（子类实现）"""
+        raise NotImplementedError
+
+    def start_stream(self, **params):
+        """开始逐K线增量模式（参数与generate_signals相同，会重置状态）"""
+        self._stream = self.stream_class(**params)
+
+    def on_bar(self, bar):
+        """输入一根新K线（含Close/High/Low的dict或Series），返回该K线的信号
+
+        每根K线O(1)更新指标，信号与对同一段历史调用generate_signals的结果一致
+        """
+        if self._stream is None:
+            self.start_stream()
+        return self._stream.update(bar)
+
+    @timed('backtest')
+    def backtest(self, signals, engine='loop'):
+        """回测引擎
+
+        engine: 'loop' 为逐K线参考实现，'vectorized' 为NumPy数组实现，两者结果一致
+        """
+        if engine == 'vectorized':
+            return self._backtest_vectorized(signals)
+        if engine != 'loop':
+            raise ValueError(f"未知回测引擎: {engine}")
+        if self.execution is not None or self.risk is not None:
+            raise ValueError("成交模型和风险控制仅支持 engine='vectorized'")
+
+        capital = self.initial_capital
+        position = 0
+        entry_capital = 0
+        entries = []
+        exits = []
+        profits = []
+        profit_pcts = []
+        portfolio_values = []
+        units = []
+        close = self._close_values()
+
+        for i in range(len(signals)):
+            price = float(close[i])
+            signal = int(signals.iloc[i])
+
+            # 买入
+            if signal == 1 and position == 0:
+                position = (capital * (1 - self.commission)) / price
+                units.append(position)
+                entry_capital = capital
+                capital = 0
+                entries.append(i)
+
+            # 卖出
+            elif signal == -1 and position > 0:
+                capital = position * price * (1 - self.commission)
+                profit = capital - entry_capital
+                exits.append(i)
+                profits.append(profit)
+                profit_pcts.append((profit / entry_capital) * 100)
+                position = 0
+
+            # 记录资产价值
+            portfolio_value = position * price if position > 0 else capital
+            portfolio_values.append(portfolio_value)
+
+        # 强制平仓
+        forced = position > 0
+        if forced:
+            last_price = float(close[-1])
+            capital = position * last_price * (1 - self.commission)
+            profit = capital - entry_capital
+            exits.append(len(signals) - 1)
+            profits.append(profit)
+            profit_pcts.append((profit / entry_capital) * 100)
+
+        exit_prices = close[exits]
+        forced_flags = np.zeros(len(entries), dtype=bool)
+        if forced:
+            exit_prices[-1] = float(close[-1])
+            forced_flags[-1] = True
+        trades = TradeLog.from_arrays(self.data.index, entries, exits, close[entries], exit_prices,
+                                      profits, profit_pcts, forced_flags)
+        # 累计成交额与向量化引擎按同一公式计算，两个引擎的换手率逐位一致
+        traded_value = float(np.dot(units, close[entries] + exit_prices))
+        return self._calculate_performance(portfolio_values, trades, traded_value)
+
+    def _values(self, name):
+        """单列数据的一维只读数组（兼容多层级列名，float64列不复制）"""
+        column = self.data[name]
+        if isinstance(column, pd.DataFrame):
+            column = column.iloc[:, 0]
+        values = np.asarray(column, dtype=float).view()
+        values.flags.writeable = False
+        return values
+
+    def _close_values(self):
+        """收盘价一维数组"""
+        return self._values('Close')
+
+    def _fingerprint(self, column):
+        """列数据指纹（每个实例每列只计算一次）"""
+        if column not in self._fingerprints:
+            self._fingerprints[column] = fingerprint(self._values(column))
+        return self._fingerprints[column]
+
+    def _indicator(self, name, column, *params):
+        """从指标库获取指标数组（按数据指纹和参数缓存）"""
+        return get_indicator(name, self._values(column), *params,
+                             data_fingerprint=self._fingerprint(column), cache=self.indicator_cache)
+
+    def _signal_series(self, signals):
+        """将信号数组包装为与数据对齐的Series"""
+        return pd.Series(signals, index=self.data.index, name='Signal')
+
+    def _backtest_vectorized(self, signals):
+        """向量化回测引擎（与逐K线循环的记账方式完全一致）"""
+        n = len(signals)
+        prices = self._close_values()[:n]
+        sig = np.asarray(signals).astype(np.int64)
+        dates = self.data.index
+
+        # 由信号推导持仓状态：最近一个有效信号为1即持仓
+        active = (sig == 1) | (sig == -1)
+        last_idx = np.maximum.accumulate(np.where(active, np.arange(n), -1))
+        holding = np.where(last_idx >= 0, sig[np.maximum(last_idx, 0)], 0) == 1
+        prev_holding = np.concatenate(([False], holding[:-1]))
+        buy_idx = np.flatnonzero(holding & ~prev_holding)
+        sell_idx = np.flatnonzero(~holding & prev_holding)
+        if self.execution is not None or self.risk is not None:
+            return self._backtest_execution(prices, buy_idx, sell_idx)
+
+        # 每笔交易的离场K线（未平仓的最后一笔按最后收盘价强制平仓）
+        last_price = float(self._close_values()[-1])
+        n_trades = len(buy_idx)
+        exit_idx = np.full(n_trades, n - 1, dtype=np.int64)
+        exit_idx[:len(sell_idx)] = sell_idx
+        exit_prices = prices[exit_idx]
+        forced = np.arange(n_trades) >= len(sell_idx)
+        exit_prices[forced] = last_price
+
+        # 资金链只随成交变化，按成交顺序计算以保证与参考实现逐位一致
+        units, entry_capitals, exit_capitals = capital_chain(
+            prices[buy_idx], exit_prices, self.initial_capital, self.commission
+        )
+
+        # 资产曲线：持仓时为持仓市值，空仓时为最近一次卖出后的现金
+        buys_so_far = np.cumsum(holding & ~prev_holding)
+        sells_so_far = np.cumsum(~holding & prev_holding)
+        held_units = np.append(units, 0.0)[buys_so_far - 1]
+        cash = np.concatenate(([self.initial_capital], exit_capitals))[sells_so_far]
+        portfolio_values = np.where(holding, held_units * prices, cash)
+
+        # 交易记录（列式）
+        profits = exit_capitals - entry_capitals
+        trades = TradeLog.from_arrays(
+            dates, buy_idx, exit_idx, prices[buy_idx], exit_prices, profits,
+            (profits / entry_capitals) * 100, forced
+        )
+        traded_value = float(np.dot(units, prices[buy_idx] + exit_prices))
+        return self._calculate_performance(portfolio_values, trades, traded_value)
+
+    def _backtest_execution(self, prices, buy_idx, sell_idx):
+        """按成交模型和风险控制回测：成交位置/价格由模型给出，资产曲线按实际成交K线计算"""
+        n = len(prices)
+        columns = self.data.columns
+        open_ = self._values('Open')[:n] if 'Open' in columns else None
+        volume = self._values('Volume')[:n] if 'Volume' in columns else None
+        model = self.execution if self.execution is not None else ExecutionModel()
+        orders = model.schedule(buy_idx, sell_idx, open_, prices)
+        fractions = None
+        if self.risk is not None:
+            fill_at_open = model.fill == 'next_open'
+            high = self._values('High')[:n] if 'High' in columns else prices
+            low = self._values('Low')[:n] if 'Low' in columns else prices
+            orders = self.risk.apply_exits(orders, open_, high, low, fill_at_open)
+            signal_index = orders['entry_index'] - 1 if fill_at_open else orders['entry_index']
+            fractions = self.risk.position_fractions(signal_index, prices, self.periods_per_year)
+        fills = model.settle(orders, volume, self.initial_capital, self.commission, fractions)
+
+        # 资产曲线：持仓时为持仓市值加剩余现金，空仓时为最近一次卖出后的现金
+        entered = np.zeros(n, dtype=np.int64)
+        entered[fills['entry_index']] = 1
+        exited = np.zeros(n, dtype=np.int64)
+        exited[fills['exit_index'][~fills['forced']]] = 1
+        entries_so_far = np.cumsum(entered)
+        exits_so_far = np.cumsum(exited)
+        holding = entries_so_far > exits_so_far
+        trade = np.maximum(entries_so_far - 1, 0)
+        held = np.append(fills['units'], 0.0)[trade] * prices + np.append(fills['cash_left'], 0.0)[trade]
+        cash = np.concatenate(([self.initial_capital], fills['exit_capital']))[exits_so_far]
+        portfolio_values = np.where(holding, held, cash)
+
+        profits = fills['exit_capital'] - fills['entry_capital']
+        trades = TradeLog.from_arrays(
+            self.data.index, fills['entry_index'], fills['exit_index'], fills['entry_price'],
+            fills['exit_price'], profits, (profits / fills['entry_capital']) * 100, fills['forced'],
+            fills.get('exit_reason')
+        )
+        traded_value = float(np.dot(fills['units'], fills['entry_price'] + fills['exit_price']))
+        return self._calculate_performance(portfolio_values, trades, traded_value)
+
+    @timed('calculate_performance')
+    def _calculate_performance(self, portfolio_values, trades, traded_value=0.0):
+        """计算绩效指标（trades 为 TradeLog；traded_value: 累计成交额，用于换手率）
+
+        资产价值数组单遍输入 metrics.MetricsAccumulator，年化按数据的K线级别换算
+        """
+        values = np.asarray(portfolio_values, dtype=np.float64)
+        accumulator = MetricsAccumulator(self.initial_capital, self.periods_per_year)
+        accumulator.update_many(values, holding=held_bars(trades), traded=traded_value)
+        metrics = accumulator.result()
+
+        # 买入持有收益
+        close = self._close_values()
+        buy_hold_return = ((float(close[-1]) / float(close[0])) - 1) * 100
+
+        metrics.update({
+            'win_rate': trades.win_rate,
+            'num_trades': trades.num_trades,
+            'buy_hold_return': buy_hold_return,
+            'portfolio_values': values.tolist() if isinstance(portfolio_values, np.ndarray) else portfolio_values,
+            'trades': trades,
+        })
+        return metrics
+
+
+# ============ 信号工具 ============
+def _shift(values):
+    """数组后移一位（首位补NaN）"""
+    return np.concatenate(([np.nan], values[:-1]))
+
+
+# ============ 策略1: 移动平均线交叉 ============
+class MAStrategy(StrategyBase):
+    """移动平均线交叉策略"""
+
+    stream_class = MAStream
+    params = (
+        Param('short_window', '短期均线', 5, 3, 20),
+        Param('long_window', '长期均线', 20, 10, 50),
+        Param('use_filter', '使用趋势过滤', True),
+    )
+
+    def generate_signals(self, short_window=5, long_window=20, use_filter=True):
+        ma_short = self._indicator('sma', 'Close', short_window)
+        ma_long = self._indicator('sma', 'Close', long_window)
+        prev_short, prev_long = _shift(ma_short), _shift(ma_long)
+
+        # 金叉
+        golden = (ma_short > ma_long) & (prev_short <= prev_long)
+        if use_filter:
+            ma_trend = self._indicator('sma', 'Close', 50)
+            golden &= self._close_values() > ma_trend
+
+        # 死叉
+        death = (ma_short < ma_long) & (prev_short >= prev_long)
+
+        return self._signal_series(np.where(golden, 1, np.where(death, -1, 0)))
+
+
+# ============ 策略2: RSI均值回归 ============
+class RSIStrategy(StrategyBase):
+    """RSI均值回归策略"""
+
+    stream_class = RSIStream
+    params = (
+        Param('rsi_period', 'RSI周期', 14, 5, 30),
+        Param('oversold', '超卖线', 35, 20, 40),
+        Param('overbought', '超买线', 80, 60, 90),
+    )
+
+    def generate_signals(self, rsi_period=14, oversold=35, overbought=80):
+        rsi = self._indicator('rsi', 'Close', rsi_period)
+
+        entries = rsi < oversold
+        exits = rsi > overbought
+        entries[:1] = exits[:1] = False
+
+        return self._signal_series(position_signals(entries, exits))
+
+
+# ============ 策略3: 布林带突破 ============
+class BollingerStrategy(StrategyBase):
+    """布林带突破策略"""
+
+    stream_class = BollingerStream
+    params = (
+        Param('period', '布林带周期', 20, 10, 30),
+        Param('num_std', '标准差倍数', 2.0, 1.0, 3.0, 0.1),
+    )
+
+    def generate_signals(self, period=20, num_std=2):
+        ma = self._indicator('sma', 'Close', period)
+        std = self._indicator('std', 'Close', period)
+        upper = ma + (std * num_std)
+        lower = ma - (std * num_std)
+
+        price = self._close_values()
+        entries = price < lower
+        exits = price > upper
+        entries[:1] = exits[:1] = False
+
+        return self._signal_series(position_signals(entries, exits))
+
+
+# ============ 策略4: MACD ============
+class MACDStrategy(StrategyBase):
+    """MACD策略"""
+
+    stream_class = MACDStream
+    params = (
+        Param('fast', '快线周期', 12, 5, 20),
+        Param('slow', '慢线周期', 26, 15, 40),
+        Param('signal', '信号线周期', 9, 5, 15),
+    )
+
+    def generate_signals(self, fast=12, slow=26, signal=9):
+        macd = self._indicator('ema', 'Close', fast) - self._indicator('ema', 'Close', slow)
+        signal_line = get_indicator('ema', macd, signal, cache=self.indicator_cache,
+                                    data_fingerprint=(self._fingerprint('Close'), 'macd', fast, slow))
+        prev_macd, prev_signal = _shift(macd), _shift(signal_line)
+
+        buy = (macd > signal_line) & (prev_macd <= prev_signal) & (macd < 0)
+        sell = (macd < signal_line) & (prev_macd >= prev_signal)
+
+        return self._signal_series(np.where(buy, 1, np.where(sell, -1, 0)))
+
+
+# ============ 策略5: 动量突破 ============
+class MomentumStrategy(StrategyBase):
+    """动量突破策略"""
+
+    stream_class = MomentumStream
+    params = (
+        Param('lookback', '回看周期', 20, 10, 50),
+        Param('entry_threshold', '突破阈值', 0.02, 0.01, 0.05, 0.01),
+    )
+
+    def generate_signals(self, lookback=20, entry_threshold=0.02):
+        # 使用前一根K线为止的N周期高低点
+        high_n = _shift(self._indicator('max', 'High', lookback))
+        low_n = _shift(self._indicator('min', 'Low', lookback))
+
+        price = self._close_values()
+        entries = price > high_n * (1 + entry_threshold)
+        exits = price < low_n
+        entries[:lookback] = exits[:lookback] = False
+
+        return self._signal_series(position_signals(entries, exits))
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐K线增量计算
+为模拟盘/实时场景提供 O(1) 更新的指标状态和各策略的增量信号状态机，
+数值计算方式与pandas的rolling/ewm一致，逐根输出的信号与批量 generate_signals 相同
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+NaN = float('nan')
+# 与pandas滚动方差相同的数值不稳定判定阈值
+_INV_COND_TOL = np.finfo(np.float64).eps * 1e3
+
+
+# ============ 增量指标 ============
+class RollingMean:
+    """滚动均值（Kahan求和的增减更新）"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def update(self, value):
+        if self.prev_value is None:
+            self.prev_value = value
+        self.values.append(value)
+        if len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        self._add(value)
+        return self.value
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        y = -val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    @property
+    def value(self):
+        if self.nobs < self.window or self.nobs == 0:
+            return NaN
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            return self.prev_value
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+
+class RollingStd:
+    """滚动标准差（Welford算法，样本标准差ddof=1）"""
+
+    def __init__(self, window, ddof=1):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self._reset()
+
+    def _reset(self):
+        self.nobs = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.numerically_unstable = False
+
+    def update(self, value):
+        self.values.append(value)
+        if len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        self._add(value)
+
+        # 出现数值不稳定时按窗口重新计算
+        if self.numerically_unstable:
+            self._reset()
+            for val in self.values:
+                self._add(val)
+            self.numerically_unstable = False
+        return self.value
+
+    def _add(self, val):
+        if val != val:
+            return
+        prev_m2 = self.ssqdm_x
+        self.nobs += 1
+        prev_mean = self.mean_x - self.compensation_add
+        y = val - self.compensation_add
+        t = y - self.mean_x
+        self.compensation_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+        if prev_m2 * _INV_COND_TOL > self.ssqdm_x:
+            self.numerically_unstable = True
+
+    def _remove(self, val):
+        if val != val:
+            return
+        prev_m2 = self.ssqdm_x
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.compensation_remove
+            y = val - self.compensation_remove
+            t = y - self.mean_x
+            self.compensation_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+            if prev_m2 * _INV_COND_TOL > self.ssqdm_x:
+                self.numerically_unstable = True
+        else:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+            self.numerically_unstable = False
+
+    @property
+    def value(self):
+        if self.nobs < self.window or self.nobs <= self.ddof:
+            return NaN
+        variance = self.ssqdm_x / (self.nobs - self.ddof)
+        return 0.0 if variance < 0 else math.sqrt(variance)
+
+
+class EWMA:
+    """指数加权移动平均（递推形式，等价于pandas的 ewm(span).mean()，adjust=True）"""
+
+    def __init__(self, span):
+        com = (span - 1) / 2
+        self.old_wt_factor = 1. - 1. / (1. + com)
+        self.weighted = None
+        self.old_wt = 1.
+
+    def update(self, value):
+        if self.weighted is None or self.weighted != self.weighted:
+            self.weighted = value
+            return self.weighted
+        if value == value:
+            self.old_wt *= self.old_wt_factor
+            if self.weighted != value:
+                self.weighted = (self.old_wt * self.weighted + value) / (self.old_wt + 1.)
+            self.old_wt += 1.
+        else:
+            self.old_wt *= self.old_wt_factor
+        return self.weighted
+
+    @property
+    def value(self):
+        return NaN if self.weighted is None else self.weighted
+
+
+class RollingExtreme:
+    """滚动最大/最小值（单调队列，均摊O(1)）"""
+
+    def __init__(self, window, mode='max'):
+        self.window = window
+        self.is_max = mode == 'max'
+        self.queue = deque()  # (序号, 数值)，数值单调
+        self.count = 0
+
+    def update(self, value):
+        i = self.count
+        self.count += 1
+        while self.queue and (self.queue[-1][1] <= value if self.is_max else self.queue[-1][1] >= value):
+            self.queue.pop()
+        self.queue.append((i, value))
+        while self.queue[0][0] <= i - self.window:
+            self.queue.popleft()
+        return self.value
+
+    @property
+    def value(self):
+        if self.count < self.window:
+            return NaN
+        return self.queue[0][1]
+
+
+# ============ 策略状态机 ============
+class _PositionStream:
+    """带持仓状态的增量策略基类：空仓时入场、持仓时离场"""
+
+    def __init__(self):
+        self.position = 0
+        self.bars = 0
+
+    def update(self, bar):
+        entry, exit_ = self._conditions(bar)
+        self.bars += 1
+        if entry and self.position == 0:
+            self.position = 1
+            return 1
+        if exit_ and self.position == 1:
+            self.position = 0
+            return -1
+        return 0
+
+    def _conditions(self, bar):
+        raise NotImplementedError
+
+
+class MAStream:
+    """移动平均线交叉（增量）"""
+
+    def __init__(self, short_window=5, long_window=20, use_filter=True):
+        self.ma_short = RollingMean(short_window)
+        self.ma_long = RollingMean(long_window)
+        self.ma_trend = RollingMean(50) if use_filter else None
+        self.prev_short = self.prev_long = NaN
+
+    def update(self, bar):
+        price = float(bar['Close'])
+        short, long_ = self.ma_short.update(price), self.ma_long.update(price)
+        trend = self.ma_trend.update(price) if self.ma_trend is not None else None
+        prev_short, prev_long = self.prev_short, self.prev_long
+        self.prev_short, self.prev_long = short, long_
+
+        if short > long_ and prev_short <= prev_long:
+            if trend is None or price > trend:
+                return 1
+        elif short < long_ and prev_short >= prev_long:
+            return -1
+        return 0
+
+
+class RSIStream(_PositionStream):
+    """RSI均值回归（增量）"""
+
+    def __init__(self, rsi_period=14, oversold=35, overbought=80):
+        super().__init__()
+        self.gain = RollingMean(rsi_period)
+        self.loss = RollingMean(rsi_period)
+        self.oversold = oversold
+        self.overbought = overbought
+        self.prev_price = NaN
+
+    def _conditions(self, bar):
+        price = float(bar['Close'])
+        delta = price - self.prev_price
+        self.prev_price = price
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-(delta if delta < 0 else 0.0))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.float64(gain) / np.float64(loss)
+            rsi = float(100 - (100 / (1 + rs)))
+        if self.bars == 0:
+            return False, False
+        return rsi < self.oversold, rsi > self.overbought
+
+
+class BollingerStream(_PositionStream):
+    """布林带突破（增量）"""
+
+    def __init__(self, period=20, num_std=2):
+        super().__init__()
+        self.ma = RollingMean(period)
+        self.std = RollingStd(period)
+        self.num_std = num_std
+
+    def _conditions(self, bar):
+        price = float(bar['Close'])
+        ma, std = self.ma.update(price), self.std.update(price)
+        if self.bars == 0:
+            return False, False
+        return price < ma - (std * self.num_std), price > ma + (std * self.num_std)
+
+
+class MACDStream:
+    """MACD（增量）"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.ema_fast = EWMA(fast)
+        self.ema_slow = EWMA(slow)
+        self.signal_line = EWMA(signal)
+        self.prev_macd = self.prev_signal = NaN
+
+    def update(self, bar):
+        price = float(bar['Close'])
+        macd = self.ema_fast.update(price) - self.ema_slow.update(price)
+        signal_line = self.signal_line.update(macd)
+        prev_macd, prev_signal = self.prev_macd, self.prev_signal
+        self.prev_macd, self.prev_signal = macd, signal_line
+
+        if macd > signal_line and prev_macd <= prev_signal and macd < 0:
+            return 1
+        if macd < signal_line and prev_macd >= prev_signal:
+            return -1
+        return 0
+
+
+class MomentumStream(_PositionStream):
+    """动量突破（增量）"""
+
+    def __init__(self, lookback=20, entry_threshold=0.02):
+        super().__init__()
+        self.lookback = lookback
+        self.entry_threshold = entry_threshold
+        self.high_n = RollingExtreme(lookback, 'max')
+        self.low_n = RollingExtreme(lookback, 'min')
+
+    def _conditions(self, bar):
+        # 与前一根K线为止的N周期高低点比较，再纳入当前K线
+        high_n, low_n = self.high_n.value, self.low_n.value
+        self.high_n.update(float(bar['High']))
+        self.low_n.update(float(bar['Low']))
+        if self.bars < self.lookback:
+            return False, False
+        price = float(bar['Close'])
+        return price > high_n * (1 + self.entry_threshold), price < low_n
+
+
+# ============ 数据回放 ============
+def replay_bars(data):
+    """把历史数据按K线逐根回放（用作模拟盘的数据源）
+
+    data: 行情DataFrame或 data_store.OHLCVColumns，逐根产出 {'date': 时间, 列名: 数值}
+    """
+    columns = [c for c in ['Open', 'High', 'Low', 'Close', 'Volume'] if c in data.columns]
+    arrays = {}
+    for name in columns:
+        column = data[name]
+        if getattr(column, 'ndim', 1) == 2:
+            column = column.iloc[:, 0]
+        arrays[name] = np.asarray(column, dtype=float).tolist()
+    for i, date in enumerate(data.index):
+        bar = {name: arrays[name][i] for name in columns}
+        bar['date'] = date
+        yield bar
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：项目模块位于仓库根目录（扁平布局），合成行情数据生成"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_ohlcv(n=1000, seed=0, freq='h', start='2022-01-01'):
+    """几何随机游走生成的OHLCV数据（High >= Close >= Low）"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.003, n)),
+        'High': close * (1 + rng.uniform(0, 0.01, n)),
+        'Low': close * (1 - rng.uniform(0, 0.01, n)),
+        'Close': close,
+        'Volume': rng.uniform(1e3, 1e5, n),
+    }, index=pd.date_range(start, periods=n, freq=freq))
+
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""批量回测：共享内存发布/挂载（DataFrame和本地行情库的OHLCVColumns），多进程结果与单进程一致"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_runner import _attach, _publish, build_tasks, run_batch
+from conftest import make_ohlcv
+from data_store import OHLCVStore
+from strategies import MAStrategy, RSIStrategy
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OHLCVStore(root=str(tmp_path), downloader=None)
+    store.write('BTC-USD', '1h', make_ohlcv(600, seed=1))
+    store.write('ETH-USD', '1h', make_ohlcv(400, seed=2))
+    return store
+
+
+def published_roundtrip(data):
+    segment, spec = _publish(data)
+    try:
+        attached_segment, attached = _attach(spec)
+        try:
+            return attached.index, {name: np.array(attached[name]) for name in attached.columns}
+        finally:
+            attached_segment.close()
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def test_publish_columns_view(store):
+    data = store.read_columns('BTC-USD', '1h')
+    index, columns = published_roundtrip(data)
+    assert index.equals(data.index)
+    assert list(columns) == data.columns
+    for name in data.columns:
+        np.testing.assert_array_equal(columns[name], data[name])
+
+
+def test_publish_dataframe_keeps_timezone_and_flattens_columns():
+    data = make_ohlcv(50, seed=3).tz_localize('UTC')
+    data.columns = pd.MultiIndex.from_product([data.columns, ['BTC-USD']])
+    index, columns = published_roundtrip(data)
+    assert index.equals(data.index)
+    assert list(columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    np.testing.assert_array_equal(columns['Close'], data[('Close', 'BTC-USD')].to_numpy())
+
+
+def test_run_batch_on_store_backed_datasets(store):
+    datasets = {ticker: store.read_columns(ticker, '1h') for ticker in ['BTC-USD', 'ETH-USD']}
+    param_sets = {'MAStrategy': [{}, {'short_window': 3, 'long_window': 10}]}
+    tasks = build_tasks(list(datasets), [MAStrategy, 'RSIStrategy'], param_sets)
+    summary = run_batch(datasets, tasks, max_workers=2)
+
+    assert len(summary) == len(tasks) == 6
+    assert summary.attrs['wall_seconds'] > 0
+    for task, row in zip(tasks, summary.to_dict('records')):
+        strategy = task['strategy'](datasets[task['ticker']].to_frame())
+        expected = strategy.backtest(strategy.generate_signals(**task['params']))
+        assert (row['ticker'], row['strategy'], row['params']) == (
+            task['ticker'], task['strategy'].__name__, task['params'])
+        for key in ['total_return', 'max_drawdown', 'num_trades', 'buy_hold_return']:
+            assert row[key] == pytest.approx(expected[key], nan_ok=True), key
+
+
+def test_run_batch_accepts_dataframes():
+    data = make_ohlcv(300, seed=4)
+    summary = run_batch({'BTC-USD': data}, build_tasks(['BTC-USD'], [RSIStrategy]), max_workers=1)
+    expected = RSIStrategy(data).backtest(RSIStrategy(data).generate_signals())
+    assert summary.loc[0, 'total_return'] == pytest.approx(expected['total_return'])
+
+
+def test_run_batch_without_tasks():
+    assert run_batch({'BTC-USD': make_ohlcv(10)}, []).empty
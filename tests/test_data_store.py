@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""本地行情库：增量刷新合并、meta.json原子切换和版本号、派生重采样数据、文件导入（桩下载函数，不联网）"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_ohlcv
+from data_store import OHLCVStore
+
+
+class StubDownloader:
+    """从一段"交易所历史"中按 period/start 返回数据，记录每次调用的参数"""
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+
+    def __call__(self, ticker, interval, period=None, start=None):
+        self.calls.append({'period': period, 'start': start})
+        if start is not None:
+            return self.history[self.history.index >= start]
+        return self.history
+
+
+def recent_history(n=100, seed=0):
+    start = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=n + 10)).floor('h')
+    return make_ohlcv(n, seed=seed, start=start)
+
+
+def meta(store, ticker, interval):
+    with open(os.path.join(store._path(ticker, interval), 'meta.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def version_dirs(store, ticker, interval):
+    return sorted(name for name in os.listdir(store._path(ticker, interval)) if name.startswith('v'))
+
+
+# ============ 刷新 ============
+def test_first_refresh_downloads_period(tmp_path):
+    history = recent_history()
+    stub = StubDownloader(history)
+    store = OHLCVStore(root=str(tmp_path), downloader=stub)
+
+    data = store.load_columns('BTC-USD', '1h', '1mo')
+    assert stub.calls == [{'period': '1mo', 'start': None}]
+    np.testing.assert_array_equal(data['Close'], history['Close'].to_numpy())
+    assert data.index.equals(history.index)
+
+
+def test_incremental_refresh_merges_new_bars(tmp_path):
+    full = recent_history(120)
+    stub = StubDownloader(full.iloc[:100].copy())
+    store = OHLCVStore(root=str(tmp_path), downloader=stub, refresh_interval=0)
+    store.refresh('BTC-USD', '1h', '1mo')
+
+    # 交易所侧：最后一根K线收盘价被修正，并新增20根K线
+    updated = full.copy()
+    updated.iloc[99, updated.columns.get_loc('Close')] *= 1.01
+    stub.history = updated
+    data = store.refresh('BTC-USD', '1h', '1mo')
+
+    assert stub.calls[-1] == {'period': None, 'start': full.index[99]}
+    assert len(data) == 120
+    assert data.index.equals(full.index)
+    np.testing.assert_array_equal(data['Close'], updated['Close'].to_numpy())
+
+
+def test_refresh_is_throttled(tmp_path):
+    stub = StubDownloader(recent_history())
+    store = OHLCVStore(root=str(tmp_path), downloader=stub, refresh_interval=3600)
+    store.refresh('BTC-USD', '1h', '1mo')
+    store.refresh('BTC-USD', '1h', '1mo')
+    assert len(stub.calls) == 1
+
+
+def test_longer_period_redownloads_and_merges(tmp_path):
+    history = recent_history(200)
+    stub = StubDownloader(history.iloc[100:])
+    store = OHLCVStore(root=str(tmp_path), downloader=stub)
+    store.refresh('BTC-USD', '1h', '1mo')
+
+    # 更长的周期超出已覆盖范围：整个周期重新下载，与已有数据合并
+    stub.history = history.iloc[:150]
+    data = store.refresh('BTC-USD', '1h', '3mo')
+    assert stub.calls[-1] == {'period': '3mo', 'start': None}
+    assert data.index.equals(history.index)
+
+
+def test_empty_download_returns_none(tmp_path):
+    stub = StubDownloader(recent_history().iloc[:0])
+    store = OHLCVStore(root=str(tmp_path), downloader=stub)
+    assert store.load_columns('BTC-USD', '1h', '1mo') is None
+
+
+# ============ 写入 ============
+def test_write_bumps_version_and_swaps_meta(tmp_path):
+    store = OHLCVStore(root=str(tmp_path))
+    first = make_ohlcv(50)
+    store.write('BTC-USD', '1h', first)
+    assert meta(store, 'BTC-USD', '1h')['version'] == 1
+    assert version_dirs(store, 'BTC-USD', '1h') == ['v1']
+    reader = store.read_columns('BTC-USD', '1h')
+
+    second = make_ohlcv(60, seed=1)
+    store.write('BTC-USD', '1h', second)
+    new_meta = meta(store, 'BTC-USD', '1h')
+    assert new_meta['version'] == 2
+    assert new_meta['columns'] == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert not os.path.exists(os.path.join(store._path('BTC-USD', '1h'), 'meta.json.tmp'))
+    np.testing.assert_array_equal(store.read_columns('BTC-USD', '1h')['Close'], second['Close'].to_numpy())
+    # 旧版本已映射的读者仍读到切换前的完整数据
+    np.testing.assert_array_equal(reader['Close'], first['Close'].to_numpy())
+
+
+def test_write_keeps_coverage_and_extra_meta(tmp_path):
+    store = OHLCVStore(root=str(tmp_path))
+    store.write('BTC-USD', '1h', make_ohlcv(10), covered_from='2022-01-01T00:00:00+00:00')
+    store.write_columns('BTC-USD', '1h', make_ohlcv(10).index, {'Close': np.arange(10.0)},
+                        extra_meta={'source': 'import'})
+    new_meta = meta(store, 'BTC-USD', '1h')
+    assert new_meta['covered_from'] == '2022-01-01T00:00:00+00:00'
+    assert new_meta['source'] == 'import'
+
+
+def test_timezone_round_trip(tmp_path):
+    store = OHLCVStore(root=str(tmp_path))
+    data = make_ohlcv(24)
+    data.index = data.index.tz_localize('UTC').tz_convert('America/New_York').as_unit('ns')
+    store.write('BTC-USD', '1h', data)
+    pd.testing.assert_frame_equal(store.read('BTC-USD', '1h'), data, check_freq=False)
+
+
+def test_columns_are_read_only(tmp_path):
+    store = OHLCVStore(root=str(tmp_path))
+    store.write('BTC-USD', '1h', make_ohlcv(10))
+    data = store.read_columns('BTC-USD', '1h')
+    with pytest.raises(ValueError):
+        data['Close'][0] = 0.0
+
+
+# ============ 并发写入 ============
+def test_concurrent_writers_get_distinct_versions(tmp_path):
+    store = OHLCVStore(root=str(tmp_path))
+    errors = []
+
+    def writer(seed):
+        try:
+            for i in range(5):
+                store.write('BTC-USD', '1h', make_ohlcv(20, seed=seed * 10 + i))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert meta(store, 'BTC-USD', '1h')['version'] == 40
+    assert version_dirs(store, 'BTC-USD', '1h') == ['v39', 'v40']
+    assert len(store.read_columns('BTC-USD', '1h')) == 20
+
+
+def test_previous_version_is_kept_for_readers(tmp_path):
+    store = OHLCVStore(root=str(tmp_path))
+    for seed in range(3):
+        store.write('BTC-USD', '1h', make_ohlcv(10, seed=seed))
+    assert version_dirs(store, 'BTC-USD', '1h') == ['v2', 'v3']
+
+
+def test_read_retries_when_version_is_removed(tmp_path, monkeypatch):
+    store = OHLCVStore(root=str(tmp_path))
+    for seed in range(3):
+        store.write('BTC-USD', '1h', make_ohlcv(10, seed=seed))
+
+    # 读者拿到的是已被清理的 v1 的meta.json
+    read_meta = store._read_meta
+    stale = [dict(read_meta('BTC-USD', '1h'), version=1)]
+    monkeypatch.setattr(store, '_read_meta', lambda ticker, interval: stale.pop() if stale
+                        else read_meta(ticker, interval))
+    data = store.read_columns('BTC-USD', '1h')
+    np.testing.assert_array_equal(data['Close'], make_ohlcv(10, seed=2)['Close'].to_numpy())
+
+
+def test_concurrent_refreshes_download_once(tmp_path):
+    history = recent_history()
+
+    class SlowDownloader(StubDownloader):
+        def __call__(self, *args, **kwargs):
+            time.sleep(0.1)
+            return super().__call__(*args, **kwargs)
+
+    stub = SlowDownloader(history)
+    store = OHLCVStore(root=str(tmp_path), downloader=stub, refresh_interval=3600)
+    threads = [threading.Thread(target=store.refresh, args=('BTC-USD', '1h', '1mo')) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(stub.calls) == 1
+    assert meta(store, 'BTC-USD', '1h')['version'] == 1
+
+
+# ============ 文件导入与重采样 ============
+def minute_bars(n=600, seed=0, start='2024-03-01'):
+    data = make_ohlcv(n, seed=seed, freq='min', start=start)
+    data.index = data.index.as_unit('ns')
+    frame = data.reset_index(names='timestamp')
+    frame['timestamp'] = frame['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return data.tz_localize('UTC'), frame
+
+
+def test_import_bars_round_trip(tmp_path):
+    data, frame = minute_bars()
+    path = tmp_path / 'bars.csv'
+    frame.to_csv(path, index=False)
+    store = OHLCVStore(root=str(tmp_path / 'store'))
+
+    assert store.import_file('BTC-USD', str(path), chunk_rows=128) == len(data)
+    stored = store.read('BTC-USD', '1m')
+    pd.testing.assert_frame_equal(stored, data, check_freq=False)
+    assert meta(store, 'BTC-USD', '1m')['source'] == 'import'
+    assert store.imported_tickers() == ['BTC-USD']
+    assert store.imported_interval('BTC-USD') == '1m'
+
+
+def test_import_merges_overlapping_bars(tmp_path):
+    data, frame = minute_bars(300)
+    store = OHLCVStore(root=str(tmp_path / 'store'))
+    frame.iloc[:200].to_csv(tmp_path / 'a.csv', index=False)
+    store.import_file('BTC-USD', str(tmp_path / 'a.csv'))
+
+    # 第二个文件与第一个重叠50根，重叠部分以新文件为准
+    second = frame.iloc[150:].copy()
+    second['Close'] = second['Close'] * 2
+    second.to_csv(tmp_path / 'b.csv', index=False)
+    store.import_file('BTC-USD', str(tmp_path / 'b.csv'))
+
+    stored = store.read('BTC-USD', '1m')
+    assert stored.index.equals(data.index)
+    np.testing.assert_allclose(stored['Close'].to_numpy()[:150], data['Close'].to_numpy()[:150])
+    np.testing.assert_allclose(stored['Close'].to_numpy()[150:], data['Close'].to_numpy()[150:] * 2)
+
+
+def test_import_trades_aggregates_to_bars(tmp_path):
+    times = pd.date_range('2024-03-01', periods=6, freq='20s', tz='UTC')
+    trades = pd.DataFrame({'time': times.as_unit('ms').asi8,   # 毫秒时间戳
+                           'price': [10.0, 12.0, 9.0, 11.0, 13.0, 12.5],
+                           'qty': [1.0, 2.0, 1.0, 1.0, 3.0, 1.0]})
+    trades.to_csv(tmp_path / 'trades.csv', index=False)
+    store = OHLCVStore(root=str(tmp_path / 'store'))
+    assert store.import_file('BTC-USD', str(tmp_path / 'trades.csv'), kind='trades') == 2
+
+    bars = store.read('BTC-USD', '1m')
+    assert bars[['Open', 'High', 'Low', 'Close', 'Volume']].values.tolist() == [
+        [10.0, 12.0, 9.0, 9.0, 4.0],
+        [11.0, 13.0, 11.0, 12.5, 5.0],
+    ]
+
+
+def test_import_rejects_unsorted_chunks(tmp_path):
+    _, frame = minute_bars(100)
+    frame.iloc[::-1].to_csv(tmp_path / 'bars.csv', index=False)
+    store = OHLCVStore(root=str(tmp_path / 'store'))
+    with pytest.raises(ValueError):
+        store.import_file('BTC-USD', str(tmp_path / 'bars.csv'), chunk_rows=10)
+
+
+def test_resampled_columns_are_stored_as_derived_data(tmp_path):
+    data, frame = minute_bars(600)
+    frame.to_csv(tmp_path / 'bars.csv', index=False)
+    store = OHLCVStore(root=str(tmp_path / 'store'))
+    store.import_file('BTC-USD', str(tmp_path / 'bars.csv'))
+
+    hourly = store.load_columns('BTC-USD', '1h', '1mo')
+    expected = data.resample('1h').agg({'Open': 'first', 'High': 'max', 'Low': 'min',
+                                        'Close': 'last', 'Volume': 'sum'})
+    assert hourly.index.equals(expected.index)
+    for column in expected.columns:
+        np.testing.assert_allclose(hourly[column], expected[column].to_numpy())
+
+    derived = meta(store, 'BTC-USD', '1h@1m')
+    assert derived['source'] == 'resample' and derived['base'] == '1m'
+    assert derived['source_version'] == meta(store, 'BTC-USD', '1m')['version']
+
+    # 导入数据未变时复用派生数据；重新导入后按新版本重新重采样
+    store.load_columns('BTC-USD', '1h', '1mo')
+    assert meta(store, 'BTC-USD', '1h@1m')['version'] == derived['version']
+    store.import_file('BTC-USD', str(tmp_path / 'bars.csv'))
+    store.load_columns('BTC-USD', '1h', '1mo')
+    assert meta(store, 'BTC-USD', '1h@1m')['source_version'] == meta(store, 'BTC-USD', '1m')['version']
+    assert meta(store, 'BTC-USD', '1h@1m')['version'] == derived['version'] + 1
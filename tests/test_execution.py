@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""成交模型：下一根开盘价成交、买卖价差、成交量参与率上限、阶梯费率，以及逐K线引擎的参数检查"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_ohlcv
+from execution import ExecutionModel, FeeSchedule
+from strategies import MAStrategy
+
+
+def run(data, signal_bars, model, initial_capital=10000, commission=0.001):
+    """按给定的 {K线位置: 信号} 回测，返回结果"""
+    signals = np.zeros(len(data), dtype=np.int64)
+    for i, signal in signal_bars.items():
+        signals[i] = signal
+    strategy = MAStrategy(data, initial_capital=initial_capital, commission=commission, execution=model)
+    return strategy.backtest(pd.Series(signals, index=data.index), engine='vectorized')
+
+
+def test_next_open_fills_at_next_bar_open():
+    data = make_ohlcv(30, seed=1)
+    result = run(data, {3: 1, 10: -1, 15: 1, 20: -1}, ExecutionModel(fill='next_open'))
+    trades = result['trades']
+    np.testing.assert_array_equal(trades['entry_index'], [4, 16])
+    np.testing.assert_array_equal(trades['exit_index'], [11, 21])
+    np.testing.assert_array_equal(trades['entry_price'], data['Open'].to_numpy()[[4, 16]])
+    np.testing.assert_array_equal(trades['exit_price'], data['Open'].to_numpy()[[11, 21]])
+    # 信号K线上仍为空仓，成交K线起持仓
+    values = np.asarray(result['portfolio_values'])
+    assert values[3] == 10000 and values[4] != 10000
+
+
+def test_next_open_drops_buy_on_last_bar():
+    data = make_ohlcv(20, seed=2)
+    result = run(data, {5: 1, 8: -1, 19: 1}, ExecutionModel(fill='next_open'))
+    assert result['num_trades'] == 1
+
+
+def test_next_open_sell_on_last_bar_is_forced_at_close():
+    data = make_ohlcv(20, seed=3)
+    trades = run(data, {5: 1, 19: -1}, ExecutionModel(fill='next_open'))['trades']
+    assert trades['forced'].tolist() == [True]
+    assert trades['exit_price'][0] == data['Close'].iloc[-1]
+
+
+def test_spread_moves_buy_and_sell_prices_in_opposite_directions():
+    data = make_ohlcv(40, seed=4)
+    bars = {5: 1, 12: -1, 20: 1, 30: -1}
+    plain = run(data, bars, ExecutionModel())['trades']
+    spread = run(data, bars, ExecutionModel(spread_bps=20))['trades']
+    np.testing.assert_allclose(spread['entry_price'], plain['entry_price'] * 1.001)
+    np.testing.assert_allclose(spread['exit_price'], plain['exit_price'] * 0.999)
+    assert (spread['profit'] < plain['profit']).all()
+
+
+def test_max_participation_caps_fill_and_keeps_cash():
+    data = make_ohlcv(20, seed=5)
+    data.loc[data.index[4], 'Volume'] = 40.0
+    model = ExecutionModel(max_participation=0.25)
+    result = run(data, {4: 1, 10: -1}, model)
+
+    close = data['Close'].to_numpy()
+    fills = model.execute([4], [10], None, close, data['Volume'].to_numpy(), 10000, 0.001)
+    # 全仓约可买 10000 / 100 = 100 个，上限为 0.25 * 40 = 10 个
+    assert fills['units'][0] == pytest.approx(10.0)
+    assert fills['cash_left'][0] == pytest.approx(10000 - 10 * close[4] / 0.999)
+    values = np.asarray(result['portfolio_values'])
+    np.testing.assert_allclose(values[4:10], 10 * close[4:10] + fills['cash_left'][0])
+    assert values[10] == pytest.approx(fills['cash_left'][0] + 10 * close[10] * 0.999)
+
+
+def test_max_participation_does_not_cap_small_orders():
+    data = make_ohlcv(20, seed=6)
+    bars = {4: 1, 10: -1}
+    unlimited = run(data, bars, ExecutionModel())
+    capped = run(data, bars, ExecutionModel(max_participation=0.5))
+    assert capped['portfolio_values'] == unlimited['portfolio_values']
+
+
+def test_fee_tiers_switch_on_cumulative_notional():
+    data = make_ohlcv(60, seed=7)
+    close = data['Close'].to_numpy()
+    fees = FeeSchedule([(0, 0.0001, 0.004), (15000, 0.0001, 0.001), (35000, 0.0001, 0.0002)])
+    model = ExecutionModel(fees=fees)
+    fills = model.execute([5, 20, 40], [10, 30, 50], None, close, None, 10000, 0.01)
+
+    # 逐笔按成交前的累计成交额取档位
+    def rate(traded):
+        return 0.0002 if traded >= 35000 else 0.001 if traded >= 15000 else 0.004
+
+    capital, traded = 10000.0, 0.0
+    for k, (entry, exit_) in enumerate([(5, 10), (20, 30), (40, 50)]):
+        units = capital * (1 - rate(traded)) / close[entry]
+        traded += units * close[entry]
+        capital = units * close[exit_] * (1 - rate(traded))
+        traded += units * close[exit_]
+        assert fills['units'][k] == pytest.approx(units)
+        assert fills['exit_capital'][k] == pytest.approx(capital)
+    assert traded > 35000
+
+
+def test_fee_schedule_liquidity_selects_column():
+    data = make_ohlcv(20, seed=8)
+    fees = FeeSchedule([(0, 0.0, 0.01)])
+    maker = run(data, {3: 1, 9: -1}, ExecutionModel(fees=fees, liquidity='maker'))
+    taker = run(data, {3: 1, 9: -1}, ExecutionModel(fees=fees, liquidity='taker'))
+    no_fee = run(data, {3: 1, 9: -1}, ExecutionModel(), commission=0.0)
+    assert maker['final_value'] == pytest.approx(no_fee['final_value'])
+    assert taker['final_value'] == pytest.approx(no_fee['final_value'] * 0.99 ** 2)
+
+
+def test_fee_schedule_must_start_at_zero():
+    with pytest.raises(ValueError):
+        FeeSchedule([(1000, 0.001, 0.001)])
+
+
+def test_from_config_builds_fee_schedule():
+    model = ExecutionModel.from_config({'fill': 'next_open', 'fee_tiers': [[0, 0.0008, 0.001]]})
+    assert model.fill == 'next_open' and model.fees.tiers == [(0.0, 0.0008, 0.001)]
+
+
+def test_loop_engine_rejects_execution_model():
+    data = make_ohlcv(50, seed=9)
+    strategy = MAStrategy(data, execution=ExecutionModel(fill='next_open'))
+    with pytest.raises(ValueError):
+        strategy.backtest(strategy.generate_signals(), engine='loop')
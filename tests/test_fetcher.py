@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""并发下载：重试/退避、部分失败和逐个币种的错误报告（注入桩下载函数，不联网）"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fetcher
+from conftest import make_ohlcv
+from data_store import OHLCVStore
+from fetcher import FetchError, YahooChartFetcher, fetch_many, load_many
+
+
+class FlakyFetcher:
+    """前 failures[ticker] 次调用抛出异常，之后返回数据；记录每个币种的调用次数"""
+
+    def __init__(self, failures=None, error=None, start='2022-01-01'):
+        self.failures = dict(failures or {})
+        self.start = start
+        self.error = error or (lambda ticker: FetchError(f'{ticker}: HTTP 503'))
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker, interval, period=None, start=None):
+        with self._lock:
+            self.calls[ticker] = self.calls.get(ticker, 0) + 1
+            attempt = self.calls[ticker]
+        if attempt <= self.failures.get(ticker, 0):
+            raise self.error(ticker)
+        return make_ohlcv(50, seed=len(ticker), start=self.start)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """替换退避等待：记录等待时长而不真正等待（抖动固定为1倍）"""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(fetcher.asyncio, 'sleep', fake_sleep)
+    monkeypatch.setattr(fetcher.random, 'random', lambda: 0.5)
+    return delays
+
+
+def test_retries_with_exponential_backoff(sleeps):
+    fake = FlakyFetcher({'BTC-USD': 2})
+    results = fetch_many([('BTC-USD', '1d')], fetcher=fake, retries=3, backoff=0.5)
+    assert isinstance(results[('BTC-USD', '1d')], pd.DataFrame)
+    assert fake.calls == {'BTC-USD': 3}
+    assert sleeps == [0.5, 1.0]
+
+
+def test_gives_up_after_retries(sleeps):
+    fake = FlakyFetcher({'BTC-USD': 10})
+    result = fetch_many([('BTC-USD', '1d')], fetcher=fake, retries=2, backoff=0.1)[('BTC-USD', '1d')]
+    assert isinstance(result, FetchError)
+    assert fake.calls == {'BTC-USD': 3}
+    assert sleeps == pytest.approx([0.1, 0.2])
+
+
+def test_non_retryable_error_is_not_retried(sleeps):
+    fake = FlakyFetcher({'NOPE-USD': 10}, error=lambda ticker: FetchError(f'{ticker}: 代码不存在', retryable=False))
+    result = fetch_many([('NOPE-USD', '1d')], fetcher=fake, retries=3)[('NOPE-USD', '1d')]
+    assert isinstance(result, FetchError) and not result.retryable
+    assert fake.calls == {'NOPE-USD': 1}
+    assert sleeps == []
+
+
+def test_partial_failure_reports_errors_per_ticker(sleeps):
+    fake = FlakyFetcher({'BAD-USD': 10, 'SLOW-USD': 1}, error=lambda ticker: ValueError(f'{ticker} 下载失败'))
+    pairs = [('BTC-USD', '1d'), ('BAD-USD', '1d'), ('SLOW-USD', '1h'), ('BTC-USD', '1d')]
+    results = fetch_many(pairs, fetcher=fake, retries=2, max_concurrency=2)
+
+    assert set(results) == {('BTC-USD', '1d'), ('BAD-USD', '1d'), ('SLOW-USD', '1h')}
+    assert isinstance(results[('BTC-USD', '1d')], pd.DataFrame)
+    assert isinstance(results[('SLOW-USD', '1h')], pd.DataFrame)
+    error = results[('BAD-USD', '1d')]
+    assert isinstance(error, ValueError) and 'BAD-USD' in str(error)
+    # 重复的任务只下载一次
+    assert fake.calls == {'BTC-USD': 1, 'BAD-USD': 3, 'SLOW-USD': 2}
+
+
+def test_results_are_normalized(sleeps):
+    def multiindex_fetcher(ticker, interval, period=None, start=None):
+        data = make_ohlcv(20)
+        data.columns = pd.MultiIndex.from_product([data.columns, [ticker]])
+        return data.iloc[::-1]
+
+    data = fetch_many([('BTC-USD', '1d')], fetcher=multiindex_fetcher)[('BTC-USD', '1d')]
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert data.index.is_monotonic_increasing
+
+
+def test_concurrency_is_bounded(sleeps):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def counting_fetcher(ticker, interval, period=None, start=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return make_ohlcv(10)
+
+    pairs = [(f'T{i}-USD', '1d') for i in range(12)]
+    results = fetch_many(pairs, fetcher=counting_fetcher, max_concurrency=3)
+    assert all(isinstance(results[pair], pd.DataFrame) for pair in pairs)
+    assert peak[0] <= 3
+
+
+def test_load_many_goes_through_store(tmp_path, sleeps):
+    start = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=60)).floor('h')
+    fake = FlakyFetcher({'ETH-USD': 1}, start=start)
+    store = OHLCVStore(root=str(tmp_path), downloader=fake)
+    results = load_many([('BTC-USD', '1h'), ('ETH-USD', '1h')], '1mo', store=store)
+
+    expected = make_ohlcv(50, seed=len('BTC-USD'), start=start)
+    np.testing.assert_array_equal(results[('BTC-USD', '1h')]['Close'], expected['Close'].to_numpy())
+    assert len(results[('ETH-USD', '1h')]) == 50
+    assert fake.calls == {'BTC-USD': 1, 'ETH-USD': 2}
+
+
+# ============ Yahoo chart 接口（桩HTTP会话） ============
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """按顺序返回预设响应，记录请求"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params=None, timeout=None):
+        self.requests.append((url, params))
+        return self.responses.pop(0)
+
+
+def chart_payload(n=3):
+    timestamps = [1700000000 + 3600 * i for i in range(n)]
+    quote = {name: [float(i + 1) for i in range(n)] for name in ['open', 'high', 'low', 'close', 'volume']}
+    return {'chart': {'result': [{'timestamp': timestamps, 'indicators': {'quote': [quote]}}], 'error': None}}
+
+
+def stub_fetcher(responses):
+    chart = YahooChartFetcher(base_url='http://stub.invalid/')
+    session = FakeSession(responses)
+    chart._session = lambda: session
+    return chart, session
+
+
+def test_chart_fetcher_retries_server_errors(sleeps):
+    chart, session = stub_fetcher([FakeResponse(503), FakeResponse(429), FakeResponse(200, chart_payload())])
+    data = fetch_many([('BTC-USD', '1h')], period='1mo', fetcher=chart, retries=3)[('BTC-USD', '1h')]
+    assert len(data) == 3 and data['Close'].tolist() == [1.0, 2.0, 3.0]
+    assert len(session.requests) == 3 and len(sleeps) == 2
+    url, params = session.requests[0]
+    assert url == 'http://stub.invalid/v8/finance/chart/BTC-USD'
+    assert params['range'] == '1mo' and params['interval'] == '1h'
+
+
+def test_chart_fetcher_does_not_retry_missing_ticker(sleeps):
+    chart, session = stub_fetcher([FakeResponse(404)])
+    error = fetch_many([('NOPE-USD', '1d')], fetcher=chart, retries=3)[('NOPE-USD', '1d')]
+    assert isinstance(error, FetchError) and not error.retryable and 'NOPE-USD' in str(error)
+    assert len(session.requests) == 1
+
+
+def test_chart_payload_error_is_not_retryable():
+    with pytest.raises(FetchError) as info:
+        YahooChartFetcher.parse({'chart': {'result': None, 'error': {'code': 'Not Found'}}})
+    assert not info.value.retryable
+
+
+def test_chart_empty_payload_gives_empty_frame():
+    data = YahooChartFetcher.parse({'chart': {'result': [{'timestamp': None}], 'error': None}})
+    assert data.empty and list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def test_async_api_returns_exceptions_in_place(sleeps):
+    def fetch(ticker, interval):
+        if ticker == 'BAD-USD':
+            raise FetchError('boom', retryable=False)
+        return ticker
+
+    results = asyncio.run(fetcher.fetch_many_async([('A', '1d'), ('BAD-USD', '1d')], fetch))
+    assert results[('A', '1d')] == 'A'
+    assert isinstance(results[('BAD-USD', '1d')], FetchError)
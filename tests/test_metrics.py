@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""绩效指标：年化口径、逐K线与批量累积一致、与pandas计算的夏普/索提诺一致"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import MetricsAccumulator, infer_periods_per_year
+
+
+def test_annual_return_counts_intervals():
+    # 366根日线覆盖365天，总收益10%：年化后约为10%（而不是按K线数少算一天）
+    index = pd.date_range('2023-01-01', periods=366, freq='D')
+    values = np.linspace(100, 110, len(index))
+    periods_per_year = infer_periods_per_year(index)
+    accumulator = MetricsAccumulator(100, periods_per_year)
+    accumulator.update_many(values)
+    expected = (1.1 ** (periods_per_year / 365) - 1) * 100
+    assert accumulator.result()['annual_return'] == pytest.approx(expected)
+    assert accumulator.result()['annual_return'] == pytest.approx(10.0, abs=0.01)
+
+
+def test_streaming_matches_batch():
+    rng = np.random.default_rng(0)
+    values = 10000 * np.cumprod(1 + rng.normal(0, 0.01, 500))
+    holding = rng.random(500) < 0.6
+
+    batch = MetricsAccumulator(10000, 365)
+    batch.update_many(values, holding=holding, traded=1234.5)
+    streaming = MetricsAccumulator(10000, 365)
+    streaming.update_many(values[:200], holding=holding[:200], traded=1000.0)
+    for value, held in zip(values[200:-1], holding[200:-1]):
+        streaming.update(value, holding=held)
+    streaming.update(values[-1], holding=holding[-1], traded=234.5)
+
+    expected, actual = batch.result(), streaming.result()
+    for key in expected:
+        assert actual[key] == pytest.approx(expected[key], rel=1e-9), key
+
+
+def test_ratios_match_pandas():
+    rng = np.random.default_rng(1)
+    values = pd.Series(10000 * np.cumprod(1 + rng.normal(0.0005, 0.01, 300)))
+    accumulator = MetricsAccumulator(10000, 252)
+    accumulator.update_many(values.to_numpy())
+    result = accumulator.result()
+
+    returns = values.pct_change().dropna()
+    downside = np.sqrt((np.minimum(returns, 0) ** 2).mean())
+    assert result['sharpe_ratio'] == pytest.approx(returns.mean() / returns.std() * np.sqrt(252))
+    assert result['sortino_ratio'] == pytest.approx(returns.mean() / downside * np.sqrt(252))
+    drawdown = (values / values.cummax() - 1).min() * 100
+    assert result['max_drawdown'] == pytest.approx(drawdown)
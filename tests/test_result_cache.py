@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""结果缓存键：规范化参数、按模块限定名区分同名策略"""
+
+from result_cache import result_key
+from strategies import RSIStrategy
+
+
+def test_cache_key_normalizes_params():
+    assert RSIStrategy.cache_key({'rsi_period': '14'}) == RSIStrategy.cache_key()
+    assert RSIStrategy.cache_key()[0] == 'strategies.RSIStrategy'
+
+
+def test_same_named_strategies_do_not_share_results():
+    class RSIStrategy_(RSIStrategy):
+        pass
+
+    RSIStrategy_.__name__ = 'RSIStrategy'
+    assert RSIStrategy_.cache_key() != RSIStrategy.cache_key()
+    assert result_key('fp', RSIStrategy_) != result_key('fp', RSIStrategy)
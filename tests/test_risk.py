@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+风险控制：止损/移动止损/止盈的离场位置和价格、提前离场后的空仓、仓位比例和波动率目标
+oracle 是逐K线的状态机实现，作为 RiskManager.apply_exits 数组实现的对照
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_ohlcv
+from execution import ExecutionModel
+from risk import RiskManager
+from strategies import MAStrategy, RSIStrategy
+from trade_log import EXIT_END, EXIT_SIGNAL, EXIT_STOP_LOSS, EXIT_TAKE_PROFIT, EXIT_TRAILING_STOP
+
+
+# ============ 逐K线参考实现 ============
+def oracle(data, signals, stop_loss=0.0, trailing_stop=0.0, take_profit=0.0, fill_open=False,
+           fractions=None, initial_capital=10000, commission=0.001):
+    """逐K线模拟：返回 (资产曲线, [(入场K线, 离场K线, 离场价, 离场原因), ...])
+
+    fractions: 买入信号K线位置 -> 投入资金比例，None表示全仓
+    """
+    open_, high, low, close = (data[name].to_numpy() for name in ['Open', 'High', 'Low', 'Close'])
+    n = len(close)
+    cash, units = float(initial_capital), 0.0
+    capital = float(initial_capital)
+    in_trade = signal_long = False
+    pending_entry = pending_exit = None
+    values, trades = [], []
+
+    def enter(bar, price, signal_bar):
+        nonlocal cash, units, in_trade, entry_bar, entry_price, peak
+        budget = capital * (fractions(signal_bar) if fractions else 1.0)
+        units = budget * (1 - commission) / price
+        cash = capital - budget
+        in_trade, entry_bar, entry_price, peak = True, bar, price, price
+
+    def leave(bar, price, reason):
+        nonlocal capital, cash, units, in_trade
+        capital = cash + units * price * (1 - commission)
+        cash, units, in_trade = capital, 0.0, False
+        trades.append((entry_bar, bar, price, reason))
+
+    entry_bar = entry_price = peak = None
+    for i in range(n):
+        # 下一根开盘价成交：先执行上一根K线留下的订单
+        if pending_exit is not None and in_trade:
+            leave(i, open_[i], EXIT_SIGNAL)
+        if pending_entry is not None:
+            enter(i, open_[i], pending_entry)
+        pending_entry = pending_exit = None
+
+        # 止损/止盈（收盘价成交时入场K线本身不检查）
+        if in_trade and (fill_open or i > entry_bar):
+            stop, reason = -np.inf, EXIT_STOP_LOSS
+            if stop_loss:
+                stop = entry_price * (1 - stop_loss)
+            if trailing_stop and peak * (1 - trailing_stop) > stop:
+                stop, reason = peak * (1 - trailing_stop), EXIT_TRAILING_STOP
+            target = entry_price * (1 + take_profit) if take_profit else np.inf
+            if low[i] <= stop:
+                leave(i, min(open_[i], stop), reason)
+            elif high[i] >= target:
+                leave(i, max(open_[i], target), EXIT_TAKE_PROFIT)
+            else:
+                peak = max(peak, high[i])
+
+        # 策略信号：只在策略持仓状态变化时下单，提前离场后等待下一个买入信号
+        was_long = signal_long
+        if signals[i] == 1:
+            signal_long = True
+        elif signals[i] == -1:
+            signal_long = False
+        if signal_long and not was_long:
+            if not fill_open:
+                enter(i, close[i], i)
+            elif i + 1 < n:
+                pending_entry = i
+        elif was_long and not signal_long and in_trade:
+            if not fill_open:
+                leave(i, close[i], EXIT_SIGNAL)
+            else:
+                pending_exit = i
+
+        values.append(units * close[i] + cash if in_trade else capital)
+
+    if in_trade:
+        leave(n - 1, close[-1], EXIT_END)
+    return np.array(values), trades
+
+
+def backtest(data, signals, fill_open=False, **risk):
+    execution = ExecutionModel(fill='next_open') if fill_open else None
+    strategy = MAStrategy(data, execution=execution, risk=RiskManager(**risk))
+    return strategy.backtest(pd.Series(signals, index=data.index), engine='vectorized')
+
+
+def assert_matches_oracle(result, expected_values, expected_trades):
+    trades = result['trades']
+    assert [tuple(t) for t in zip(trades['entry_index'], trades['exit_index'])] == [t[:2] for t in expected_trades]
+    np.testing.assert_allclose(trades['exit_price'], [t[2] for t in expected_trades], rtol=1e-12)
+    assert trades['exit_reason'].tolist() == [t[3] for t in expected_trades]
+    np.testing.assert_allclose(result['portfolio_values'], expected_values, rtol=1e-9)
+
+
+def bars(rows, volume=1e6):
+    """由 (开, 高, 低, 收) 列表构造行情"""
+    data = pd.DataFrame(rows, columns=['Open', 'High', 'Low', 'Close'], dtype=float,
+                        index=pd.date_range('2024-01-01', periods=len(rows), freq='h'))
+    data['Volume'] = volume
+    return data
+
+
+def signal_array(n, marks):
+    signals = np.zeros(n, dtype=np.int64)
+    for i, signal in marks.items():
+        signals[i] = signal
+    return signals
+
+
+# ============ 逐个规则 ============
+def test_stop_loss_fills_at_stop_price():
+    data = bars([(100, 101, 99, 100), (100, 101, 97, 98), (98, 99, 94, 95), (95, 96, 94, 95)])
+    trades = backtest(data, signal_array(4, {0: 1}), stop_loss=0.05)['trades']
+    assert trades['exit_index'].tolist() == [2]
+    assert trades['exit_price'][0] == pytest.approx(95.0)
+    assert trades['exit_reason'].tolist() == [EXIT_STOP_LOSS]
+
+
+def test_stop_loss_gap_fills_at_open():
+    data = bars([(100, 101, 99, 100), (100, 101, 97, 98), (90, 92, 89, 91), (91, 92, 90, 91)])
+    trades = backtest(data, signal_array(4, {0: 1}), stop_loss=0.05)['trades']
+    assert trades['exit_index'].tolist() == [2]
+    assert trades['exit_price'][0] == 90.0
+
+
+def test_trailing_stop_follows_highest_high():
+    data = bars([(100, 100, 100, 100), (101, 110, 100, 108), (108, 120, 107, 115),
+                 (115, 116, 109, 110), (110, 111, 107, 108), (108, 109, 100, 105)])
+    trades = backtest(data, signal_array(6, {0: 1}), trailing_stop=0.1)['trades']
+    # 入场以来最高价120，移动止损价108：第3根最低109未触发，第4根最低107触发
+    assert trades['exit_index'].tolist() == [4]
+    assert trades['exit_price'][0] == pytest.approx(108.0)
+    assert trades['exit_reason'].tolist() == [EXIT_TRAILING_STOP]
+
+
+def test_trailing_stop_ignores_current_bar_high():
+    # 同一根K线先创新高再回落：高低点先后未知，不用当根最高价抬高止损
+    data = bars([(100, 100, 100, 100), (100, 130, 100, 101), (101, 102, 100, 101)])
+    trades = backtest(data, signal_array(3, {0: 1}), trailing_stop=0.1)['trades']
+    assert trades['exit_reason'].tolist() == [EXIT_TRAILING_STOP]
+    assert trades['exit_index'].tolist() == [2]
+    # 第2根开盘101已低于止损价117，按开盘价成交
+    assert trades['exit_price'][0] == 101.0
+
+
+def test_stop_wins_when_bar_touches_stop_and_target():
+    data = bars([(100, 100, 100, 100), (100, 112, 94, 100), (100, 101, 99, 100)])
+    trades = backtest(data, signal_array(3, {0: 1}), stop_loss=0.05, take_profit=0.1)['trades']
+    assert trades['exit_index'].tolist() == [1]
+    assert trades['exit_reason'].tolist() == [EXIT_STOP_LOSS]
+    assert trades['exit_price'][0] == pytest.approx(95.0)
+
+
+def test_take_profit_gap_fills_at_open():
+    data = bars([(100, 100, 100, 100), (100, 104, 99, 103), (115, 116, 114, 115)])
+    trades = backtest(data, signal_array(3, {0: 1}), take_profit=0.1)['trades']
+    assert trades['exit_index'].tolist() == [2]
+    assert trades['exit_price'][0] == 115.0
+    assert trades['exit_reason'].tolist() == [EXIT_TAKE_PROFIT]
+
+
+def test_flat_after_early_exit_until_next_buy():
+    rows = [(100, 100, 100, 100), (100, 101, 90, 92), (92, 95, 91, 94), (94, 96, 93, 95),
+            (95, 97, 94, 96), (96, 98, 95, 97), (97, 99, 96, 98), (98, 99, 97, 98)]
+    data = bars(rows)
+    close = data['Close'].to_numpy()
+    # 第0根买入，第1根止损；第3根的卖出信号不产生交易，第5根重新买入
+    result = backtest(data, signal_array(len(rows), {0: 1, 3: -1, 5: 1}), stop_loss=0.05)
+    trades = result['trades']
+    assert trades['entry_index'].tolist() == [0, 5]
+    assert trades['exit_reason'].tolist() == [EXIT_STOP_LOSS, EXIT_END]
+    values = np.asarray(result['portfolio_values'])
+    assert (values[1:5] == values[1]).all()
+    np.testing.assert_allclose(values[5:] / values[5], close[5:] / close[5])
+
+
+# ============ 与逐K线实现对照 ============
+RULES = [
+    {'stop_loss': 0.02},
+    {'trailing_stop': 0.03},
+    {'take_profit': 0.04},
+    {'stop_loss': 0.02, 'trailing_stop': 0.03, 'take_profit': 0.05},
+    {'stop_loss': 0.01, 'trailing_stop': 0.015, 'take_profit': 0.02},
+]
+
+
+@pytest.mark.parametrize('fill_open', [False, True], ids=['close', 'next_open'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('rules', RULES, ids=lambda rules: '-'.join(rules))
+def test_exits_match_bar_loop(rules, seed, fill_open):
+    data = make_ohlcv(1500, seed=seed)
+    signals = RSIStrategy(data).generate_signals(rsi_period=7, oversold=30, overbought=70).to_numpy()
+    result = backtest(data, signals, fill_open=fill_open, **rules)
+    values, trades = oracle(data, signals, fill_open=fill_open, **rules)
+    assert len(trades) > 10
+    assert_matches_oracle(result, values, trades)
+
+
+def test_no_rules_leaves_backtest_unchanged():
+    data = make_ohlcv(800, seed=3)
+    strategy = RSIStrategy(data)
+    signals = strategy.generate_signals()
+    plain = strategy.backtest(signals, engine='vectorized')
+    managed = RSIStrategy(data, risk=RiskManager()).backtest(signals, engine='vectorized')
+    assert managed['portfolio_values'] == plain['portfolio_values']
+
+
+# ============ 仓位 ============
+def test_position_size_scales_position():
+    data = make_ohlcv(1000, seed=4)
+    signals = RSIStrategy(data).generate_signals(rsi_period=7, oversold=30, overbought=70).to_numpy()
+    result = backtest(data, signals, stop_loss=0.03, position_size=0.5)
+    values, trades = oracle(data, signals, stop_loss=0.03, fractions=lambda bar: 0.5)
+    assert_matches_oracle(result, values, trades)
+    full = backtest(data, signals, stop_loss=0.03)
+    assert abs(result['max_drawdown']) < abs(full['max_drawdown'])
+
+
+def test_target_vol_scales_by_trailing_volatility():
+    data = make_ohlcv(1000, seed=5)
+    signals = RSIStrategy(data).generate_signals(rsi_period=7, oversold=30, overbought=70).to_numpy()
+    periods_per_year = 24 * 365
+    risk = {'target_vol': 0.1, 'position_size': 0.8, 'periods_per_year': periods_per_year}
+    vol = data['Close'].pct_change().rolling(20).std().to_numpy() * np.sqrt(periods_per_year)
+
+    def fractions(bar):
+        return 0.8 * min(1.0, 0.1 / vol[bar]) if vol[bar] > 0 else 0.8
+
+    assert fractions(int(np.flatnonzero(signals == 1)[-1])) < 0.8
+    result = backtest(data, signals, **risk)
+    values, trades = oracle(data, signals, fractions=fractions)
+    assert_matches_oracle(result, values, trades)
+
+
+def test_target_vol_never_levers_up():
+    manager = RiskManager(target_vol=2.0, periods_per_year=24 * 365)
+    close = make_ohlcv(100, seed=6)['Close'].to_numpy()
+    np.testing.assert_array_equal(manager.position_fractions(np.array([5, 50, 99]), close), [1.0, 1.0, 1.0])
+
+
+def test_loop_engine_rejects_risk_manager():
+    data = make_ohlcv(50, seed=7)
+    strategy = MAStrategy(data, risk=RiskManager(stop_loss=0.05))
+    with pytest.raises(ValueError):
+        strategy.backtest(strategy.generate_signals(), engine='loop')
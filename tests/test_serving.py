@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""多用户服务：共享行情缓存的单次加载/TTL过期/LRU淘汰，后台任务池的合并、失败和清理"""
+
+import threading
+import time
+
+import pytest
+
+import serving
+from serving import JobPool, SharedDataCache
+
+
+def wait_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, job
+        time.sleep(0.005)
+    return job
+
+
+@pytest.fixture
+def pool():
+    pool = JobPool(max_workers=2, keep=3)
+    yield pool
+    pool.shutdown()
+
+
+# ============ 行情数据 ============
+class SlowLoader:
+    """等待 release 后返回 (key, 调用序号)，记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, *key):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        self.started.set()
+        assert self.release.wait(5)
+        return key, call
+
+
+def test_concurrent_gets_load_once():
+    loader = SlowLoader()
+    cache = SharedDataCache(loader)
+    results = []
+
+    def get():
+        results.append(cache.get('BTC-USD', '6mo', '1d'))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    assert loader.started.wait(5)
+    time.sleep(0.05)
+    loader.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert loader.calls == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert cache.stats()['misses'] == 1 and cache.stats()['loading'] == 0
+
+
+def test_ttl_expiry_reloads(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(serving.time, 'monotonic', lambda: now[0])
+    calls = []
+    cache = SharedDataCache(lambda *key: calls.append(key) or len(calls), ttl=60)
+
+    assert cache.get('BTC-USD') == 1
+    now[0] += 59
+    assert cache.get('BTC-USD') == 1
+    now[0] += 2
+    assert cache.get('BTC-USD') == 2
+    assert calls == [('BTC-USD',), ('BTC-USD',)]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_lru_eviction():
+    cache = SharedDataCache(lambda ticker: ticker.lower(), maxsize=2)
+    cache.get('A')
+    cache.get('B')
+    cache.get('A')
+    cache.get('C')
+    assert len(cache) == 2
+    cache.get('A')
+    assert cache.stats()['hits'] == 2
+    cache.get('B')
+    assert cache.stats()['misses'] == 4
+
+
+def test_none_and_errors_are_not_cached():
+    results = [None, ValueError('下载失败'), 'data']
+
+    def loader(key):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    cache = SharedDataCache(loader)
+    assert cache.get('BTC-USD') is None
+    with pytest.raises(ValueError):
+        cache.get('BTC-USD')
+    assert cache.get('BTC-USD') == 'data'
+    assert cache.get('BTC-USD') == 'data'
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'hit_rate': 0.25, 'size': 1, 'loading': 0}
+
+
+def test_waiters_see_loader_error():
+    loader_started, release = threading.Event(), threading.Event()
+
+    def loader(key):
+        loader_started.set()
+        assert release.wait(5)
+        raise RuntimeError('boom')
+
+    cache = SharedDataCache(loader)
+    errors = []
+
+    def get():
+        try:
+            cache.get('BTC-USD')
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert loader_started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 4
+    assert cache.stats()['loading'] == 0 and len(cache) == 0
+
+
+# ============ 后台任务 ============
+def test_job_reports_progress_and_result(pool):
+    def work(progress):
+        for i in range(1, 5):
+            progress(i, 4)
+        return 'result'
+
+    job = wait_finished(pool.submit('sweep', work, label='扫描'))
+    assert job.state == 'done' and job.result == 'result'
+    assert job.progress == 1.0 and job.error is None
+    assert job.started_at is not None and job.finished_at >= job.started_at
+    assert pool.get(job.id) is job
+
+
+def test_same_key_is_deduplicated(pool):
+    release = threading.Event()
+    calls = []
+
+    def work(progress):
+        calls.append(1)
+        assert release.wait(5)
+        return len(calls)
+
+    first = pool.submit(('BTC-USD', 'RSIStrategy'), work)
+    second = pool.submit(('BTC-USD', 'RSIStrategy'), work)
+    other = pool.submit(('ETH-USD', 'RSIStrategy'), work)
+    assert second is first and other is not first
+    release.set()
+    wait_finished(first)
+    wait_finished(other)
+    assert pool.submit(('BTC-USD', 'RSIStrategy'), work) is first
+    assert len(calls) == 2
+
+
+def test_none_key_is_never_deduplicated(pool):
+    first = pool.submit(None, lambda progress: 1)
+    second = pool.submit(None, lambda progress: 2)
+    assert first is not second
+    assert wait_finished(first).result == 1 and wait_finished(second).result == 2
+
+
+def test_failed_job_surfaces_exception_and_can_be_resubmitted(pool):
+    error = ValueError('参数错误')
+
+    def fail(progress):
+        raise error
+
+    job = wait_finished(pool.submit('key', fail))
+    assert job.state == 'failed' and job.error is error and job.result is None
+    assert pool.stats()['failed'] == 1
+
+    retry = wait_finished(pool.submit('key', lambda progress: 'ok'))
+    assert retry is not job and retry.result == 'ok'
+
+
+def test_finished_jobs_are_pruned(pool):
+    jobs = [wait_finished(pool.submit(f'job-{i}', lambda progress, i=i: i)) for i in range(6)]
+    pool.submit('last', lambda progress: None)
+    remaining = pool.jobs()
+    assert len([job for job in remaining if job.finished]) <= pool.keep
+    assert pool.get(jobs[0].id) is None
+    assert pool.get(jobs[-1].id) is jobs[-1]
+    # 被清理的任务键不再合并，重新提交会创建新任务
+    assert pool.submit('job-0', lambda progress: 0) is not jobs[0]
+
+
+def test_queued_jobs_wait_for_free_worker():
+    pool = JobPool(max_workers=1)
+    release = threading.Event()
+    try:
+        running = pool.submit('a', lambda progress: release.wait(5))
+        queued = pool.submit('b', lambda progress: 'b')
+        time.sleep(0.05)
+        assert running.state == 'running' and queued.state == 'queued'
+        assert pool.stats() == {'queued': 1, 'running': 1, 'done': 0, 'failed': 0, 'workers': 1}
+        release.set()
+        assert wait_finished(queued).result == 'b'
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+向量化信号与原逐行实现的一致性
+reference_* 是改为数组运算之前的逐行（iloc）实现，保留在这里作为对照
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_ohlcv
+from strategies import BollingerStrategy, MACDStrategy, MAStrategy, MomentumStrategy, RSIStrategy
+
+
+# ============ 原逐行实现 ============
+def reference_ma(df, short_window=5, long_window=20, use_filter=True):
+    df = df.copy()
+    df['MA_short'] = df['Close'].rolling(window=short_window).mean()
+    df['MA_long'] = df['Close'].rolling(window=long_window).mean()
+    if use_filter:
+        df['MA_trend'] = df['Close'].rolling(window=50).mean()
+    df['Signal'] = 0
+    for i in range(1, len(df)):
+        if (float(df['MA_short'].iloc[i]) > float(df['MA_long'].iloc[i]) and
+                float(df['MA_short'].iloc[i-1]) <= float(df['MA_long'].iloc[i-1])):
+            if not use_filter or float(df['Close'].iloc[i]) > float(df['MA_trend'].iloc[i]):
+                df.iloc[i, df.columns.get_loc('Signal')] = 1
+        elif (float(df['MA_short'].iloc[i]) < float(df['MA_long'].iloc[i]) and
+              float(df['MA_short'].iloc[i-1]) >= float(df['MA_long'].iloc[i-1])):
+            df.iloc[i, df.columns.get_loc('Signal')] = -1
+    return df['Signal'].fillna(0)
+
+
+def reference_rsi(df, rsi_period=14, oversold=35, overbought=80):
+    df = df.copy()
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=rsi_period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
+    df['RSI'] = 100 - (100 / (1 + gain / loss))
+    df['Signal'] = 0
+    position = 0
+    for i in range(1, len(df)):
+        rsi = float(df['RSI'].iloc[i])
+        if rsi < oversold and position == 0:
+            df.iloc[i, df.columns.get_loc('Signal')] = 1
+            position = 1
+        elif rsi > overbought and position == 1:
+            df.iloc[i, df.columns.get_loc('Signal')] = -1
+            position = 0
+    return df['Signal'].fillna(0)
+
+
+def reference_bollinger(df, period=20, num_std=2):
+    df = df.copy()
+    df['MA'] = df['Close'].rolling(window=period).mean()
+    df['STD'] = df['Close'].rolling(window=period).std()
+    df['Upper'] = df['MA'] + (df['STD'] * num_std)
+    df['Lower'] = df['MA'] - (df['STD'] * num_std)
+    df['Signal'] = 0
+    position = 0
+    for i in range(1, len(df)):
+        price = float(df['Close'].iloc[i])
+        if price < float(df['Lower'].iloc[i]) and position == 0:
+            df.iloc[i, df.columns.get_loc('Signal')] = 1
+            position = 1
+        elif price > float(df['Upper'].iloc[i]) and position == 1:
+            df.iloc[i, df.columns.get_loc('Signal')] = -1
+            position = 0
+    return df['Signal'].fillna(0)
+
+
+def reference_macd(df, fast=12, slow=26, signal=9):
+    df = df.copy()
+    df['MACD'] = df['Close'].ewm(span=fast).mean() - df['Close'].ewm(span=slow).mean()
+    df['Signal_Line'] = df['MACD'].ewm(span=signal).mean()
+    df['Signal'] = 0
+    for i in range(1, len(df)):
+        if (float(df['MACD'].iloc[i]) > float(df['Signal_Line'].iloc[i]) and
+                float(df['MACD'].iloc[i-1]) <= float(df['Signal_Line'].iloc[i-1]) and
+                float(df['MACD'].iloc[i]) < 0):
+            df.iloc[i, df.columns.get_loc('Signal')] = 1
+        elif (float(df['MACD'].iloc[i]) < float(df['Signal_Line'].iloc[i]) and
+              float(df['MACD'].iloc[i-1]) >= float(df['Signal_Line'].iloc[i-1])):
+            df.iloc[i, df.columns.get_loc('Signal')] = -1
+    return df['Signal'].fillna(0)
+
+
+def reference_momentum(df, lookback=20, entry_threshold=0.02):
+    df = df.copy()
+    df['High_N'] = df['High'].rolling(window=lookback).max()
+    df['Low_N'] = df['Low'].rolling(window=lookback).min()
+    df['Signal'] = 0
+    position = 0
+    for i in range(lookback, len(df)):
+        price = float(df['Close'].iloc[i])
+        if price > float(df['High_N'].iloc[i-1]) * (1 + entry_threshold) and position == 0:
+            df.iloc[i, df.columns.get_loc('Signal')] = 1
+            position = 1
+        elif price < float(df['Low_N'].iloc[i-1]) and position == 1:
+            df.iloc[i, df.columns.get_loc('Signal')] = -1
+            position = 0
+    return df['Signal'].fillna(0)
+
+
+# (策略类, 原实现, 参数网格)
+CASES = [
+    (MAStrategy, reference_ma, [
+        {}, {'short_window': 3, 'long_window': 10, 'use_filter': False}, {'short_window': 10, 'long_window': 60},
+    ]),
+    (RSIStrategy, reference_rsi, [
+        {}, {'rsi_period': 7, 'oversold': 30, 'overbought': 70}, {'rsi_period': 21, 'oversold': 45, 'overbought': 55},
+    ]),
+    (BollingerStrategy, reference_bollinger, [
+        {}, {'period': 10, 'num_std': 1.5}, {'period': 40, 'num_std': 1},
+    ]),
+    (MACDStrategy, reference_macd, [
+        {}, {'fast': 5, 'slow': 35, 'signal': 5}, {'fast': 8, 'slow': 17, 'signal': 9},
+    ]),
+    (MomentumStrategy, reference_momentum, [
+        {}, {'lookback': 5, 'entry_threshold': 0.0}, {'lookback': 50, 'entry_threshold': 0.005},
+    ]),
+]
+
+SIZES = [30, 400, 2000]
+
+PARAMS = [
+    pytest.param(strategy_cls, reference, params, n, id=f'{strategy_cls.__name__}-{i}-{n}')
+    for strategy_cls, reference, grid in CASES
+    for i, params in enumerate(grid)
+    for n in SIZES
+]
+
+
+@pytest.mark.parametrize('strategy_cls, reference, params, n', PARAMS)
+def test_signals_match_row_loop(strategy_cls, reference, params, n):
+    data = make_ohlcv(n, seed=n)
+    signals = strategy_cls(data).generate_signals(**params)
+    expected = reference(data, **params)
+    assert signals.index.equals(data.index)
+    np.testing.assert_array_equal(signals.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize('strategy_cls, reference, params, n', PARAMS)
+def test_loop_and_vectorized_engines_agree(strategy_cls, reference, params, n):
+    data = make_ohlcv(n, seed=n + 1)
+    strategy = strategy_cls(data)
+    signals = strategy.generate_signals(**params)
+    loop = strategy.backtest(signals, engine='loop')
+    vectorized = strategy.backtest(signals, engine='vectorized')
+
+    np.testing.assert_array_equal(np.asarray(loop['portfolio_values']), np.asarray(vectorized['portfolio_values']))
+    pd.testing.assert_frame_equal(loop['trades'].to_frame(), vectorized['trades'].to_frame())
+    metrics = [key for key in loop if key not in ('portfolio_values', 'trades')]
+    assert set(metrics) == set(vectorized) - {'portfolio_values', 'trades'}
+    for key in metrics:
+        assert loop[key] == vectorized[key] or (np.isnan(loop[key]) and np.isnan(vectorized[key])), key
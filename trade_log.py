@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式交易记录
+每笔交易（一次买入到卖出的完整往返）是NumPy结构化数组中的一行，日期按K线位置
+从行情索引中按需取出。相比逐笔的dict列表，内存占用小、没有GC负担，胜率等统计
+直接用数组运算；需要表格时通过 to_frame()/round_trips() 得到DataFrame视图。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+TRADE_DTYPE = np.dtype([
+    ('entry_index', np.int64),   # 买入K线位置
+    ('exit_index', np.int64),    # 卖出K线位置
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('profit', np.float64),      # 扣除手续费后的盈亏金额
+    ('profit_pct', np.float64),  # 相对买入前资金的盈亏百分比
+    ('forced', np.bool_),        # 回测结束时强制平仓
+    ('exit_reason', np.int8),    # 离场原因（EXIT_*）
+])
+
+# 离场原因
+EXIT_SIGNAL = 0          # 卖出信号
+EXIT_END = 1             # 回测结束强制平仓
+EXIT_STOP_LOSS = 2       # 止损
+EXIT_TRAILING_STOP = 3   # 移动止损
+EXIT_TAKE_PROFIT = 4     # 止盈
+
+EXIT_LABELS = {
+    EXIT_SIGNAL: 'SELL',
+    EXIT_END: 'SELL (Close)',
+    EXIT_STOP_LOSS: 'SELL (Stop)',
+    EXIT_TRAILING_STOP: 'SELL (Trailing)',
+    EXIT_TAKE_PROFIT: 'SELL (Target)',
+}
+
+
+class TradeLog:
+    """交易记录（结构化数组 + 行情时间索引）"""
+
+    __slots__ = ('records', 'dates')
+
+    def __init__(self, records, dates):
+        self.records = records
+        self.dates = dates
+
+    @classmethod
+    def from_arrays(cls, dates, entry_index, exit_index, entry_price, exit_price, profit, profit_pct,
+                    forced, exit_reason=None):
+        """exit_reason 缺省时按 forced 取 EXIT_END / EXIT_SIGNAL"""
+        records = np.empty(len(entry_index), dtype=TRADE_DTYPE)
+        records['entry_index'] = entry_index
+        records['exit_index'] = exit_index
+        records['entry_price'] = entry_price
+        records['exit_price'] = exit_price
+        records['profit'] = profit
+        records['profit_pct'] = profit_pct
+        records['forced'] = forced
+        if exit_reason is None:
+            exit_reason = np.where(records['forced'], EXIT_END, EXIT_SIGNAL)
+        records['exit_reason'] = exit_reason
+        return cls(records, dates)
+
+    @classmethod
+    def concat(cls, parts, dates):
+        """拼接多段交易记录：parts 为 [(TradeLog, 位置偏移, 盈亏金额缩放), ...]"""
+        chunks = []
+        for log, offset, scale in parts:
+            records = log.records.copy()
+            records['entry_index'] += offset
+            records['exit_index'] += offset
+            records['profit'] *= scale
+            chunks.append(records)
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=TRADE_DTYPE)
+        return cls(records, dates)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, field):
+        """按字段名取列，如 log['profit_pct']"""
+        return self.records[field]
+
+    def __repr__(self):
+        return f'TradeLog({len(self)} trades)'
+
+    # ============ 日期 ============
+    @property
+    def entry_dates(self):
+        return self.dates[self.records['entry_index']]
+
+    @property
+    def exit_dates(self):
+        return self.dates[self.records['exit_index']]
+
+    # ============ 统计 ============
+    @property
+    def num_trades(self):
+        return len(self.records)
+
+    @property
+    def win_rate(self):
+        """盈利交易占比（%）"""
+        if len(self.records) == 0:
+            return 0
+        return np.count_nonzero(self.records['profit'] > 0) / len(self.records) * 100
+
+    def stats(self):
+        """盈亏统计"""
+        profit = self.records['profit']
+        profit_pct = self.records['profit_pct']
+        if len(profit) == 0:
+            return {'num_trades': 0, 'win_rate': 0, 'total_profit': 0.0, 'avg_profit_pct': np.nan,
+                    'best_pct': np.nan, 'worst_pct': np.nan, 'profit_factor': np.nan}
+        gross_loss = -profit[profit < 0].sum()
+        return {
+            'num_trades': len(profit),
+            'win_rate': self.win_rate,
+            'total_profit': profit.sum(),
+            'avg_profit_pct': profit_pct.mean(),
+            'best_pct': profit_pct.max(),
+            'worst_pct': profit_pct.min(),
+            'profit_factor': profit[profit > 0].sum() / gross_loss if gross_loss > 0 else np.inf,
+        }
+
+    def exit_labels(self):
+        """每笔交易的离场类型标签（SELL / SELL (Stop) 等）"""
+        labels = np.empty(len(self.records), dtype=object)
+        for reason, label in EXIT_LABELS.items():
+            labels[self.records['exit_reason'] == reason] = label
+        return labels
+
+    # ============ DataFrame视图 ============
+    def round_trips(self):
+        """每笔交易一行"""
+        records = self.records
+        return pd.DataFrame({
+            'entry_date': self.entry_dates,
+            'exit_date': self.exit_dates,
+            'entry_price': records['entry_price'],
+            'exit_price': records['exit_price'],
+            'profit': records['profit'],
+            'profit_pct': records['profit_pct'],
+            'forced': records['forced'],
+            'exit_type': self.exit_labels(),
+        })
+
+    def to_frame(self):
+        """按成交顺序排列的买卖明细（每笔交易拆为 BUY 和 SELL 两行）"""
+        records = self.records
+        n = len(records)
+        types = np.empty(2 * n, dtype=object)
+        types[0::2] = 'BUY'
+        types[1::2] = self.exit_labels()
+        index = np.empty(2 * n, dtype=np.int64)
+        index[0::2] = records['entry_index']
+        index[1::2] = records['exit_index']
+        price = np.empty(2 * n)
+        price[0::2] = records['entry_price']
+        price[1::2] = records['exit_price']
+        profit = np.full(2 * n, np.nan)
+        profit[1::2] = records['profit']
+        profit_pct = np.full(2 * n, np.nan)
+        profit_pct[1::2] = records['profit_pct']
+        return pd.DataFrame({
+            'type': types,
+            'price': price,
+            'date': self.dates[index],
+            'profit': profit,
+            'profit_pct': profit_pct,
+        })
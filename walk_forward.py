@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动窗口样本外评估（Walk-Forward）
+把历史数据切分为连续的 训练窗口/测试窗口：在每个训练窗口上选出最优参数，
+在紧随其后的测试窗口上评估，最后把各测试窗口的资产曲线拼接为完整的样本外结果
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from trade_log import TradeLog
+
+
+# 工作进程内的共享状态（由 _init_worker 填充）
+_WORKER_STATE = {}
+
+
+def walk_forward_windows(n_bars, train_size, test_size, anchored=False):
+    """生成窗口位置列表 [(train_start, train_end, test_start, test_end), ...]（左闭右开）
+
+    anchored=True 时训练窗口起点固定为0（扩张窗口），否则为固定长度的滚动窗口
+    """
+    windows = []
+    test_start = train_size
+    while test_start < n_bars:
+        test_end = min(test_start + test_size, n_bars)
+        train_start = 0 if anchored else test_start - train_size
+        windows.append((train_start, test_start, test_start, test_end))
+        test_start = test_end
+    return windows
+
+
+def _slice(data, start, stop):
+    """按位置切片（DataFrame或OHLCVColumns）"""
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[start:stop]
+    return data.slice(start, stop)
+
+
+def _score(result, metric):
+    value = result[metric]
+    return -np.inf if value is None or np.isnan(value) else value
+
+
+def _evaluate_window(window):
+    """在训练窗口上选参，在测试窗口上评估"""
+    state = _WORKER_STATE
+    strategy_cls, data = state['strategy_cls'], state['data']
+    signal_matrix = state['signal_matrix']
+    train_start, train_end, test_start, test_end = window
+
+    train = strategy_cls(_slice(data, train_start, train_end), **state['strategy_kwargs'])
+    scores = [
+        _score(train.backtest(signals[train_start:train_end], engine='vectorized'), state['metric'])
+        for signals in signal_matrix
+    ]
+    best = int(np.argmax(scores))
+
+    test = strategy_cls(_slice(data, test_start, test_end), **state['strategy_kwargs'])
+    result = test.backtest(signal_matrix[best, test_start:test_end], engine='vectorized')
+    return {'window': window, 'best': best, 'train_score': scores[best], 'result': result}
+
+
+def _init_worker(state):
+    _WORKER_STATE.update(state)
+
+
+def walk_forward(strategy_cls, data, param_sets, train_size, test_size, anchored=False,
+                 metric='sharpe_ratio', initial_capital=10000, commission=0.001, max_workers=1,
+                 execution=None, risk=None):
+    """运行Walk-Forward评估
+
+    各参数组合的信号在完整历史上只计算一次（指标均为因果计算，测试窗口开头的指标
+    自然带有之前的预热数据），之后各窗口只对信号切片回测；窗口之间相互独立，
+    max_workers > 1 时并行执行。
+
+    返回 _calculate_performance 格式的样本外综合结果，另含 'windows'（每个窗口的
+    选参与样本内外指标）和 'oos_start'/'oos_end'（样本外区间位置）。
+    """
+    windows = walk_forward_windows(len(data.index), train_size, test_size, anchored)
+    if not windows:
+        raise ValueError("数据长度不足以划分训练/测试窗口")
+
+    strategy_kwargs = {'initial_capital': initial_capital, 'commission': commission, 'execution': execution,
+                       'risk': risk}
+    strategy = strategy_cls(data, **strategy_kwargs)
+    signal_matrix = np.vstack([
+        strategy.generate_signals(**params).to_numpy(dtype=np.int8) for params in param_sets
+    ])
+
+    state = {
+        'strategy_cls': strategy_cls,
+        'data': data,
+        'signal_matrix': signal_matrix,
+        'metric': metric,
+        'strategy_kwargs': strategy_kwargs,
+    }
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        _init_worker(state)
+        outcomes = [_evaluate_window(window) for window in windows]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(state,)) as executor:
+            outcomes = list(executor.map(_evaluate_window, windows))
+
+    return _stitch(strategy_cls, data, param_sets, outcomes, strategy_kwargs)
+
+
+def _stitch(strategy_cls, data, param_sets, outcomes, strategy_kwargs):
+    """拼接各测试窗口：后一窗口的资产按前一窗口的期末资产等比缩放"""
+    initial_capital = strategy_kwargs['initial_capital']
+    oos_start = outcomes[0]['window'][2]
+    oos_end = outcomes[-1]['window'][3]
+
+    portfolio_values = []
+    trade_parts = []
+    traded_value = 0.0
+    rows = []
+    scale = 1.0
+    for outcome in outcomes:
+        train_start, train_end, test_start, test_end = outcome['window']
+        result = outcome['result']
+        offset = test_start - oos_start
+
+        portfolio_values.extend(v * scale for v in result['portfolio_values'])
+        trade_parts.append((result['trades'], offset, scale))
+        traded_value += result['traded_value'] * scale
+
+        rows.append({
+            'train_start': data.index[train_start],
+            'train_end': data.index[train_end - 1],
+            'test_start': data.index[test_start],
+            'test_end': data.index[test_end - 1],
+            'params': param_sets[outcome['best']],
+            'train_score': outcome['train_score'],
+            'test_return': result['total_return'],
+            'test_sharpe': result['sharpe_ratio'],
+            'test_max_drawdown': result['max_drawdown'],
+            'test_trades': result['num_trades'],
+        })
+        scale *= result['final_value'] / initial_capital
+
+    oos_data = _slice(data, oos_start, oos_end)
+    oos = strategy_cls(oos_data, **strategy_kwargs)
+    trades = TradeLog.concat(trade_parts, oos_data.index)
+    report = oos._calculate_performance(portfolio_values, trades, traded_value)
+    report['windows'] = pd.DataFrame(rows)
+    report['oos_start'] = oos_start
+    report['oos_end'] = oos_end
+    return report